@@ -0,0 +1,147 @@
+"""
+Headless chat API streaming answers as server-sent events.
+
+The API is stateless: each request carries the conversation, so any worker behind a
+load balancer can serve any turn. Requests to /chat and /metrics must carry the
+CHAT_API_TOKEN bearer token. A request sending none of the credential and index
+settings uses those of the LLM_API_KEY, PINECONE_API_KEY, PINECONE_INDEX_NAME,
+EMBEDDING_MODEL and OPENAI_API_KEY environment variables, a request sending any of
+them uses only its own. The active course is read from COURSE when not sent.
+
+Run from the app directory:
+    python -m api.server
+    uvicorn api.server:app --host 127.0.0.1 --port 8000 --workers 4
+"""
+import asyncio
+import hmac
+import json
+import uvicorn
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import API_HOST, API_PORT, API_WORKERS, CHAT_API_TOKEN
+from hook.chat_events import ChatEventSink
+from services.chat_runner import CHAT_SETTING_KEYS, CREDENTIAL_SETTING_KEYS, run_chat_turn, settings_from_env
+from services.llm_scheduler import llm_scheduler
+from services.query_router import query_router
+from services.resilience import error_status
+from services.single_flight import embedding_flight, retrieval_flight
+from utils.message_codec import messages_from_dicts, messages_to_dicts
+
+logger = EnhancedLogger(setup_logging())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Compile the chat graph when a worker starts instead of on its first request."""
+    from services.state_machine import build_graph
+    if not CHAT_API_TOKEN:
+        logger.warning("CHAT_API_TOKEN is not set, the chat API rejects every /chat and /metrics request.")
+    build_graph()
+    yield
+
+app = FastAPI(title="Capiara Code Mentor Chat API", lifespan=lifespan)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def require_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    """Reject requests without the CHAT_API_TOKEN bearer token."""
+    if not CHAT_API_TOKEN:
+        raise HTTPException(status_code=503, detail="The chat API token is not configured.")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), CHAT_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing bearer token.", headers={"WWW-Authenticate": "Bearer"})
+
+class ChatMessagePayload(BaseModel):
+    role: str
+    content: str
+    chunk_ids: List[str] = []
+
+class ChatRequest(BaseModel):
+    messages: List[ChatMessagePayload]
+    settings: Dict[str, Any] = {}
+    session_id: Optional[str] = None
+
+class QueueEventSink(ChatEventSink):
+    """Forwards the events of a turn running in a worker thread to an asyncio queue."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def on_event(self, event: str, data: dict) -> None:
+        self.put((event, data))
+
+    def on_token(self, token: str) -> None:
+        self.put(("token", {"text": token}))
+
+def format_sse(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def error_payload(error: Exception) -> dict:
+    """Describe an error for the client without its traceback."""
+    return {"type": error.__class__.__name__, "message": str(error), "status": error_status(error)}
+
+async def stream_chat_events(messages: list, settings: dict, session_id: Optional[str] = None):
+    """Run a chat turn in a worker thread and yield its events as they happen."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    sink = QueueEventSink(loop, queue)
+
+    def run_turn():
+        try:
+            history = run_chat_turn(messages, settings, sink, session_id)
+            sink.put(("done", {"messages": messages_to_dicts(history)}))
+        except Exception as e:
+            logger.error("Chat API turn", e)
+            sink.put(("error", error_payload(e)))
+        finally:
+            sink.put(None)
+
+    turn = loop.run_in_executor(None, run_turn)
+    while (item := await queue.get()) is not None:
+        yield format_sse(*item)
+    await turn
+
+@app.post("/chat", dependencies=[Depends(require_token)])
+async def chat(request: ChatRequest):
+    """Run one chat turn and stream its events: queue_position, tool_call, message_start, token, message_end, then done or error."""
+    try:
+        messages = messages_from_dicts([message.model_dump() for message in request.messages])
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+
+    requested = {key: value for key, value in request.settings.items() if key in CHAT_SETTING_KEYS and value not in (None, "")}
+    settings = settings_from_env()
+    # The credentials of the deployment are only used as a whole, never completed with those of a client
+    if any(key in requested for key in CREDENTIAL_SETTING_KEYS):
+        settings.update(dict.fromkeys(CREDENTIAL_SETTING_KEYS, ""))
+    settings.update(requested)
+    if not settings["llm_api_key"]:
+        raise HTTPException(status_code=400, detail="LLM API key is required.")
+
+    return StreamingResponse(
+        stream_chat_events(messages, settings, request.session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", dependencies=[Depends(require_token)])
+async def metrics():
+    """LLM queue depth, wait times and token budget, local routing and coalesced calls of this worker."""
+    return {
+        "llm_scheduler": llm_scheduler.metrics(),
+        "query_router": query_router.stats(),
+        "coalescing": {"retrieval": retrieval_flight.stats(), "embedding": embedding_flight.stats()},
+    }
+
+if __name__ == "__main__":
+    uvicorn.run("api.server:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
@@ -0,0 +1,106 @@
+"""
+Compare retrieval over one flat index with course-scoped retrieval.
+
+A synthetic catalog of courses shares its logistics vocabulary (exams, deadlines,
+grading) and differs in its subject vocabulary. It is indexed twice in the local
+vector store: every chunk in the default namespace, and each course in its own
+namespace. Questions about one course are then answered from both layouts and the
+benchmark reports precision@k (share of retrieved chunks from the asked course) and
+search latency.
+
+Run from the app directory:
+    python -m benchmark.course_retrieval_benchmark --courses 8 --chunks 300 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+SHARED_WORDS = [
+    "exam", "deadline", "assignment", "lecture", "grading", "project", "quiz", "week",
+    "homework", "office", "hours", "final", "midterm", "submission", "syllabus", "topic",
+]
+COURSE_WORDS = {
+    "Algorithms": ["sorting", "graph", "dijkstra", "greedy", "dynamic", "recurrence", "heap", "complexity"],
+    "Databases": ["sql", "index", "transaction", "join", "normalization", "btree", "query", "schema"],
+    "Operating Systems": ["process", "thread", "scheduler", "paging", "mutex", "kernel", "syscall", "deadlock"],
+    "Computer Networks": ["tcp", "routing", "packet", "socket", "congestion", "ip", "dns", "latency"],
+    "Compilers": ["parser", "lexer", "grammar", "ast", "register", "optimization", "bytecode", "typing"],
+    "Machine Learning": ["gradient", "regression", "overfitting", "neural", "loss", "feature", "kernel", "bias"],
+    "Computer Graphics": ["shader", "raster", "texture", "mesh", "lighting", "projection", "vertex", "pixel"],
+    "Cryptography": ["cipher", "hash", "signature", "rsa", "key", "nonce", "entropy", "protocol"],
+}
+
+def course_text(course: str, rng: random.Random, words: int, topic_share: float) -> str:
+    """Build a text mixing the shared logistics vocabulary with the course vocabulary."""
+    return " ".join(
+        rng.choice(COURSE_WORDS[course]) if rng.random() < topic_share else rng.choice(SHARED_WORDS)
+        for _ in range(words)
+    )
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+def run_benchmark(args):
+    # Imported after the environment points the application to the local stand-ins
+    from langchain_core.documents import Document
+    from services.vectorstore_service import initialize_vectorstore, course_namespace, search_vectorstore
+
+    rng = random.Random(args.seed)
+    courses = list(COURSE_WORDS)[:args.courses]
+    credentials = {"pinecone_api_key": "benchmark", "embedding_model": "text-embedding-3-small", "openai_api_key": "benchmark"}
+
+    # Index the same catalog flat and partitioned by course
+    flat_store = initialize_vectorstore(credentials["pinecone_api_key"], "flat", credentials["embedding_model"], credentials["openai_api_key"])
+    for course in courses:
+        chunks = [
+            Document(
+                page_content=course_text(course, rng, 40, args.topic_share),
+                metadata={"source": f"{course} notes", "document": f"{course} notes", "course": course_namespace(course), "page": number // 10 + 1},
+            )
+            for number in range(args.chunks)
+        ]
+        course_store = initialize_vectorstore(credentials["pinecone_api_key"], "courses", credentials["embedding_model"], credentials["openai_api_key"], course_namespace(course))
+        course_store.add_documents(chunks)
+        flat_store.add_documents(chunks)
+
+    results = {"flat": {"precision": [], "latency": []}, "course": {"precision": [], "latency": []}}
+    for _ in range(args.queries):
+        course = rng.choice(courses)
+        query = course_text(course, rng, 8, args.topic_share)
+
+        for layout, index_name, active_course in (("flat", "flat", None), ("course", "courses", course)):
+            started = time.perf_counter()
+            docs = search_vectorstore(query, credentials["pinecone_api_key"], index_name, credentials["embedding_model"], credentials["openai_api_key"], k=args.k, course=active_course)
+            results[layout]["latency"].append(time.perf_counter() - started)
+            results[layout]["precision"].append(sum(doc.metadata.get("course") == course_namespace(course) for doc in docs) / args.k)
+
+    print(f"{len(courses)} courses, {len(courses) * args.chunks} chunks, {args.queries} queries, k={args.k}")
+    for layout, label in (("flat", "Flat index"), ("course", "Course namespace + filter")):
+        latency = results[layout]["latency"]
+        print(
+            f"{label}: precision@{args.k} {statistics.fmean(results[layout]['precision']):.2%}, "
+            f"latency p50 {percentile(latency, 0.50) * 1000:.1f}ms, p95 {percentile(latency, 0.95) * 1000:.1f}ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=len(COURSE_WORDS), help="Number of courses in the catalog")
+    parser.add_argument("--chunks", type=int, default=300, help="Chunks per course")
+    parser.add_argument("--queries", type=int, default=200, help="Questions asked")
+    parser.add_argument("--k", type=int, default=3, help="Documents retrieved per question")
+    parser.add_argument("--topic-share", type=float, default=0.25, help="Share of course-specific words in texts and questions")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed of the catalog and questions")
+    args = parser.parse_args()
+
+    from benchmark.fake_servers import FakeEmbeddingServer
+
+    with FakeEmbeddingServer(latency=0.0) as embedding_server:
+        os.environ["OPENAI_BASE_URL"] = embedding_server.url
+        os.environ["VECTORSTORE_BACKEND"] = "memory"
+        run_benchmark(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark the streaming DOCX extractor against the python-docx object model path.
+
+Run from the app directory:
+    python -m benchmark.docx_extraction_benchmark --paragraphs 20000 50000 --rows 2000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import docx
+from utils.docx_stream_extractor import iter_docx_blocks
+
+def build_document(path: str, paragraphs: int, rows: int):
+    """Write a synthetic handbook with body paragraphs and a schedule table."""
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"Section {i}: students must review the algorithms covered in lecture {i % 40} before the lab session.")
+        if i and i % 1000 == 0:
+            table = document.add_table(rows=rows // max(paragraphs // 1000, 1) or 1, cols=3)
+            for row_index, row in enumerate(table.rows):
+                row.cells[0].text = f"Week {row_index}"
+                row.cells[1].text = "Dynamic programming"
+                row.cells[2].text = "20%"
+    document.save(path)
+
+def extract_with_python_docx(path: str) -> int:
+    """Current path: full object model, paragraphs only."""
+    document = docx.Document(path)
+    return len("\n".join(para.text for para in document.paragraphs))
+
+def extract_with_stream(path: str) -> int:
+    """Streaming path: incremental XML parse, paragraphs and table rows."""
+    with open(path, "rb") as file:
+        return len("\n".join(iter_docx_blocks(file)))
+
+def _measure(extractor, path, results):
+    start = time.perf_counter()
+    characters = extractor(path)
+    elapsed = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, peak_rss_kb, characters))
+
+def measure(extractor, path: str) -> tuple:
+    """Run an extractor in a fresh process so peak RSS is not shared between runs."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(extractor, path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--rows", type=int, default=1000, help="Total table rows spread across the document")
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'size MB':>8} {'extractor':>12} {'seconds':>8} {'peak RSS MB':>12} {'chars':>10}")
+    for paragraphs in args.paragraphs:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "handbook.docx")
+            build_document(path, paragraphs, args.rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+            for name, extractor in (("python-docx", extract_with_python_docx), ("stream", extract_with_stream)):
+                elapsed, peak_rss_kb, characters = measure(extractor, path)
+                print(f"{paragraphs:>10} {size_mb:>8.2f} {name:>12} {elapsed:>8.3f} {peak_rss_kb / 1024:>12.1f} {characters:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Evaluate reduced-dimension and quantized embeddings against full precision.
+
+The corpus and the queries are embedded once at the full model width. Each reduced
+width is derived by keeping the leading dimensions and renormalizing, which is how
+text-embedding-3 models truncate when the dimensions parameter is set. Every width
+is then stored at each precision and the benchmark reports recall@k against the
+exact full-width float32 results, the bytes held per vector and the search latency.
+
+By default the corpus is synthetic and embedded by the local fake embedding server.
+Its hashed vectors spread information evenly over all dimensions, unlike the real
+models, so only the precision results are meaningful there. To evaluate the
+dimension truncation of the real model on course material:
+    OPENAI_API_KEY=... python -m benchmark.embedding_recall_eval --corpus ./material --openai
+
+Run from the app directory:
+    python -m benchmark.embedding_recall_eval --dimensions 1536 512 256 --precisions float32 float16 int8
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+import numpy as np
+
+def load_corpus(args, rng: random.Random) -> list:
+    """Chunk the files of the corpus directory, or build a synthetic catalog."""
+    if not args.corpus:
+        from benchmark.course_retrieval_benchmark import COURSE_WORDS, course_text
+        return [course_text(course, rng, 60, 0.3) for course in COURSE_WORDS for _ in range(args.synthetic_chunks)]
+
+    from utils.text_extractor import iter_text_segments
+    from utils.token_splitter import create_text_splitter
+
+    text_splitter = create_text_splitter(args.model)
+    chunks = []
+    for filename in sorted(os.listdir(args.corpus)):
+        file_ext = os.path.splitext(filename)[-1].lower()
+        if file_ext not in (".pdf", ".txt", ".docx"):
+            continue
+        with open(os.path.join(args.corpus, filename), "rb") as file:
+            chunks.extend(text_splitter.split_text("".join(iter_text_segments(file, file_ext))))
+    return chunks
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the leading dimensions and renormalize, as the provider does."""
+    truncated = np.ascontiguousarray(vectors[:, :dimensions])
+    return truncated / np.maximum(np.linalg.norm(truncated, axis=1, keepdims=True), 1e-12)
+
+def evaluate(args, chunks: list, queries: list, embeddings):
+    from services.quantized_vectorstore import QuantizedVectorStore
+
+    full_chunks = truncate(np.asarray(embeddings.embed_documents(chunks), dtype=np.float32), args.full_dimensions)
+    full_queries = truncate(np.asarray(embeddings.embed_documents(queries), dtype=np.float32), args.full_dimensions)
+    exact = [set(np.argsort(-(full_chunks @ query))[:args.k].tolist()) for query in full_queries]
+
+    print(f"{len(chunks)} chunks, {len(queries)} queries, recall@{args.k} against {args.full_dimensions} dimensions at float32")
+    print(f"{'dims':>6} {'precision':>9} {'rescore':>7} {'recall':>7} {'bytes/vector':>12} {'p50 search':>10}")
+    for dimensions in args.dimensions:
+        chunk_vectors, query_vectors = truncate(full_chunks, dimensions), truncate(full_queries, dimensions)
+        for precision in args.precisions:
+            for rescore_factor in ([0] if precision == "float32" else args.rescore_factors):
+                store = QuantizedVectorStore(embeddings, precision, rescore_factor)
+                store.add_embeddings([str(index) for index in range(len(chunks))], chunk_vectors)
+
+                recalls, latencies = [], []
+                for query_vector, expected in zip(query_vectors, exact):
+                    started = time.perf_counter()
+                    results = store.similarity_search_by_vector_with_score(query_vector, k=args.k)
+                    latencies.append(time.perf_counter() - started)
+                    recalls.append(len(expected & {int(doc.page_content) for doc, _ in results}) / args.k)
+
+                print(
+                    f"{dimensions:>6} {precision:>9} {rescore_factor or '-':>7} {statistics.fmean(recalls):>7.2%} "
+                    f"{store.memory_bytes() / len(chunks):>12.0f} {statistics.median(latencies) * 1000:>8.2f}ms"
+                )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of .pdf, .txt and .docx files, a synthetic catalog when omitted")
+    parser.add_argument("--synthetic-chunks", type=int, default=500, help="Synthetic chunks per course")
+    parser.add_argument("--openai", action="store_true", help="Embed with the OpenAI API instead of the fake server")
+    parser.add_argument("--model", default="text-embedding-3-small", help="OpenAI embedding model")
+    parser.add_argument("--full-dimensions", type=int, default=1536, help="Full width of the model embeddings")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 768, 512, 256], help="Reduced widths to evaluate")
+    parser.add_argument("--precisions", nargs="+", default=["float32", "float16", "int8"], help="Storage precisions to evaluate")
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[0, 4], help="Rescore factors of the quantized precisions")
+    parser.add_argument("--queries", type=int, default=200, help="Queries, taken from the start of random chunks")
+    parser.add_argument("--query-words", type=int, default=12, help="Words per query")
+    parser.add_argument("--k", type=int, default=10, help="Results compared per query")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed of the corpus and queries")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunks = load_corpus(args, rng)
+    queries = [" ".join(rng.choice(chunks).split()[:args.query_words]) for _ in range(args.queries)]
+
+    from services.vectorstore_service import initialize_embeddings
+
+    if args.openai:
+        evaluate(args, chunks, queries, initialize_embeddings(args.model, os.environ["OPENAI_API_KEY"], args.full_dimensions))
+        return
+
+    from benchmark.fake_servers import FakeEmbeddingServer
+
+    print("Fake embeddings: reduced dimensions are not representative of text-embedding-3 truncation.")
+    with FakeEmbeddingServer(latency=0.0, dimensions=args.full_dimensions) as embedding_server:
+        os.environ["OPENAI_BASE_URL"] = embedding_server.url
+        evaluate(args, chunks, queries, initialize_embeddings(args.model, "benchmark", args.full_dimensions))
+
+if __name__ == "__main__":
+    main()
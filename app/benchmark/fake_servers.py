@@ -0,0 +1,193 @@
+"""
+Local stand-ins for the Maritalk chat API and the OpenAI embeddings API.
+
+Both servers run in a background thread on a free local port and expose a mutable
+`config` dict so latency, token rate and failures can be changed while they run.
+
+    with FakeMaritalkServer(tokens_per_second=50) as llm, FakeEmbeddingServer() as embeddings:
+        os.environ["MARITALK_API_URL"] = llm.url
+        os.environ["OPENAI_BASE_URL"] = embeddings.url
+"""
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words in the last user message that make the fake decision call choose the retrieval tool
+RETRIEVAL_KEYWORDS = ("syllabus", "schedule", "course", "exam", "grading", "deadline", "lecture", "assignment")
+
+class _FakeServer:
+    """Base class running a ThreadingHTTPServer in a daemon thread."""
+    path = "/"
+
+    def __init__(self, **config):
+        self.config = dict(self.default_config, **config)
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                fake.requests += 1
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                # Injected faults: latency before the first byte, then a random or permanent failure
+                time.sleep(fake.latency())
+                if fake.config["down"] or random.random() < fake.config["failure_rate"]:
+                    self._send_json(fake.config["failure_status"], {"detail": "Injected failure"})
+                    return
+
+                fake.handle(self, body)
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def latency(self) -> float:
+        """Latency of one request, with an optional heavy tail to exercise hedging."""
+        latency = self.config["latency"]
+        if self.config["slow_rate"] and random.random() < self.config["slow_rate"]:
+            latency += self.config["slow_latency"]
+        return latency
+
+class FakeMaritalkServer(_FakeServer):
+    """
+    Fake Maritalk inference endpoint.
+
+    Non-streaming calls answer like the tool decision step, returning a retrieve tool
+    call when the last user message mentions course material. Streaming calls emit
+    server-sent events at the configured token rate.
+    """
+    path = "/api/chat/inference"
+    default_config = {
+        "latency": 0.05,
+        "tokens_per_second": 100.0,
+        "answer_tokens": 60,
+        "failure_rate": 0.0,
+        "failure_status": 503,
+        "down": False,
+        "slow_rate": 0.0,
+        "slow_latency": 2.0,
+    }
+
+    def handle(self, handler, body):
+        messages = body.get("messages", [])
+        last_user_message = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+
+        if not body.get("stream"):
+            if any(keyword in last_user_message.lower() for keyword in RETRIEVAL_KEYWORDS):
+                answer = json.dumps({"tool_call": {"function": "retrieve", "arguments": {"query": last_user_message}}})
+            else:
+                answer = self._answer_text()
+            handler._send_json(200, {"answer": answer})
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        delay = 1.0 / self.config["tokens_per_second"] if self.config["tokens_per_second"] else 0.0
+        for token in self._answer_text().split(" "):
+            self._write_chunk(handler, f"data: {json.dumps({'text': token + ' '})}\n\n".encode("utf-8"))
+            time.sleep(delay)
+        self._write_chunk(handler, b"")
+
+    def _answer_text(self) -> str:
+        return " ".join(f"token{i}" for i in range(self.config["answer_tokens"]))
+
+    @staticmethod
+    def _write_chunk(handler, data: bytes):
+        handler.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+
+class FakeEmbeddingServer(_FakeServer):
+    """
+    Fake OpenAI-compatible embeddings endpoint.
+
+    Vectors are deterministic feature hashes of the input words (or token ids), so
+    texts sharing words are close to each other and retrieval results are meaningful.
+    """
+    path = "/v1"
+    default_config = {
+        "latency": 0.01,
+        "dimensions": 256,
+        "failure_rate": 0.0,
+        "failure_status": 503,
+        "down": False,
+        "slow_rate": 0.0,
+        "slow_latency": 2.0,
+    }
+
+    def handle(self, handler, body):
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or self.config["dimensions"]
+
+        data, total_tokens = [], 0
+        for index, item in enumerate(inputs):
+            features = item if isinstance(item, list) else re.findall(r"\w+", item.lower())
+            total_tokens += len(features)
+            vector = hash_embedding(features, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+
+        handler._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        })
+
+def hash_embedding(features: list, dimensions: int) -> list:
+    """Signed feature hashing of words or token ids into a unit vector."""
+    vector = [0.0] * dimensions
+    for feature in features:
+        digest = hashlib.blake2b(str(feature).encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if value >> 63 else -1.0
+    norm = math.sqrt(sum(component * component for component in vector)) or 1.0
+    return [component / norm for component in vector]
@@ -0,0 +1,80 @@
+"""
+Measure the rerun time of the Streamlit app against the chat history length.
+
+Each history is a synthetic tutoring session of alternating questions and markdown
+answers with code blocks, loaded into the session state before app.py runs. Compare
+windowed rendering with rendering every message by raising the window:
+
+Run from the app directory:
+    python -m benchmark.history_rerun_benchmark --lengths 10 100 500 2000
+    python -m benchmark.history_rerun_benchmark --window 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+
+ANSWER_TEMPLATE = """Here is how to approach question {number}:
+
+1. Define the **subproblem** clearly.
+2. Write the recurrence and its base cases.
+
+```python
+def solve(values):
+    memo = {{}}
+    return helper(values, 0, memo)
+```
+
+The complexity is `O(n^2)` in time and `O(n)` in space."""
+
+def synthetic_history(length: int):
+    """Build a session store holding alternating user questions and assistant answers."""
+    from langchain_core.messages import AIMessage, HumanMessage
+    from services.session_store import SessionMessageStore
+
+    messages = []
+    for number in range(length):
+        if number % 2 == 0:
+            messages.append(HumanMessage(content=f"Question {number}: how do I solve this dynamic programming problem?"))
+        else:
+            messages.append(AIMessage(content=ANSWER_TEMPLATE.format(number=number)))
+
+    store = SessionMessageStore()
+    store.extend_messages(messages)
+    return store
+
+def time_reruns(length: int, reruns: int) -> list:
+    """Time reruns of app.py with a history of the given length."""
+    from streamlit.testing.v1 import AppTest
+    from benchmark.startup_benchmark import BENCHMARK_SECRETS
+
+    app_test = AppTest.from_file("../app.py", default_timeout=120)
+    for key, value in BENCHMARK_SECRETS.items():
+        app_test.secrets[key] = value
+    app_test.session_state["messages"] = synthetic_history(length)
+    app_test.run()
+
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app_test.run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 500, 2000], help="History lengths to measure")
+    parser.add_argument("--reruns", type=int, default=10, help="Reruns timed per history length")
+    parser.add_argument("--window", type=int, help="Override CHAT_HISTORY_WINDOW for this run")
+    args = parser.parse_args()
+
+    # Settings are read at import, the window must be set before the app modules load
+    if args.window is not None:
+        os.environ["CHAT_HISTORY_WINDOW"] = str(args.window)
+
+    for length in args.lengths:
+        timings = time_reruns(length, args.reruns)
+        print(f"{length:>6} messages: rerun median {statistics.median(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms")
+
+if __name__ == "__main__":
+    main()
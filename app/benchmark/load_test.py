@@ -0,0 +1,176 @@
+"""
+Drive concurrent chat sessions through the compiled graph against local stand-ins.
+
+The Maritalk API and the OpenAI embeddings API are replaced by the local fake servers
+and Pinecone by the in-process vector store, so the run measures this application
+rather than the providers.
+
+Run from the app directory:
+    python -m benchmark.load_test --sessions 50 --turns 4 --token-rate 40 --rag-ratio 0.5
+
+The query router runs in shadow mode by default. Its reported agreement is measured
+against the fake decision call, which picks the tool from a keyword list of its own,
+so it only checks the wiring; its accuracy is measured by benchmark.query_router_eval.
+"""
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+
+# Questions mentioning course material make the fake decision call choose the retrieval tool
+RAG_QUESTIONS = [
+    "When is the final exam of the algorithms course?",
+    "What is the grading policy in the syllabus?",
+    "Which lecture covers dynamic programming?",
+    "What is the deadline of the graph assignment?",
+]
+DIRECT_QUESTIONS = [
+    "Thanks for the help!",
+    "Can you explain what recursion is?",
+    "What did I just ask?",
+    "How do I think about the complexity of nested loops?",
+]
+SEED_TEXTS = [
+    "The final exam of the algorithms course is on December 12th in room 101.",
+    "Grading: assignments 40%, midterm 20%, final exam 40% according to the syllabus.",
+    "Lecture 7 covers dynamic programming, memoization and tabulation.",
+    "The graph assignment deadline is November 3rd at midnight.",
+    "Office hours are on Tuesdays and Thursdays from 2pm to 4pm.",
+]
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+def run_load(args):
+    # Imported after the environment points the application to the local stand-ins
+    from langchain_core.documents import Document
+    from langchain_core.messages import HumanMessage
+    from hook.chat_events import ChatEventSink
+    from services.chat_runner import run_chat_turn
+    from services.llm_scheduler import llm_scheduler
+    from services.query_router import query_router
+    from services.single_flight import embedding_flight, retrieval_flight
+    from services.vectorstore_service import initialize_vectorstore
+    from utils.memory_monitor import PeakRSSMonitor
+
+    settings = {
+        "llm_api_key": "load-test",
+        "pinecone_api_key": "load-test",
+        "pinecone_index_name": "load-test",
+        "embedding_model": "text-embedding-3-small",
+        "openai_api_key": "load-test",
+        "speculative_retrieval": args.speculative,
+    }
+
+    # Seed the in-process index, from a snapshot without embedding requests when one is given
+    vector_store = initialize_vectorstore(settings["pinecone_api_key"], settings["pinecone_index_name"], settings["embedding_model"], settings["openai_api_key"])
+    if args.snapshot:
+        from services.index_snapshot import import_snapshot
+        seeded = import_snapshot(vector_store, args.snapshot, settings["embedding_model"])
+        print(f"Seeded {seeded['count']} chunks from {args.snapshot} in {seeded['seconds']:.2f}s")
+    else:
+        vector_store.add_documents([Document(page_content=text, metadata={"source": "syllabus.pdf"}) for text in SEED_TEXTS])
+
+    class TimingSink(ChatEventSink):
+        def __init__(self):
+            self.started = time.perf_counter()
+            self.first_token = None
+            self.tokens = 0
+
+        def on_token(self, token: str) -> None:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.tokens += 1
+
+    results = {"latencies": [], "ttft": [], "tokens": 0, "errors": 0, "rag": 0, "direct": 0}
+    results_lock = threading.Lock()
+    start_barrier = threading.Barrier(args.sessions)
+
+    def session(session_number: int):
+        session_random = random.Random(session_number)
+        history = []
+        start_barrier.wait()
+        for _ in range(args.turns):
+            is_rag = session_random.random() < args.rag_ratio
+            question = session_random.choice(RAG_QUESTIONS if is_rag else DIRECT_QUESTIONS)
+            sink = TimingSink()
+            try:
+                history = run_chat_turn(history + [HumanMessage(content=question)], settings, sink, f"session-{session_number}")
+            except Exception:
+                with results_lock:
+                    results["errors"] += 1
+                continue
+
+            finished = time.perf_counter()
+            with results_lock:
+                results["latencies"].append(finished - sink.started)
+                if sink.first_token is not None:
+                    results["ttft"].append(sink.first_token - sink.started)
+                results["tokens"] += sink.tokens
+                results["rag" if is_rag else "direct"] += 1
+
+    threads = [threading.Thread(target=session, args=(number,)) for number in range(args.sessions)]
+    with PeakRSSMonitor() as memory_monitor:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    turns = len(results["latencies"])
+    print(f"Sessions {args.sessions}, turns {turns} ({results['rag']} RAG, {results['direct']} direct), errors {results['errors']}")
+    print(f"Wall time {elapsed:.2f}s, throughput {turns / elapsed:.2f} turns/s, {results['tokens'] / elapsed:.1f} tokens/s")
+    for name, values in (("End-to-end", results["latencies"]), ("Time to first token", results["ttft"])):
+        print(
+            f"{name}: p50 {percentile(values, 0.50) * 1000:.0f}ms, p95 {percentile(values, 0.95) * 1000:.0f}ms, "
+            f"p99 {percentile(values, 0.99) * 1000:.0f}ms, mean {statistics.fmean(values) * 1000 if values else 0:.0f}ms"
+        )
+    print(f"Peak RSS {memory_monitor.peak_mb:.1f} MB (+{memory_monitor.growth_mb:.1f} MB during the run)")
+
+    scheduler = llm_scheduler.metrics()
+    print(
+        f"LLM queue: {scheduler['admitted']} calls admitted, wait p50 {scheduler['wait_p50'] * 1000:.0f}ms, "
+        f"p95 {scheduler['wait_p95'] * 1000:.0f}ms, max {scheduler['wait_max'] * 1000:.0f}ms, "
+        f"{scheduler['timed_out']} timed out, {scheduler['throttled']} throttled"
+    )
+    router = query_router.stats()
+    accuracy = f"{router['accuracy']:.0%}" if router["accuracy"] is not None else "n/a"
+    print(
+        f"Query router: {router['routed']} routed locally, {router['ambiguous']} left to the LLM, "
+        f"agreement with the LLM {accuracy} over {router['compared']} compared, "
+        f"{router['fast_paths']} decision calls skipped saving {router['time_saved']:.2f}s"
+    )
+    for name, stats in (("Retrieval", retrieval_flight.stats()), ("Embedding", embedding_flight.stats())):
+        print(f"{name} coalescing: {stats['deduplicated']} of {stats['calls']} calls deduplicated ({stats['dedup_rate']:.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Number of concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session")
+    parser.add_argument("--rag-ratio", type=float, default=0.5, help="Share of questions answered from the knowledge base")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens per second streamed by the fake LLM")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="Tokens per fake LLM answer")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM latency before the first byte, in seconds")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Fake embedding latency, in seconds")
+    parser.add_argument("--speculative", action="store_true", help="Enable speculative retrieval")
+    parser.add_argument("--snapshot", help="Index snapshot seeding the in-process store, exported with cli.index_snapshot")
+    args = parser.parse_args()
+
+    from benchmark.fake_servers import FakeEmbeddingServer, FakeMaritalkServer
+
+    with FakeMaritalkServer(latency=args.llm_latency, tokens_per_second=args.token_rate, answer_tokens=args.answer_tokens) as llm_server, \
+         FakeEmbeddingServer(latency=args.embedding_latency) as embedding_server:
+        os.environ["MARITALK_API_URL"] = llm_server.url
+        os.environ["OPENAI_BASE_URL"] = embedding_server.url
+        os.environ["VECTORSTORE_BACKEND"] = "memory"
+        run_load(args)
+
+if __name__ == "__main__":
+    main()
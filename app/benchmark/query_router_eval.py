@@ -0,0 +1,98 @@
+"""
+Evaluate the local query router on labelled questions.
+
+Each question is labelled with the route it should take: "retrieve" when it asks
+about the course material, "respond" when it can be answered without it, including
+general programming questions that share words with course vocabulary. The router
+reports its coverage, the share of questions it routes without the LLM, and the
+accuracy of those routes against the labels.
+
+The built-in questions cover known pitfalls, such as coding questions using "class"
+or "lista", but were written alongside the router keywords, so they only guard
+against regressions. A held-out measure needs questions of real sessions labelled by
+hand, passed with --labels; in production, shadow mode reports the agreement of the
+router with the real LLM decisions in /metrics.
+
+Run from the app directory:
+    python -m benchmark.query_router_eval
+    python -m benchmark.query_router_eval --labels ./labelled_questions.jsonl --min-score 1.5
+
+The labels file holds one JSON object per line: {"message": "...", "route": "retrieve"}.
+"""
+import argparse
+import json
+
+LABELLED_QUESTIONS = [
+    ("When is the final exam of the algorithms course?", "retrieve"),
+    ("What topics does the midterm cover?", "retrieve"),
+    ("Where can I find the syllabus of data structures?", "retrieve"),
+    ("How is the grading split between projects and exams?", "retrieve"),
+    ("Which lecture introduced hash tables?", "retrieve"),
+    ("Is the homework deadline still on Friday?", "retrieve"),
+    ("What are the prerequisites for compilers?", "retrieve"),
+    ("Which books are in the bibliography?", "retrieve"),
+    ("Quando é a prova final da disciplina?", "retrieve"),
+    ("Qual é a ementa de estruturas de dados?", "retrieve"),
+    ("Em qual aula vimos árvores AVL?", "retrieve"),
+    ("Qual o prazo de entrega da lista 3?", "retrieve"),
+    ("Como é calculada a nota do semestre?", "retrieve"),
+    ("Which chapter of the slides covers recursion this semester?", "retrieve"),
+    ("Tem monitoria às quintas?", "retrieve"),
+    ("What is the difference between a class and a module in Python?", "respond"),
+    ("How does variable assignment work in Python?", "respond"),
+    ("Como funciona uma lista ligada?", "respond"),
+    ("What is a process scheduler?", "respond"),
+    ("How do I import a module from another folder?", "respond"),
+    ("Can you explain what recursion is?", "respond"),
+    ("Why does my class attribute change for every instance?", "respond"),
+    ("Como percorrer uma lista de trás para frente?", "respond"),
+    ("What does reading a file line by line look like in Java?", "respond"),
+    ("Explain the time complexity of binary search.", "respond"),
+    ("Como faço uma prova por indução de um algoritmo recursivo?", "respond"),
+    ("Thanks for the help!", "respond"),
+    ("Hello!", "respond"),
+    ("Obrigado, entendi!", "respond"),
+    ("What did I just ask?", "respond"),
+    ("Quem é você?", "respond"),
+    ("Can you summarize your last answer?", "respond"),
+]
+
+def load_labels(path: str) -> list:
+    """Read labelled questions from a JSON lines file."""
+    with open(path, encoding="utf-8") as file:
+        return [(item["message"], item["route"]) for item in map(json.loads, file) if item.get("message")]
+
+def evaluate(questions: list, min_score: float):
+    from services.query_router import QueryRouter
+
+    router = QueryRouter(min_score)
+    routed, correct, misroutes = 0, 0, []
+    for message, label in questions:
+        route = router.route(message)
+        if route is None:
+            continue
+        routed += 1
+        if route == label:
+            correct += 1
+        else:
+            misroutes.append((message, label, route))
+
+    print(f"{len(questions)} labelled questions, min score {min_score}")
+    print(f"Coverage {routed / len(questions):.0%} ({routed} routed locally, {len(questions) - routed} left to the LLM)")
+    print(f"Accuracy of the local routes {correct / routed if routed else 0:.0%} ({correct}/{routed})")
+    for message, label, route in misroutes:
+        print(f"  routed to {route}, labelled {label}: {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="JSON lines file of labelled questions, the built-in set when omitted")
+    parser.add_argument("--min-score", type=float, help="Keyword score routing to retrieval; QUERY_ROUTER_MIN_SCORE by default")
+    args = parser.parse_args()
+
+    from config.settings import QUERY_ROUTER_MIN_SCORE
+
+    questions = load_labels(args.labels) if args.labels else LABELLED_QUESTIONS
+    evaluate(questions, QUERY_ROUTER_MIN_SCORE if args.min_score is None else args.min_score)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Exercise the provider resilience layer against the local fake Maritalk server.
+
+Run from the app directory:
+    python -m benchmark.resilience_check
+"""
+import os
+import statistics
+import time
+from benchmark.fake_servers import FakeMaritalkServer
+
+def run_scenarios(server: FakeMaritalkServer):
+    # Imported after MARITALK_API_URL points to the fake server
+    from langchain_core.messages import HumanMessage
+    from services.llm_client_pool import llm_client_pool
+    from services.resilience import CallTimeoutError, CircuitOpenError, ResiliencePolicy, call_with_resilience
+
+    llm = llm_client_pool.get("fake-key", model="sabia-3", stream=False, temperature=0.5, max_tokens=256)
+    prompt = [HumanMessage(content="hello")]
+
+    def timed(policy):
+        started = time.perf_counter()
+        try:
+            call_with_resilience(lambda: llm.invoke(prompt), policy)
+            outcome = "ok"
+        except (CallTimeoutError, CircuitOpenError) as e:
+            outcome = type(e).__name__
+        except Exception as e:
+            outcome = f"error {e.__class__.__name__}"
+        return outcome, time.perf_counter() - started
+
+    print("Flaky provider, 40% of requests fail with 503")
+    server.config.update(failure_rate=0.4)
+    policy = ResiliencePolicy("flaky", timeout=2, budget=5, max_attempts=4)
+    outcomes = [timed(policy)[0] for _ in range(50)]
+    print(f"  succeeded {outcomes.count('ok')}/50 calls")
+
+    print("Slow provider, 3s latency with a 1s timeout and a 2.5s budget")
+    server.config.update(failure_rate=0.0, latency=3.0)
+    outcome, elapsed = timed(ResiliencePolicy("slow", timeout=1, budget=2.5, max_attempts=5))
+    print(f"  {outcome} after {elapsed:.2f}s")
+
+    print("Provider down, circuit opens after repeated failures")
+    server.config.update(latency=0.01, down=True)
+    policy = ResiliencePolicy("down", timeout=1, budget=1, max_attempts=1)
+    for call in range(8):
+        outcome, elapsed = timed(policy)
+        print(f"  call {call + 1}: {outcome} in {elapsed * 1000:.1f}ms (circuit {policy.breaker.state})")
+
+    print("Heavy-tail latency, 10% of requests take 1.5s more, with and without hedging")
+    server.config.update(down=False, latency=0.05, slow_rate=0.1, slow_latency=1.5)
+    for name, hedge_delay in (("no hedge", None), ("hedge 0.2s", 0.2)):
+        policy = ResiliencePolicy(f"tail-{name}", timeout=5, budget=10, max_attempts=1, hedge_delay=hedge_delay)
+        latencies = sorted(timed(policy)[1] for _ in range(60))
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"  {name}: median {statistics.median(latencies) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms")
+
+def main():
+    with FakeMaritalkServer(latency=0.02) as server:
+        os.environ["MARITALK_API_URL"] = server.url
+        run_scenarios(server)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Check that chat turns keep being stored once a session spills its history to disk.
+
+Each turn is run as in the Streamlit app: the prompt is built from the records in
+memory plus the new user message, and the conversation returned by the turn is
+recorded in the store. A small memory cap makes the store spill after a few turns.
+
+Run from the app directory:
+    python -m benchmark.session_store_check --turns 20 --cap-bytes 4000
+"""
+import argparse
+
+def run_turns(turns: int, cap_bytes: int) -> bool:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from services.chat_runner import compact_history
+    from services.session_store import SessionMessageStore
+
+    store = SessionMessageStore(memory_cap_bytes=cap_bytes)
+    passed = True
+    for turn in range(1, turns + 1):
+        prior_messages = store.to_messages()
+        turn_messages = prior_messages + [HumanMessage(content=f"Question {turn}: " + "why? " * 40)]
+
+        # Stand-in for the graph, answering and compacting the conversation as run_chat_turn does
+        messages = compact_history(turn_messages + [AIMessage(content=f"Answer {turn}: " + "because. " * 40)])
+
+        before = len(store)
+        store.record_turn(prior_messages, messages)
+        added = len(store) - before
+        last_content = store.slice(len(store) - 1, len(store))[0].content
+        ok = added == 2 and last_content.startswith(f"Answer {turn}:")
+        passed = passed and ok
+        print(f"turn {turn:>3}: added {added}, {store.spilled_count} spilled, {len(store)} stored{'' if ok else '  FAILED'}")
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="Chat turns to run")
+    parser.add_argument("--cap-bytes", type=int, default=4000, help="Memory cap of the session store")
+    args = parser.parse_args()
+
+    passed = run_turns(args.turns, args.cap_bytes)
+    print("Every turn was stored." if passed else "Some turns were not stored.")
+    raise SystemExit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measure the cold start and rerun time of the Streamlit app.
+
+Cold start imports the modules loaded by app.py in a fresh interpreter, the graph load
+is the one-time cost paid by the first chat message, and reruns execute app.py
+through Streamlit's AppTest as a widget interaction would.
+
+Run from the app directory:
+    python -m benchmark.startup_benchmark --repeats 5 --reruns 20
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+APP_IMPORTS = "import ui.layout, ui.sidebar, services.chat_service, services.indexing_service"
+GRAPH_LOAD = "from services.state_machine import build_graph; build_graph()"
+
+# Placeholder secrets so the sidebar renders without a secrets file
+BENCHMARK_SECRETS = {
+    "llm_api_key": "benchmark",
+    "pinecone_api_key": "benchmark",
+    "pinecone_index_name": "benchmark",
+    "embedding_model": "text-embedding-3-small",
+    "openai_api_key": "benchmark",
+}
+
+def time_fresh_interpreter(statement: str, repeats: int) -> list:
+    """Time a statement in new interpreters, so nothing is already imported."""
+    timings = []
+    code = f"import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return timings
+
+def time_app_runs(reruns: int) -> tuple:
+    """Time the first script run of app.py and its following reruns."""
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file("../app.py", default_timeout=120)
+    for key, value in BENCHMARK_SECRETS.items():
+        app_test.secrets[key] = value
+
+    started = time.perf_counter()
+    app_test.run()
+    first_run = time.perf_counter() - started
+    if app_test.exception:
+        raise RuntimeError(f"app.py raised during the benchmark: {app_test.exception[0].message}")
+
+    rerun_timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app_test.run()
+        rerun_timings.append(time.perf_counter() - started)
+    return first_run, rerun_timings
+
+def describe(timings: list) -> str:
+    return f"median {statistics.median(timings) * 1000:.0f}ms, min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per cold measurement")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns of app.py after the first run")
+    args = parser.parse_args()
+
+    print(f"Cold import of the app modules: {describe(time_fresh_interpreter(APP_IMPORTS, args.repeats))}")
+    print(f"Graph load on the first message: {describe(time_fresh_interpreter(GRAPH_LOAD, args.repeats))}")
+
+    first_run, rerun_timings = time_app_runs(args.reruns)
+    print(f"First run of app.py: {first_run * 1000:.0f}ms")
+    print(f"Reruns of app.py: {describe(rerun_timings)}")
+
+if __name__ == "__main__":
+    main()
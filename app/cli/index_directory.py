@@ -0,0 +1,297 @@
+"""
+Index a directory tree of course material into the vector store.
+
+Every .pdf, .txt, .docx and .zip file under the directory is extracted and chunked
+in a pool of processes, then embedded and upserted in token-packed batches by the
+main process. Each file is recorded in a checkpoint file once all its chunks are
+upserted, so an interrupted run resumes where it stopped; a file modified since it
+was recorded is indexed again. Chunk ids are derived from the file path and the
+chunk position, so chunks upserted before an interruption are overwritten rather
+than duplicated, and the chunks a modified file no longer has are deleted.
+
+Credentials are read from the PINECONE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_MODEL
+and OPENAI_API_KEY environment variables, and the course from COURSE.
+
+Run from the app directory:
+    python -m cli.index_directory /data/department --course "Algorithms" --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import BULK_INDEXING_WORKERS, BULK_INDEXING_PREFETCH, INGESTION_MEMORY_BUDGET_MB
+from services.chat_runner import settings_from_env
+from services.indexing_service import chunk_metadata, delete_stale_chunks, iter_paged_chunks, upsert_document_batches, with_chunk_ids
+from services.vectorstore_service import course_namespace, initialize_vectorstore, write_shard
+from utils.file_extractor import extract_files_from_zip
+from utils.memory_monitor import PeakRSSMonitor
+from utils.spooled_upload import SUPPORTED_EXTENSIONS
+from utils.token_splitter import create_text_splitter
+
+logger = EnhancedLogger(setup_logging())
+
+# Characters of a file buffered before splitting, as in the low-memory upload path
+CHUNK_WINDOW_CHARS = max(INGESTION_MEMORY_BUDGET_MB * 1024 * 1024 // 16, 64 * 1024)
+
+class IndexingCheckpoint:
+    """
+    Append-only record of the files fully indexed by previous runs.
+
+    Each line holds the relative path, size and modification time of a file, so a
+    file changed after it was indexed is not skipped, and the chunk count of each of
+    its sources, so the chunks it no longer has can be deleted when it is indexed again.
+
+    Args:
+        path (str): The checkpoint file, created on the first recorded file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        self.sources = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    # A line cut by an interruption is ignored, its file is indexed again
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.done[entry["path"]] = (entry["size"], entry["mtime_ns"])
+                    self.sources[entry["path"]] = entry_sources(entry)
+        self._file = None
+
+    def is_done(self, relative_path: str, stat: os.stat_result) -> bool:
+        return self.done.get(relative_path) == (stat.st_size, stat.st_mtime_ns)
+
+    def mark_done(self, relative_path: str, stat: os.stat_result, source_counts: Dict[str, int]):
+        """Record a file whose chunks are all upserted, durably before returning."""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        entry = {"path": relative_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunks": sum(source_counts.values()), "sources": source_counts}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done[relative_path] = (stat.st_size, stat.st_mtime_ns)
+        self.sources[relative_path] = source_counts
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def entry_sources(entry: dict) -> Dict[str, int]:
+    """Chunk count of each source of a checkpoint entry."""
+    if "sources" in entry:
+        return entry["sources"]
+    # Entries written before the sources were recorded count the chunks of the file, its only source unless it is an archive
+    if entry["path"].lower().endswith(".zip"):
+        return {}
+    return {entry["path"]: entry.get("chunks", 0)}
+
+def find_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """Walk a directory tree in a stable order, yielding the path and relative path of each supported file."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if os.path.splitext(filename)[-1].lower() in SUPPORTED_EXTENSIONS + (".zip",):
+                path = os.path.join(root, filename)
+                yield path, os.path.relpath(path, directory)
+
+@lru_cache(maxsize=4)
+def get_text_splitter(embedding_model: str, chunk_size: Optional[int], chunk_overlap: Optional[int]):
+    """Text splitter of a worker process, built once per process."""
+    return create_text_splitter(embedding_model, chunk_size, chunk_overlap)
+
+def chunk_file(path: str, relative_path: str, embedding_model: str, chunk_size: Optional[int], chunk_overlap: Optional[int], course: Optional[str]) -> Tuple[List[Document], float]:
+    """
+    Extract and chunk one file, run in a worker process.
+
+    The members of a .zip archive are chunked in turn, with their path inside the
+    archive appended to the archive path as their source.
+
+    Returns:
+        Tuple[List[Document], float]: The chunks of the file and the seconds spent.
+    """
+    started = time.perf_counter()
+    text_splitter = get_text_splitter(embedding_model, chunk_size, chunk_overlap)
+    namespace = course_namespace(course)
+    file_ext = os.path.splitext(path)[-1].lower()
+
+    with open(path, "rb") as file:
+        if file_ext == ".zip":
+            members = [(f"{relative_path}/{inner_filename}", inner_file) for inner_filename, inner_file in extract_files_from_zip(file)]
+        else:
+            members = [(relative_path, file)]
+
+        chunks = []
+        for source, member in members:
+            member_ext = os.path.splitext(source)[-1].lower()
+            chunks.extend(with_chunk_ids(iter_paged_chunks(member, member_ext, chunk_metadata(source, course), text_splitter, CHUNK_WINDOW_CHARS), namespace))
+
+    return chunks, time.perf_counter() - started
+
+def run_indexing(args) -> dict:
+    """
+    Index the files of a directory tree, resuming from the checkpoint.
+
+    Returns:
+        dict: Counters and timings of the run.
+    """
+    settings = settings_from_env()
+    course = args.course if args.course is not None else settings["course"]
+    index_name = args.index or write_shard(settings["pinecone_index_name"], course)
+    embedding_model = args.embedding_model or settings["embedding_model"]
+    namespace = course_namespace(course)
+
+    checkpoint = IndexingCheckpoint(args.checkpoint or f".index-checkpoint-{index_name}-{namespace or 'default'}.jsonl")
+    vector_store = initialize_vectorstore(settings["pinecone_api_key"], index_name, embedding_model, settings["openai_api_key"], namespace)
+
+    # Files recorded by a previous run are skipped before any work is scheduled
+    files, skipped = [], 0
+    for path, relative_path in find_files(args.directory):
+        stat = os.stat(path)
+        if checkpoint.is_done(relative_path, stat):
+            skipped += 1
+        else:
+            files.append((path, relative_path, stat))
+
+    stats = {
+        "files_total": len(files) + skipped, "files_skipped": skipped, "files_indexed": 0, "files_failed": 0,
+        "failed": [], "chunks": 0, "chunks_deleted": 0, "tokens": 0, "batches": 0, "chunking_seconds": 0.0, "waiting_seconds": 0.0,
+        "elapsed": 0.0, "chunks_per_second": 0.0, "interrupted": False,
+    }
+
+    # Files whose chunks entered the stream, in stream order, with the chunks not upserted yet
+    in_stream = deque()
+    workers = args.workers or BULK_INDEXING_WORKERS or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    def record_upserted(count: int):
+        """Advance through the stream by the chunks of an upserted batch, recording completed files."""
+        while in_stream and (count or not in_stream[0][2]):
+            taken = min(count, in_stream[0][2])
+            in_stream[0][2] -= taken
+            count -= taken
+            if not in_stream[0][2]:
+                relative_path, stat, _, source_counts = in_stream.popleft()
+                # Stale chunks go first, a file recorded before they are deleted would never be cleaned up
+                for source, previous_count in checkpoint.sources.get(relative_path, {}).items():
+                    if previous_count > source_counts.get(source, 0):
+                        stats["chunks_deleted"] += delete_stale_chunks(vector_store, source, source_counts.get(source, 0), namespace, previous_count)
+                checkpoint.mark_done(relative_path, stat, source_counts)
+                stats["files_indexed"] += 1
+
+    def chunk_stream(executor: ProcessPoolExecutor) -> Iterator[Document]:
+        """Chunks of the files in completion order, keeping a bounded number of files in flight."""
+        pending_files = iter(files)
+        in_flight = {}
+
+        def submit_next() -> bool:
+            for path, relative_path, stat in pending_files:
+                future = executor.submit(chunk_file, path, relative_path, embedding_model, args.chunk_size, args.chunk_overlap, course)
+                in_flight[future] = (relative_path, stat)
+                return True
+            return False
+
+        for _ in range(workers * BULK_INDEXING_PREFETCH):
+            if not submit_next():
+                break
+
+        while in_flight:
+            waiting_since = time.perf_counter()
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            stats["waiting_seconds"] += time.perf_counter() - waiting_since
+
+            for future in done:
+                relative_path, stat = in_flight.pop(future)
+                submit_next()
+                try:
+                    chunks, seconds = future.result()
+                except Exception as e:
+                    # A failed file is left out of the checkpoint so the next run retries it
+                    logger.error(f"Chunking '{relative_path}'", e)
+                    stats["files_failed"] += 1
+                    stats["failed"].append(relative_path)
+                    continue
+
+                stats["chunking_seconds"] += seconds
+                in_stream.append([relative_path, stat, len(chunks), dict(Counter(chunk.metadata.get("source", "") for chunk in chunks))])
+                yield from chunks
+
+            # Files without chunks are complete as soon as the files before them are
+            record_upserted(0)
+
+    try:
+        with PeakRSSMonitor() as memory_monitor, ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                for batch, batch_tokens in upsert_document_batches(vector_store, chunk_stream(executor), embedding_model, namespace):
+                    stats["chunks"] += len(batch)
+                    stats["tokens"] += batch_tokens
+                    stats["batches"] += 1
+                    record_upserted(len(batch))
+                    stats["chunks_per_second"] = stats["chunks"] / (time.perf_counter() - started)
+                    logger.bulk_indexing(f"Batch {stats['batches']}", stats)
+                record_upserted(0)
+            except KeyboardInterrupt:
+                stats["interrupted"] = True
+                executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        checkpoint.close()
+
+    stats["elapsed"] = time.perf_counter() - started
+    stats["chunks_per_second"] = stats["chunks"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    stats["peak_mb"] = memory_monitor.peak_mb
+    stats["workers"] = workers
+    stats["checkpoint"] = checkpoint.path
+    return stats
+
+def print_report(stats: dict):
+    """Print the throughput report of a run."""
+    elapsed = stats["elapsed"] or 1e-9
+    print("Indexing interrupted, run the same command again to resume." if stats["interrupted"] else "Indexing finished.")
+    print(
+        f"Files: {stats['files_total']} found, {stats['files_skipped']} already indexed, "
+        f"{stats['files_indexed']} indexed, {stats['files_failed']} failed"
+    )
+    print(f"Chunks: {stats['chunks']} in {stats['batches']} batches, {stats['tokens']} tokens embedded, {stats['chunks_deleted']} stale chunks deleted")
+    print(
+        f"Throughput: {stats['files_indexed'] / elapsed:.2f} files/s, {stats['chunks'] / elapsed:.1f} chunks/s, "
+        f"{stats['tokens'] / elapsed:.0f} tokens/s over {stats['elapsed']:.1f}s"
+    )
+    # Time blocked on the workers shows whether chunking or the embedding upserts limit the run
+    print(
+        f"Chunking: {stats['chunking_seconds']:.1f}s of work over {stats['workers']} workers, "
+        f"upserts waited {stats['waiting_seconds']:.1f}s for chunks"
+    )
+    print(f"Peak RSS of the main process {stats['peak_mb']:.1f} MB, checkpoint {stats['checkpoint']}")
+    for relative_path in stats["failed"]:
+        print(f"Failed: {relative_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Directory tree of .pdf, .txt, .docx and .zip files")
+    parser.add_argument("--course", help="Course of the material, selecting its namespace; COURSE by default")
+    parser.add_argument("--index", help="Pinecone index name; the shard of the course, or PINECONE_INDEX_NAME without shards, by default")
+    parser.add_argument("--embedding-model", help="OpenAI embedding model; EMBEDDING_MODEL by default")
+    parser.add_argument("--workers", type=int, help="Extraction and chunking processes; BULK_INDEXING_WORKERS or the CPU count by default")
+    parser.add_argument("--chunk-size", type=int, help="Chunk size in tokens; CHUNK_SIZE_TOKENS by default")
+    parser.add_argument("--chunk-overlap", type=int, help="Chunk overlap in tokens; CHUNK_OVERLAP_TOKENS by default")
+    parser.add_argument("--checkpoint", help="Checkpoint file; named after the index and namespace in the current directory by default")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Not a directory: {args.directory}")
+
+    stats = run_indexing(args)
+    print_report(stats)
+    sys.exit(1 if stats["files_failed"] or stats["interrupted"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Export the chunks of an index namespace to a snapshot, or load a snapshot into an index.
+
+A snapshot is a directory of shards, each a .npy matrix of vectors and a .jsonl file
+with the id, text and metadata of each chunk, described by a manifest.json. Loading a
+snapshot sends the stored vectors directly, so rebuilding an index or moving a course
+to a new index costs no embedding requests. Exporting from Pinecone lists the vector
+ids of the namespace, which requires a serverless index.
+
+Credentials are read from the PINECONE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_MODEL
+and OPENAI_API_KEY environment variables, and the course from COURSE.
+
+Run from the app directory:
+    python -m cli.index_snapshot export ./snapshots/algorithms --course "Algorithms"
+    python -m cli.index_snapshot import ./snapshots/algorithms --course "Algorithms" --index new-index
+"""
+import argparse
+import sys
+import time
+from config.settings import SNAPSHOT_BATCH_SIZE, SNAPSHOT_SHARD_SIZE, SNAPSHOT_UPSERT_WORKERS
+from services.chat_runner import settings_from_env
+from services.index_snapshot import SNAPSHOT_PRECISIONS, export_snapshot, import_snapshot, snapshot_bytes
+from services.vectorstore_service import course_namespace, initialize_vectorstore, write_shard
+
+def open_vectorstore(args) -> tuple:
+    """Initialize the vector store of the command, returning it with its namespace and embedding model."""
+    settings = settings_from_env()
+    course = args.course if args.course is not None else settings["course"]
+    embedding_model = args.embedding_model or settings["embedding_model"]
+    namespace = course_namespace(course)
+    # Imports without an explicit index go to the shard of the course
+    index_name = args.index or (write_shard(settings["pinecone_index_name"], course) if args.command == "import" else settings["pinecone_index_name"])
+    vector_store = initialize_vectorstore(settings["pinecone_api_key"], index_name, embedding_model, settings["openai_api_key"], namespace)
+    return vector_store, namespace, embedding_model
+
+def run_export(args):
+    vector_store, namespace, embedding_model = open_vectorstore(args)
+    started = time.perf_counter()
+    manifest = export_snapshot(vector_store, args.path, embedding_model, namespace, args.precision, args.shard_size, args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    size_mb = snapshot_bytes(args.path) / (1024 * 1024)
+    print(f"Exported {manifest['count']} chunks of {manifest['dimensions']} dimensions in {len(manifest['shards'])} shards to {args.path}")
+    print(f"Snapshot size {size_mb:.1f} MB at {args.precision}, {elapsed:.1f}s, {manifest['count'] / elapsed if elapsed else 0:.0f} chunks/s")
+
+def run_import(args):
+    vector_store, namespace, embedding_model = open_vectorstore(args)
+    stats = import_snapshot(vector_store, args.path, embedding_model, namespace, args.batch_size, args.workers)
+    print(f"Imported {stats['count']} chunks in {stats['batches']} upserts of up to {args.batch_size} with {args.workers} workers")
+    print(f"{stats['seconds']:.1f}s, {stats['count'] / stats['seconds'] if stats['seconds'] else 0:.0f} chunks/s, no embedding requests")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write the chunks of an index namespace to a snapshot")
+    export_parser.add_argument("--precision", choices=sorted(SNAPSHOT_PRECISIONS), default="float32", help="Precision of the stored vectors")
+    export_parser.add_argument("--shard-size", type=int, default=SNAPSHOT_SHARD_SIZE, help="Chunks per shard file")
+    export_parser.set_defaults(run=run_export)
+
+    import_parser = commands.add_parser("import", help="Load a snapshot into an index namespace")
+    import_parser.add_argument("--workers", type=int, default=SNAPSHOT_UPSERT_WORKERS, help="Concurrent upsert requests")
+    import_parser.set_defaults(run=run_import)
+
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument("path", help="Snapshot directory")
+        command_parser.add_argument("--course", help="Course of the chunks, selecting the namespace; COURSE by default")
+        command_parser.add_argument("--index", help="Pinecone index name; PINECONE_INDEX_NAME by default, or the shard of the course on import")
+        command_parser.add_argument("--embedding-model", help="OpenAI embedding model; EMBEDDING_MODEL by default")
+        command_parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE, help="Chunks per read or upsert request")
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
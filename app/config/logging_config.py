@@ -3,7 +3,9 @@ from rich.logging import RichHandler
 from utils.chat_formatter import format_chat_messages
 
 def setup_logging():
-    logging.basicConfig(level=logging.INFO, format="%(message)s",handlers=[RichHandler(rich_tracebacks=True, markup=True)])
+    # Configure the root handler once, Streamlit reruns and module imports call this repeatedly
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(message)s",handlers=[RichHandler(rich_tracebacks=True, markup=True)])
     logger = logging.getLogger(__name__)
     return logger
 
@@ -25,6 +27,15 @@ class EnhancedLogger:
     def tool_document(self, tool_action, retrieved_docs):
         self.logger.info(f"\n[#26F5C9][TOOL][/#26F5C9] [#4169E1][{tool_action}][/#4169E1] -> {len(retrieved_docs)}\n")
 
+    def embedding_batch(self, batch_number, chunk_count, batch_tokens):
+        self.logger.info(f"[#1E90FF][EMBEDDING][/#1E90FF] [#4169E1][Batch {batch_number}][/#4169E1] {chunk_count} chunks, {batch_tokens} tokens\n")
+
+    def stale_chunks(self, source, chunk_count):
+        self.logger.info(f"[#1E90FF][STALE CHUNKS][/#1E90FF] [#4169E1][Deleted][/#4169E1] {chunk_count} chunks of '{source}' past its current end\n")
+
+    def memory_usage(self, memory_info, peak_mb, growth_mb):
+        self.logger.info(f"[#1E90FF][MEMORY][/#1E90FF] [#4169E1][{memory_info}][/#4169E1] Peak RSS {peak_mb:.1f} MB (+{growth_mb:.1f} MB)\n")
+
     def initializing(self):
         self.logger.info("[#18F54A][INITIALIZING][/#18F54A]\n")
 
@@ -46,6 +57,45 @@ class EnhancedLogger:
     def llm_tool_last_message(self, llm_role_info, message):
         self.logger.info(f"[#6819B3][LLM TOOL][/#6819B3] [#4169E1][{llm_role_info}][/#4169E1] '{message}'\n")
 
+    def token_usage(self, llm_action, prompt_tokens, output_tokens, saved_prompt_tokens, saved_output_tokens):
+        self.logger.info(f"[#6819B3][TOKENS][/#6819B3] [#4169E1][{llm_action}][/#4169E1] prompt {prompt_tokens}, output {output_tokens} | saved prompt {saved_prompt_tokens}, saved output {saved_output_tokens}\n")
+
+    def node_usage(self, node, model, seconds, first_token_seconds, prompt_tokens, output_tokens):
+        first_token = f", first token {first_token_seconds:.2f}s" if first_token_seconds is not None else ""
+        self.logger.info(f"[#6819B3][NODE][/#6819B3] [#4169E1][{node.capitalize()} node, {model}][/#4169E1] {seconds:.2f}s{first_token} | prompt {prompt_tokens}, output {output_tokens} tokens\n")
+
+    def speculation(self, speculation_result, stats):
+        self.logger.info(f"[#26F5C9][SPECULATION][/#26F5C9] [#4169E1][{speculation_result}][/#4169E1] hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses, {stats['discarded']} discarded), time saved {stats['time_saved']:.2f}s\n")
+
+    def connection_pool(self, stats):
+        self.logger.info(f"[#6819B3][LLM POOL][/#6819B3] [#4169E1][{stats['clients']} clients][/#4169E1] {stats['requests']} requests over {stats['connections']} connections, {stats['reused_connections']} reused | registry hits {stats['hits']}, misses {stats['misses']}, evictions {stats['evictions']}\n")
+
+    def llm_scheduler(self, stats):
+        self.logger.info(f"[#6819B3][LLM QUEUE][/#6819B3] [#4169E1][{stats['in_flight']}/{stats['max_concurrency']} in flight][/#4169E1] {stats['queue_depth']} queued ({stats['queued_decisions']} decisions, {stats['queued_answers']} answers) | wait p50 {stats['wait_p50']:.2f}s, p95 {stats['wait_p95']:.2f}s | tokens available {stats['tokens_available']} | timed out {stats['timed_out']}, throttled {stats['throttled']}\n")
+
+    def shard_search(self, answered, total, failed, seconds):
+        failed_info = f", no answer from {', '.join(failed)}" if failed else ""
+        self.logger.info(f"[#26F5C9][SHARDS][/#26F5C9] [#4169E1][{answered}/{total} shards answered][/#4169E1] {seconds:.2f}s{failed_info}\n")
+
+    def coalescing(self, retrieval_stats, embedding_stats):
+        self.logger.info(f"[#26F5C9][COALESCING][/#26F5C9] [#4169E1][Deduplicated in-flight calls][/#4169E1] retrieval {retrieval_stats['deduplicated']}/{retrieval_stats['calls']} ({retrieval_stats['dedup_rate']:.0%}), embedding {embedding_stats['deduplicated']}/{embedding_stats['calls']} ({embedding_stats['dedup_rate']:.0%})\n")
+
+    def query_router(self, route_info, stats):
+        accuracy = f"{stats['accuracy']:.0%}" if stats['accuracy'] is not None else "n/a"
+        self.logger.info(f"[#26F5C9][ROUTER][/#26F5C9] [#4169E1][{route_info}][/#4169E1] coverage {stats['coverage']:.0%} ({stats['routed']} routed, {stats['ambiguous']} to the LLM) | agreement with the LLM {accuracy} over {stats['compared']} | {stats['fast_paths']} decisions skipped, time saved {stats['time_saved']:.2f}s\n")
+
+    def session_memory(self, session_stats, total_stats):
+        self.logger.info(f"[#1E90FF][SESSION MEMORY][/#1E90FF] [#4169E1][{session_stats['messages']} messages][/#4169E1] {session_stats['memory_bytes'] / 1024:.1f} KB in memory, {session_stats['spilled']} spilled | all sessions: {total_stats['sessions']} sessions, {total_stats['memory_bytes'] / 1024:.1f} KB, largest {total_stats['max_session_bytes'] / 1024:.1f} KB\n")
+
+    def bulk_indexing(self, progress_info, stats):
+        self.logger.info(f"[#1E90FF][BULK INDEXING][/#1E90FF] [#4169E1][{progress_info}][/#4169E1] {stats['files_indexed']}/{stats['files_total']} files, {stats['files_failed']} failed | {stats['chunks']} chunks, {stats['tokens']} tokens, {stats['chunks_per_second']:.1f} chunks/s\n")
+
+    def snapshot_progress(self, snapshot_action, count, total):
+        self.logger.info(f"[#1E90FF][SNAPSHOT][/#1E90FF] [#4169E1][{snapshot_action}][/#4169E1] {count}/{total} chunks\n")
+
+    def resilience(self, provider, status):
+        self.logger.warning(f"[#FF8C00][RESILIENCE][/#FF8C00] [#4169E1][{provider}][/#4169E1] {status}\n")
+
     def parser_error(self, parser_status):
         self.logger.error(f"[#FF4F4F][PARSER][/#FF4F4F] {parser_status}\n")
 
@@ -0,0 +1,152 @@
+import json
+import os
+
+# Token-aware chunking
+# Chunk sizes are measured in tokens of the configured embedding model tokenizer
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+# Fallback tokenizer encoding for embedding models unknown to tiktoken
+DEFAULT_TOKENIZER_ENCODING = os.getenv("DEFAULT_TOKENIZER_ENCODING", "cl100k_base")
+
+# Embedding request packing
+# OpenAI accepts up to 300k tokens and 2048 inputs per embedding request
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+EMBEDDING_BATCH_MAX_CHUNKS = int(os.getenv("EMBEDDING_BATCH_MAX_CHUNKS", "1000"))
+# Vectors per upsert request once a batch is embedded, Pinecone limits requests to 2 MB
+INDEXING_UPSERT_BATCH_SIZE = int(os.getenv("INDEXING_UPSERT_BATCH_SIZE", "100"))
+
+# Memory-budgeted ingestion
+# The budget bounds upload spooling and the text window held in memory while chunking
+INGESTION_MEMORY_BUDGET_MB = int(os.getenv("INGESTION_MEMORY_BUDGET_MB", "256"))
+TEXT_DECODE_BLOCK_BYTES = int(os.getenv("TEXT_DECODE_BLOCK_BYTES", str(64 * 1024)))
+
+# Speculative retrieval
+# Minimum overlap (Jaccard similarity) between the user message and the tool query words to reuse a prefetched search
+SPECULATION_MIN_QUERY_OVERLAP = float(os.getenv("SPECULATION_MIN_QUERY_OVERLAP", "0.8"))
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", "8"))
+
+# Number of chunks returned by the retrieval tool
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+
+# Maritalk client pool
+MARITALK_API_URL = os.getenv("MARITALK_API_URL", "https://chat.maritaca.ai/api/chat/inference")
+LLM_CLIENT_POOL_SIZE = int(os.getenv("LLM_CLIENT_POOL_SIZE", "32"))
+LLM_HTTP_POOL_MAXSIZE = int(os.getenv("LLM_HTTP_POOL_MAXSIZE", "16"))
+
+# Provider resilience
+# Timeouts and budgets are in seconds, the budget bounds all attempts of a call including backoff
+MARITALK_CONNECT_TIMEOUT = float(os.getenv("MARITALK_CONNECT_TIMEOUT", "5"))
+MARITALK_READ_TIMEOUT = float(os.getenv("MARITALK_READ_TIMEOUT", "60"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "30"))
+LLM_CALL_BUDGET = float(os.getenv("LLM_CALL_BUDGET", "45"))
+EMBEDDING_CALL_TIMEOUT = float(os.getenv("EMBEDDING_CALL_TIMEOUT", "5"))
+VECTORSTORE_CALL_TIMEOUT = float(os.getenv("VECTORSTORE_CALL_TIMEOUT", "5"))
+RETRIEVAL_CALL_BUDGET = float(os.getenv("RETRIEVAL_CALL_BUDGET", "10"))
+RETRIEVAL_HEDGE_DELAY = float(os.getenv("RETRIEVAL_HEDGE_DELAY", "0.5"))
+INDEXING_CALL_TIMEOUT = float(os.getenv("INDEXING_CALL_TIMEOUT", "60"))
+INDEXING_CALL_BUDGET = float(os.getenv("INDEXING_CALL_BUDGET", "180"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Threads running the attempts of each provider, timed-out attempts hold theirs until the provider answers
+PROVIDER_CALL_WORKERS = int(os.getenv("PROVIDER_CALL_WORKERS", "32"))
+
+# Chat API
+# When CHAT_API_URL is set the Streamlit app sends chat turns to the API instead of running the graph in-process
+CHAT_API_URL = os.getenv("CHAT_API_URL", "")
+# Bind to the loopback interface unless the API is deliberately exposed, e.g. behind a reverse proxy
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+# Bearer token required by /chat and /metrics, and sent by the Streamlit app; the API rejects them while it is empty
+CHAT_API_TOKEN = os.getenv("CHAT_API_TOKEN", "")
+
+# Vector store backend
+# "memory" replaces Pinecone with an in-process store for local runs and load tests
+VECTORSTORE_BACKEND = os.getenv("VECTORSTORE_BACKEND", "pinecone")
+
+# Number of initialized vector stores kept per process, one per set of connection settings
+VECTORSTORE_CACHE_SIZE = int(os.getenv("VECTORSTORE_CACHE_SIZE", "16"))
+
+# Chat history rendering
+# The last CHAT_HISTORY_WINDOW messages are rendered as chat messages, older ones are paged in a collapsed transcript
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "25"))
+
+# Embedding storage
+# Dimensions requested from text-embedding-3 models, truncated by the provider; 0 keeps the model width.
+# The Pinecone index must be created with the same dimension.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+# Precision of the vectors held by the local vector store: "float32", "float16" or "int8"
+LOCAL_VECTOR_PRECISION = os.getenv("LOCAL_VECTOR_PRECISION", "float32")
+# Quantized candidates rescored at full precision per requested result, 0 disables rescoring
+LOCAL_VECTOR_RESCORE_FACTOR = int(os.getenv("LOCAL_VECTOR_RESCORE_FACTOR", "4"))
+
+# LLM admission control
+# Concurrent Maritalk calls and tokens per minute allowed per process, 0 disables the token limit
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Seconds a call may wait for admission before failing
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+# Output tokens reserved at admission, corrected with the actual output when the call ends
+LLM_DECISION_OUTPUT_ESTIMATE = int(os.getenv("LLM_DECISION_OUTPUT_ESTIMATE", "64"))
+LLM_ANSWER_OUTPUT_ESTIMATE = int(os.getenv("LLM_ANSWER_OUTPUT_ESTIMATE", "800"))
+
+# Session message store
+# Bytes of messages a session keeps in memory before spilling its oldest messages to disk
+SESSION_MEMORY_CAP_BYTES = int(os.getenv("SESSION_MEMORY_CAP_KB", "512")) * 1024
+# Directory of the spill files, the system temporary directory when empty
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+
+# Bulk directory indexing
+# Processes extracting and chunking files, the number of CPUs when 0
+BULK_INDEXING_WORKERS = int(os.getenv("BULK_INDEXING_WORKERS", "0"))
+# Files chunked ahead of the embedding upserts per worker, bounding the chunks held in memory
+BULK_INDEXING_PREFETCH = int(os.getenv("BULK_INDEXING_PREFETCH", "2"))
+
+# Local query router
+# "off" always asks the LLM whether to retrieve, "shadow" routes locally and only compares with the LLM decision
+# of real sessions, reported by /metrics; evaluate labelled questions with benchmark/query_router_eval.py
+QUERY_ROUTER_MODE = os.getenv("QUERY_ROUTER_MODE", "shadow")
+# Keyword score from which a message is routed to retrieval without the LLM
+QUERY_ROUTER_MIN_SCORE = float(os.getenv("QUERY_ROUTER_MIN_SCORE", "1.0"))
+
+# Per-node LLM profiles
+# The decision step of query_or_respond only writes a short tool call, its direct replies are discarded and streamed
+# again with the "direct" profile, so it runs on a small model with a low temperature and a small output cap
+LLM_NODE_PROFILES = {
+    "decision": {
+        "model": os.getenv("LLM_DECISION_MODEL", "sabiazinho-3"),
+        "temperature": float(os.getenv("LLM_DECISION_TEMPERATURE", "0.1")),
+        "max_tokens": int(os.getenv("LLM_DECISION_MAX_TOKENS", "256")),
+    },
+    "direct": {
+        "model": os.getenv("LLM_DIRECT_MODEL", "sabia-3"),
+        "temperature": float(os.getenv("LLM_DIRECT_TEMPERATURE", "0.8")),
+        "max_tokens": int(os.getenv("LLM_DIRECT_MAX_TOKENS", "4096")),
+    },
+    "generate": {
+        "model": os.getenv("LLM_GENERATE_MODEL", "sabia-3"),
+        "temperature": float(os.getenv("LLM_GENERATE_TEMPERATURE", "0.8")),
+        "max_tokens": int(os.getenv("LLM_GENERATE_MAX_TOKENS", "4096")),
+    },
+}
+
+# Index snapshots
+# Chunks per snapshot shard file, chunks per read or upsert request, and concurrent upserts on import
+SNAPSHOT_SHARD_SIZE = int(os.getenv("SNAPSHOT_SHARD_SIZE", "10000"))
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "100"))
+SNAPSHOT_UPSERT_WORKERS = int(os.getenv("SNAPSHOT_UPSERT_WORKERS", "8"))
+
+# Sharded retrieval
+# Pinecone indexes searched together, comma-separated; when empty only the index of the chat settings is used.
+# Writes of a course not in the shard map go to one of these indexes, chosen by a stable hash of the course.
+VECTORSTORE_SHARDS = [name.strip() for name in os.getenv("VECTORSTORE_SHARDS", "").split(",") if name.strip()]
+# Indexes of specific courses as JSON, keyed by course namespace: {"algorithms": ["algo-2025-2", "algo-2025-1"]}.
+# A course is searched across all its indexes and written to the first one.
+VECTORSTORE_SHARD_MAP = json.loads(os.getenv("VECTORSTORE_SHARD_MAP", "{}"))
+# Seconds a shard may take to answer a search before the merge goes on without it
+SHARD_SEARCH_TIMEOUT = float(os.getenv("SHARD_SEARCH_TIMEOUT", "3"))
+SHARD_SEARCH_MAX_WORKERS = int(os.getenv("SHARD_SEARCH_MAX_WORKERS", "16"))
@@ -0,0 +1,31 @@
+from langchain_core.runnables import RunnableConfig
+
+class ChatEventSink:
+    """
+    Receives the output of a chat turn while the graph runs.
+
+    The graph never writes to a UI directly: it reports its progress as named events
+    and streams answer tokens to the sink found in the run config. This base class
+    discards everything, subclasses forward to Streamlit, an HTTP stream or a test.
+
+    Events:
+        queue_position: A model call waits for a free slot, with its position in the
+            queue; position 0 once it is admitted.
+        tool_call: The assistant decided to search the knowledge base, with the query.
+        message_start: An answer starts streaming, with its mode ("direct" or "rag").
+        message_end: The answer finished streaming, with its full content.
+    """
+    def on_event(self, event: str, data: dict) -> None:
+        pass
+
+    def on_token(self, token: str) -> None:
+        pass
+
+def get_event_sink(config: RunnableConfig) -> ChatEventSink:
+    """Get the event sink of a graph run, or one discarding everything when none is configured."""
+    return (config or {}).get("configurable", {}).get("event_sink") or ChatEventSink()
+
+def get_session_id(config: RunnableConfig) -> str:
+    """Get the chat session of a graph run, falling back to the run's own thread."""
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("session_id") or configurable.get("thread_id") or "default"
@@ -1,4 +1,4 @@
-from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.callbacks import BaseCallbackHandler
 
 class StreamHandler(BaseCallbackHandler):
     """ 
@@ -12,4 +12,15 @@ class StreamHandler(BaseCallbackHandler):
     def on_llm_new_token(self, token: str, **kwargs) -> None:
         """ Append new tokens to the response and update the UI dynamically."""
         self.text += token
-        self.container.markdown(self.text)
\ No newline at end of file
+        self.container.markdown(self.text)
+
+class TokenSinkHandler(BaseCallbackHandler):
+    """
+    A callback handler forwarding the streamed LLM tokens to a chat event sink.
+    """
+    def __init__(self, sink):
+        self.sink = sink
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        """ Forward each new token to the sink."""
+        self.sink.on_token(token)
@@ -0,0 +1,39 @@
+import streamlit as st
+from hook.chat_events import ChatEventSink
+from hook.stream_handler import StreamHandler
+
+# Avatar of the assistant message for each answer mode
+ANSWER_AVATARS = {
+    "direct": ":material/mindfulness:",
+    "rag": ":material/psychology:",
+}
+
+class StreamlitEventSink(ChatEventSink):
+    """
+    Renders the events of a chat turn in the Streamlit app.
+    Each answer gets its own assistant chat message updated as tokens arrive.
+    """
+    def __init__(self):
+        self.stream_handler = None
+        self.queue_placeholder = None
+
+    def on_event(self, event: str, data: dict) -> None:
+        if event == "queue_position":
+            if self.queue_placeholder is None:
+                self.queue_placeholder = st.empty()
+            if data.get("position"):
+                self.queue_placeholder.info(f"Many students are asking right now, you are number {data['position']} in the queue.", icon=":material/hourglass_top:")
+            else:
+                self.queue_placeholder.empty()
+
+        elif event == "tool_call":
+            st.toast("I will use the tool to get more information, please wait a moment.", icon=":material/robot:")
+
+        elif event == "message_start":
+            avatar = ANSWER_AVATARS.get(data.get("mode"), ":material/smart_toy:")
+            stream_container = st.chat_message("assistant", avatar=avatar).empty()
+            self.stream_handler = StreamHandler(stream_container)
+
+    def on_token(self, token: str) -> None:
+        if self.stream_handler is not None:
+            self.stream_handler.on_llm_new_token(token)
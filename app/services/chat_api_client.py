@@ -0,0 +1,65 @@
+import json
+import requests
+from typing import Iterator, List, Optional, Tuple
+from langchain_core.messages import BaseMessage
+from config.settings import CHAT_API_TOKEN
+from hook.chat_events import ChatEventSink
+from utils.message_codec import messages_from_dicts, messages_to_dicts
+
+class RemoteChatError(RuntimeError):
+    """Error reported by the chat API while running a turn."""
+    def __init__(self, payload: dict):
+        self.error_type = payload.get("type", "")
+        self.status_code = payload.get("status")
+        super().__init__(payload.get("message", "The chat API failed to answer."))
+
+def iter_sse(response: requests.Response) -> Iterator[Tuple[str, dict]]:
+    """Parse the server-sent events of a streaming response."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def run_remote_chat_turn(api_url: str, messages: List[BaseMessage], settings: dict, sink: ChatEventSink, session_id: Optional[str] = None) -> List[BaseMessage]:
+    """
+    Run one chat turn through the chat API, forwarding its events to the sink.
+
+    Args:
+        api_url (str): Base URL of the chat API.
+        messages (List[BaseMessage]): The conversation, ending with the user's new message.
+        settings (dict): Credentials and options of the turn.
+        sink (ChatEventSink): Receives the turn events and the streamed answer tokens.
+        session_id (str, optional): The chat session, for fair scheduling of its LLM calls.
+
+    Returns:
+        List[BaseMessage]: The conversation including the assistant answer.
+
+    Raises:
+        RemoteChatError: If the API reports an error or the stream ends without an answer.
+    """
+    payload = {"messages": messages_to_dicts(messages), "settings": settings, "session_id": session_id}
+    headers = {"Authorization": f"Bearer {CHAT_API_TOKEN}"}
+
+    with requests.post(f"{api_url.rstrip('/')}/chat", json=payload, headers=headers, stream=True, timeout=(5, 120)) as response:
+        if not response.ok:
+            raise RemoteChatError({"message": response.text, "status": response.status_code})
+
+        for event, data in iter_sse(response):
+            if event == "token":
+                sink.on_token(data["text"])
+            elif event == "done":
+                return messages_from_dicts(data["messages"])
+            elif event == "error":
+                raise RemoteChatError(data)
+            else:
+                sink.on_event(event, data)
+
+    raise RemoteChatError({"message": "The chat API stream ended without an answer."})
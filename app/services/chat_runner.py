@@ -0,0 +1,84 @@
+import os
+import uuid
+from typing import List, Optional
+from langchain_core.messages import BaseMessage
+from hook.chat_events import ChatEventSink
+from utils.message_codec import message_role
+
+# Settings accepted by a chat turn, passed to the graph state
+CHAT_SETTING_KEYS = (
+    "llm_api_key",
+    "pinecone_api_key",
+    "pinecone_index_name",
+    "embedding_model",
+    "openai_api_key",
+    "course",
+    "speculative_retrieval",
+)
+
+# Settings granting access to the provider accounts and indexes of a deployment
+CREDENTIAL_SETTING_KEYS = (
+    "llm_api_key",
+    "pinecone_api_key",
+    "pinecone_index_name",
+    "embedding_model",
+    "openai_api_key",
+)
+
+def settings_from_env() -> dict:
+    """Read the default chat settings of a headless deployment from environment variables."""
+    return {
+        "llm_api_key": os.getenv("LLM_API_KEY", ""),
+        "pinecone_api_key": os.getenv("PINECONE_API_KEY", ""),
+        "pinecone_index_name": os.getenv("PINECONE_INDEX_NAME", ""),
+        "embedding_model": os.getenv("EMBEDDING_MODEL", ""),
+        "openai_api_key": os.getenv("OPENAI_API_KEY", ""),
+        "course": os.getenv("COURSE", ""),
+        "speculative_retrieval": os.getenv("SPECULATIVE_RETRIEVAL", "").lower() in ("1", "true", "yes"),
+    }
+
+def compact_history(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Keep the conversation messages, dropping the tool calls and tool results of the turn.
+
+    The documents retrieved by a tool are replaced by their chunk ids, recorded on the
+    answer that follows under additional_kwargs["chunk_ids"].
+    """
+    compacted, chunk_ids = [], []
+    for message in messages:
+        if message.type == "tool":
+            chunk_ids.extend(doc.id for doc in (getattr(message, "artifact", None) or []) if getattr(doc, "id", None))
+            continue
+        if not message_role(message):
+            continue
+        if chunk_ids and message_role(message) == "assistant":
+            message = message.model_copy(update={"additional_kwargs": {**message.additional_kwargs, "chunk_ids": chunk_ids}})
+            chunk_ids = []
+        compacted.append(message)
+    return compacted
+
+def run_chat_turn(messages: List[BaseMessage], settings: dict, sink: Optional[ChatEventSink] = None, session_id: Optional[str] = None) -> List[BaseMessage]:
+    """
+    Run one chat turn through the graph, independently of any UI.
+
+    Args:
+        messages (List[BaseMessage]): The conversation, ending with the user's new message.
+        settings (dict): Credentials and options of the turn, see CHAT_SETTING_KEYS.
+        sink (ChatEventSink, optional): Receives the turn events and the streamed answer tokens.
+        session_id (str, optional): The chat session, for fair scheduling of its LLM calls.
+
+    Returns:
+        List[BaseMessage]: The conversation including the assistant answer.
+    """
+    # The graph module pulls in LangGraph and the provider SDKs, load it with the first turn
+    from services.state_machine import build_graph
+
+    state = {"messages": messages}
+    state.update({key: settings.get(key) for key in CHAT_SETTING_KEYS})
+
+    thread_id = str(uuid.uuid4())
+    output = build_graph().invoke(
+        state,
+        {"configurable": {"thread_id": thread_id, "session_id": session_id or thread_id, "event_sink": sink or ChatEventSink()}}
+    )
+    return compact_history(output["messages"])
@@ -1,17 +1,20 @@
 import uuid
 import streamlit as st
 from config.logging_config import setup_logging, EnhancedLogger
-from services.state_machine import app
-from utils.error_handler import handle_maritalk_error, handle_runtime_error, handle_unexpected_error
+from config.settings import CHAT_API_URL
+from hook.streamlit_sink import StreamlitEventSink
+from services.chat_api_client import RemoteChatError, run_remote_chat_turn
+from services.resilience import CircuitOpenError, CallTimeoutError
+from services.session_store import SessionMessageStore, session_memory_stats
+from utils.error_handler import handle_maritalk_error, handle_provider_unavailable, handle_runtime_error, handle_unexpected_error
 from langchain_core.messages import HumanMessage
-from langchain_community.chat_models.maritalk import MaritalkHTTPError
 
 logger = EnhancedLogger(setup_logging())
 
 def handle_user_input(prompt: str):
     """
-    Handle user input by appending it to the chat history, invoking the LLM, 
-    and updating the session state with the response.
+    Handle user input by invoking the LLM and appending the message and the
+    response to the chat history once the turn succeeds.
 
     Args:
         prompt (str): The user's input message.        
@@ -37,38 +40,74 @@ def handle_user_input(prompt: str):
         logger.warning("Pinecone index name is missing. User cannot proceed without it.")
         return
 
+    # Define the embedding settings injected into the retrieval tool
+    embedding_model = st.session_state.get("embedding_model")
+    openai_api_key = st.session_state.get("openai_api_key")
+
     # Loggers for auditing authentication
     logger.auth(llm_api_key, pinecone_api_key, pinecone_index_name)
 
     # Initialize the chat history if not already present
     if "messages" not in st.session_state:
-        st.session_state["messages"] = []
+        st.session_state["messages"] = SessionMessageStore()
+    store = st.session_state["messages"]
 
-    # Append the user's message to the chat history
-    st.session_state["messages"].append(HumanMessage(content=prompt))
+    # The user's message joins the chat history only once its turn succeeds, so a failed turn can be sent again
     st.chat_message("user", avatar=":material/face:").write(prompt)
+    prior_messages = store.to_messages()
+    turn_messages = prior_messages + [HumanMessage(content=prompt)]
+
+    # Identify the browser session so its LLM calls are queued fairly against other sessions
+    session_id = st.session_state.setdefault("session_id", str(uuid.uuid4()))
+
+    settings = {
+        "llm_api_key": llm_api_key,
+        "pinecone_api_key": pinecone_api_key,
+        "pinecone_index_name": pinecone_index_name,
+        "embedding_model": embedding_model,
+        "openai_api_key": openai_api_key,
+        "course": st.session_state.get("course"),
+        "speculative_retrieval": st.session_state.get("speculative_retrieval", False),
+    }
+
+    # The graph and the Maritalk client are loaded with the first message, not at app start
+    from langchain_community.chat_models.maritalk import MaritalkHTTPError
+    from services.chat_runner import run_chat_turn
+    from services.llm_client_pool import llm_client_pool
+    from services.llm_scheduler import llm_scheduler
 
     try:
-        # Invoke the state machine to process the input
-        thread_id = str(uuid.uuid4())
-        output = app.invoke(
-            {
-                "messages": st.session_state["messages"],
-                "llm_api_key": llm_api_key,
-                "pinecone_api_key": pinecone_api_key,
-                "pinecone_index_name": pinecone_index_name,
-            },
-            {"configurable": {"thread_id": thread_id}}
-        )
-
-        # Update the session state with the new chat history
-        st.session_state["messages"] = output["messages"]
-        logger.chat_history(output["messages"])
+        # Run the turn through the chat API when configured, otherwise run the graph in-process
+        sink = StreamlitEventSink()
+        if CHAT_API_URL:
+            messages = run_remote_chat_turn(CHAT_API_URL, turn_messages, settings, sink, session_id)
+        else:
+            messages = run_chat_turn(turn_messages, settings, sink, session_id)
+            logger.connection_pool(llm_client_pool.stats())
+            logger.llm_scheduler(llm_scheduler.metrics())
+
+        # Keep the user's message and the new messages of the turn in the compact session store
+        store.record_turn(prior_messages, messages)
+        logger.chat_history(messages)
+        logger.session_memory(store.stats(), session_memory_stats())
 
     except MaritalkHTTPError as e:
         logger.error("Maritalk API", e)
         handle_maritalk_error(e)
 
+    except RemoteChatError as rce:
+        logger.error("Chat API", rce)
+        if rce.error_type == "MaritalkHTTPError":
+            handle_maritalk_error(rce)
+        elif rce.error_type in ("CircuitOpenError", "CallTimeoutError", "QueueTimeoutError"):
+            handle_provider_unavailable(rce)
+        else:
+            handle_runtime_error(rce)
+
+    except (CircuitOpenError, CallTimeoutError) as ue:
+        logger.error("Provider unavailable", ue)
+        handle_provider_unavailable(ue)
+
     except RuntimeError as re:
         logger.error("Runtime state machine invocation", re)
         handle_runtime_error(re)
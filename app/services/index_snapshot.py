@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import EMBEDDING_DIMENSIONS, SNAPSHOT_SHARD_SIZE, SNAPSHOT_BATCH_SIZE, SNAPSHOT_UPSERT_WORKERS
+from services.resilience import INDEXING_POLICY, call_with_resilience
+
+logger = EnhancedLogger(setup_logging())
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+
+# Metadata key of the chunk text in Pinecone, as written by PineconeVectorStore
+PINECONE_TEXT_KEY = "text"
+
+# Precisions of the snapshot vectors, float16 halves the snapshot for a small rounding of the vectors
+SNAPSHOT_PRECISIONS = {"float32": np.float32, "float16": np.float16}
+
+# Columns of a batch of indexed chunks: ids, texts, metadata and vectors
+EmbeddingBatch = Tuple[List[str], List[str], List[dict], np.ndarray]
+
+def iter_index_embeddings(vector_store, namespace: Optional[str] = None, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Iterator[EmbeddingBatch]:
+    """
+    Read the chunks of a vector store with their stored vectors, in batches.
+
+    Local stores are read directly. Pinecone indexes are listed page by page and the
+    vectors of each page are fetched, which requires a serverless index.
+
+    Args:
+        vector_store: The initialized vector store.
+        namespace (str, optional): The Pinecone namespace to read, the default namespace if empty.
+        batch_size (int): Chunks per batch.
+
+    Yields:
+        EmbeddingBatch: The ids, texts, metadata and vectors of a batch of chunks.
+    """
+    if hasattr(vector_store, "iter_embeddings"):
+        yield from vector_store.iter_embeddings(batch_size)
+        return
+
+    index = vector_store.index
+    for page_ids in index.list(namespace=namespace or None, limit=min(batch_size, 100)):
+        if not page_ids:
+            continue
+        fetched = call_with_resilience(lambda: index.fetch(ids=page_ids, namespace=namespace or None), INDEXING_POLICY).vectors
+        ids, texts, metadatas, vectors = [], [], [], []
+        for vector_id in page_ids:
+            vector = fetched.get(vector_id)
+            if vector is None:
+                continue
+            metadata = dict(vector.metadata or {})
+            ids.append(vector_id)
+            texts.append(metadata.pop(PINECONE_TEXT_KEY, ""))
+            metadatas.append(metadata)
+            vectors.append(vector.values)
+        if ids:
+            yield ids, texts, metadatas, np.asarray(vectors, dtype=np.float32)
+
+def upsert_embeddings(vector_store, batch: EmbeddingBatch, namespace: Optional[str] = None):
+    """Write a batch of chunks with their vectors to a vector store, without embedding them."""
+    ids, texts, metadatas, vectors = batch
+    if hasattr(vector_store, "add_embeddings"):
+        vector_store.add_embeddings(texts, vectors, metadatas, ids)
+        return
+
+    records = [
+        {"id": vector_id, "values": vector.tolist(), "metadata": {**metadata, PINECONE_TEXT_KEY: text}}
+        for vector_id, text, metadata, vector in zip(ids, texts, metadatas, vectors.astype(np.float32))
+    ]
+    call_with_resilience(lambda: vector_store.index.upsert(vectors=records, namespace=namespace or None, show_progress=False), INDEXING_POLICY)
+
+def existing_ids(vector_store, ids: List[str], namespace: Optional[str] = None) -> set:
+    """Ids of a list held by a vector store."""
+    if hasattr(vector_store, "add_embeddings"):
+        return {doc.id for doc in vector_store.get_by_ids(ids)}
+    return set(call_with_resilience(lambda: vector_store.index.fetch(ids=ids, namespace=namespace or None), INDEXING_POLICY).vectors)
+
+def delete_embeddings(vector_store, ids: List[str], namespace: Optional[str] = None):
+    """Delete chunks from a vector store by id, ids it does not hold are ignored."""
+    if hasattr(vector_store, "add_embeddings"):
+        vector_store.delete(ids)
+        return
+    call_with_resilience(lambda: vector_store.index.delete(ids=ids, namespace=namespace or None), INDEXING_POLICY)
+
+def vectorstore_dimensions(vector_store) -> Optional[int]:
+    """
+    Width of the vectors a vector store holds.
+
+    Pinecone indexes report the dimension they were created with. An empty local store
+    takes the width of EMBEDDING_DIMENSIONS when set, and accepts any width otherwise.
+    """
+    if hasattr(vector_store, "dimensions"):
+        return vector_store.dimensions or EMBEDDING_DIMENSIONS or None
+    return call_with_resilience(lambda: vector_store.index.describe_index_stats(), INDEXING_POLICY).dimension
+
+def export_snapshot(vector_store, path: str, embedding_model: str, namespace: Optional[str] = None, precision: str = "float32", shard_size: int = SNAPSHOT_SHARD_SIZE, batch_size: int = SNAPSHOT_BATCH_SIZE) -> dict:
+    """
+    Export the chunks of a vector store and their vectors to a snapshot directory.
+
+    Each shard is a .npy matrix of vectors and a .jsonl file with the id, text and
+    metadata of each row. Only one shard is held in memory. The manifest is written
+    last, so an interrupted export is never mistaken for a complete snapshot.
+
+    Args:
+        vector_store: The initialized vector store.
+        path (str): The snapshot directory, created if missing.
+        embedding_model (str): The embedding model of the vectors, checked on import.
+        namespace (str, optional): The Pinecone namespace to export.
+        precision (str): "float32" or "float16".
+        shard_size (int): Chunks per shard.
+        batch_size (int): Chunks read from the store per request.
+
+    Returns:
+        dict: The snapshot manifest.
+
+    Raises:
+        ValueError: If the precision is not supported or the directory holds a snapshot.
+    """
+    if precision not in SNAPSHOT_PRECISIONS:
+        raise ValueError(f"Unsupported snapshot precision: {precision}")
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, MANIFEST_FILENAME)):
+        raise ValueError(f"A snapshot already exists in '{path}'.")
+
+    shards, dimensions = [], None
+    shard_records, shard_vectors = [], []
+
+    def write_shard():
+        name = f"shard-{len(shards):05d}"
+        np.save(os.path.join(path, f"{name}.npy"), np.concatenate(shard_vectors).astype(SNAPSHOT_PRECISIONS[precision]))
+        with open(os.path.join(path, f"{name}.jsonl"), "w", encoding="utf-8") as file:
+            for record in shard_records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        shards.append({"vectors": f"{name}.npy", "records": f"{name}.jsonl", "count": len(shard_records)})
+
+    for ids, texts, metadatas, vectors in iter_index_embeddings(vector_store, namespace, batch_size):
+        if dimensions is None:
+            dimensions = vectors.shape[1]
+        elif vectors.shape[1] != dimensions:
+            raise ValueError(f"Vector has {vectors.shape[1]} dimensions, the snapshot holds {dimensions}.")
+
+        # A batch fills the current shard and its rest starts the next one
+        start = 0
+        while start < len(ids):
+            stop = start + min(shard_size - len(shard_records), len(ids) - start)
+            shard_records.extend({"id": vector_id, "text": text, "metadata": metadata} for vector_id, text, metadata in zip(ids[start:stop], texts[start:stop], metadatas[start:stop]))
+            shard_vectors.append(vectors[start:stop])
+            start = stop
+            if len(shard_records) == shard_size:
+                write_shard()
+                shard_records, shard_vectors = [], []
+
+    if shard_records:
+        write_shard()
+
+    manifest = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "embedding_model": embedding_model,
+        "dimensions": dimensions,
+        "precision": precision,
+        "namespace": namespace or "",
+        "count": sum(shard["count"] for shard in shards),
+        "shards": shards,
+    }
+    with open(os.path.join(path, MANIFEST_FILENAME), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+def read_manifest(path: str) -> dict:
+    """
+    Read the manifest of a snapshot directory.
+
+    Raises:
+        ValueError: If the directory holds no complete snapshot or its format is unknown.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"No snapshot manifest in '{path}', the export may not have completed.")
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest.get('version')}")
+    return manifest
+
+def iter_snapshot_embeddings(path: str, batch_size: int = SNAPSHOT_BATCH_SIZE) -> Iterator[EmbeddingBatch]:
+    """Read the chunks of a snapshot in batches, mapping each vector shard instead of loading it."""
+    for shard in read_manifest(path)["shards"]:
+        vectors = np.load(os.path.join(path, shard["vectors"]), mmap_mode="r")
+        with open(os.path.join(path, shard["records"]), encoding="utf-8") as file:
+            start = 0
+            while start < shard["count"]:
+                records = [json.loads(file.readline()) for _ in range(min(batch_size, shard["count"] - start))]
+                yield (
+                    [record["id"] for record in records],
+                    [record["text"] for record in records],
+                    [record["metadata"] for record in records],
+                    np.array(vectors[start:start + len(records)], dtype=np.float32),
+                )
+                start += len(records)
+
+def import_snapshot(vector_store, path: str, embedding_model: str, namespace: Optional[str] = None, batch_size: int = SNAPSHOT_BATCH_SIZE, workers: int = SNAPSHOT_UPSERT_WORKERS) -> dict:
+    """
+    Bulk-load a snapshot into a vector store without any embedding request.
+
+    Batches are upserted by a pool of threads, with at most two batches per worker
+    read ahead of the upserts so memory stays bounded whatever the snapshot size.
+
+    Args:
+        vector_store: The initialized target vector store.
+        path (str): The snapshot directory.
+        embedding_model (str): The embedding model of the target, which must match the snapshot.
+        namespace (str, optional): The Pinecone namespace to write.
+        batch_size (int): Chunks per upsert request.
+        workers (int): Concurrent upsert requests.
+
+    Returns:
+        dict: The chunks and batches upserted and the seconds spent.
+
+    Raises:
+        ValueError: If the snapshot was embedded with another model or at another dimension.
+    """
+    manifest = read_manifest(path)
+    if manifest["embedding_model"] != embedding_model:
+        raise ValueError(f"The snapshot was embedded with '{manifest['embedding_model']}', the target uses '{embedding_model}'.")
+    dimensions = vectorstore_dimensions(vector_store)
+    if manifest["count"] and dimensions and manifest["dimensions"] != dimensions:
+        raise ValueError(f"The snapshot holds {manifest['dimensions']}-dimension vectors, the target holds {dimensions}.")
+
+    started = time.perf_counter()
+    stats = {"count": 0, "batches": 0}
+    in_flight = {}
+
+    def collect(done):
+        for future in done:
+            batch_count = in_flight.pop(future)
+            future.result()
+            stats["count"] += batch_count
+            stats["batches"] += 1
+            logger.snapshot_progress("Imported", stats["count"], manifest["count"])
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-upsert") as executor:
+        try:
+            for batch in iter_snapshot_embeddings(path, batch_size):
+                if len(in_flight) >= workers * 2:
+                    collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                in_flight[executor.submit(upsert_embeddings, vector_store, batch, namespace)] = len(batch[0])
+            collect(wait(in_flight).done)
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+def snapshot_bytes(path: str) -> int:
+    """Size on disk of the files of a snapshot."""
+    return sum(os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path))
@@ -1,11 +1,23 @@
 import os
+import uuid
+import numpy as np
 import streamlit as st
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator, List, Optional, Tuple
 from langchain_core.documents import Document
-from services.vectorstore_service import initialize_vectorstore
-from utils.text_extractor import extract_text_from_file
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import INDEXING_UPSERT_BATCH_SIZE
+from services.index_snapshot import delete_embeddings, existing_ids, upsert_embeddings
+from services.vectorstore_service import initialize_vectorstore, course_namespace, write_shard
 from utils.file_extractor import extract_files_from_zip, FileExtractorError
+from utils.memory_monitor import PeakRSSMonitor
+from utils.spooled_upload import spool_upload, iter_files_from_zip
+from utils.text_extractor import iter_paged_segments
+from utils.token_splitter import create_text_splitter, batch_documents_by_tokens, iter_document_chunks
 from utils.web_scraper import get_rendered_webpage
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = EnhancedLogger(setup_logging())
 
 def run_web_indexing_mode(config: dict):
     """
@@ -21,18 +33,23 @@ def run_web_indexing_mode(config: dict):
     pinecone_index_name = config.get("pinecone_index_name")
     embedding_model = config.get("embedding_model")
     openai_api_key = config.get("openai_api_key")
+    course = config.get("course")
+    chunk_size = config.get("chunk_size")
+    chunk_overlap = config.get("chunk_overlap")
 
-    with st.chat_message("assistant", avatar=":material/cognition_2:"):
+    with st.chat_message("assistant", avatar=":material/cognition_2:"), PeakRSSMonitor() as memory_monitor:
         try:
             with st.spinner("Processing web page and indexing...", show_time=True):
 
-                # Initialize Pinecone
-                vector_store = initialize_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key)
+                # Initialize Pinecone in the shard and namespace of the course
+                namespace = course_namespace(course)
+                vector_store = initialize_vectorstore(pinecone_api_key, write_shard(pinecone_index_name, course), embedding_model, openai_api_key, namespace)
                 st.toast('Pinecone initialized successfully!', icon=":material/table_eye:")
 
                 # Load and chunk the web page content
                 doc = get_rendered_webpage(web_url)
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+                doc.metadata.update(chunk_metadata(web_url, course))
+                text_splitter = create_text_splitter(embedding_model, chunk_size, chunk_overlap)
                 all_splits = text_splitter.split_documents([doc])
                 st.toast('Web page content chunked successfully!', icon=":material/package:")
 
@@ -40,7 +57,7 @@ def run_web_indexing_mode(config: dict):
                 st.status(f"Number of chunks created: {len(all_splits)}",state="complete")
 
                 # Index the chunks
-                vector_store.add_documents(documents=all_splits)
+                index_source_chunks(vector_store, all_splits, web_url, embedding_model, namespace)
                 st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
 
                 st.status(f"Web page content indexed successfully at Pinecone!", state="complete")
@@ -60,6 +77,8 @@ def run_web_indexing_mode(config: dict):
             with st.expander("Error details"):
                 st.write(f"An unexpected error occurred: {e}")
 
+    report_peak_memory(memory_monitor)
+
 def run_file_indexing_mode(config: dict, uploaded_files: list):
     """
     Run the file indexing mode to extract text from uploaded files and index the content into Pinecone.
@@ -73,33 +92,39 @@ def run_file_indexing_mode(config: dict, uploaded_files: list):
     pinecone_index_name = config.get("pinecone_index_name")
     embedding_model = config.get("embedding_model")
     openai_api_key = config.get("openai_api_key")
+    course = config.get("course")
+    chunk_size = config.get("chunk_size")
+    chunk_overlap = config.get("chunk_overlap")
+
+    # In low-memory mode uploads are spooled and chunked as a stream within the budget
+    memory_budget_mb = config.get("memory_budget_mb") if config.get("low_memory_ingestion") else None
+    spool_threshold = memory_budget_mb * 1024 * 1024 // 4 if memory_budget_mb else None
     
-    with st.chat_message("assistant", avatar=":material/cognition_2:"):
+    with st.chat_message("assistant", avatar=":material/cognition_2:"), PeakRSSMonitor() as memory_monitor:
         for file in uploaded_files:
             file_extension = os.path.splitext(file.name)[-1].lower()
             
             # If the uploaded file is a ZIP archive extract its contents
             if file_extension == ".zip":
                 try:
-                    with st.spinner(f"Extracting files from ZIP: {file.name}"):
-                        extracted_items = extract_files_from_zip(file)
-                    
-                    # Warn the user if no supported files were found in the ZIP    
-                    if not extracted_items:
-                        st.toast(f"No supported files found in {file.name}", icon=":material/folder_zip:")
-                        with st.expander("Error details"):
-                            st.write(f"An error occurred: {e}")
-                        continue
-                    
-                    # Process each extracted file individually                                
-                    for inner_filename, inner_file in extracted_items:
-                        inner_ext = os.path.splitext(inner_filename)[-1].lower()
-                        try:
-                            process_file_for_indexing(inner_file, inner_filename, inner_ext, pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key)
-                        except Exception as e:
-                            st.toast(f"Error processing file '{inner_filename}': {e}", icon=":material/folder_zip:")
-                            with st.expander("Error details"):
-                                st.write(f"An error occurred: {e}")
+                    # In low-memory mode the archive is read member by member as the loop advances,
+                    # so the spinner covers the whole loop. An archive without supported files raises
+                    # FileExtractorError from either extractor and is reported below
+                    with st.spinner(f"Extracting and indexing files from ZIP: {file.name}"):
+                        if memory_budget_mb:
+                            extracted_items = iter_files_from_zip(file, spool_threshold)
+                        else:
+                            extracted_items = extract_files_from_zip(file)
+
+                        # Process each extracted file individually
+                        for inner_filename, inner_file in extracted_items:
+                            inner_ext = os.path.splitext(inner_filename)[-1].lower()
+                            try:
+                                process_file_for_indexing(inner_file, inner_filename, inner_ext, pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key, chunk_size, chunk_overlap, memory_budget_mb, course)
+                            except Exception as e:
+                                st.toast(f"Error processing file '{inner_filename}': {e}", icon=":material/folder_zip:")
+                                with st.expander("Error details"):
+                                    st.write(f"An error occurred: {e}")
 
                 except FileExtractorError as e:
                     st.toast(f"Error extracting ZIP file '{file.name}': {e}", icon=":material/folder_zip:")
@@ -109,17 +134,26 @@ def run_file_indexing_mode(config: dict, uploaded_files: list):
             
             # Regular simple file process it directly    
             else:
+                file_obj = file
                 try:
+                    file_obj = spool_upload(file, spool_threshold) if memory_budget_mb else file
                     process_file_for_indexing(
-                        file, file.name, file_extension,
-                        pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key
+                        file_obj, file.name, file_extension,
+                        pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key,
+                        chunk_size, chunk_overlap, memory_budget_mb, course
                     )
                 except Exception as e:
                     st.toast(f"Error processing file '{file.name}': {e}", icon=":material/feedback:")
                     with st.expander("Error details"):
                         st.write(f"An error occurred: {e}")
+                finally:
+                    # Release the spooled copy and its temporary file
+                    if file_obj is not file:
+                        file_obj.close()
+
+    report_peak_memory(memory_monitor, memory_budget_mb)
 
-def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key):
+def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key, chunk_size=None, chunk_overlap=None, memory_budget_mb=None, course=None):
     """
     Process a single file for indexing into Pinecone.
 
@@ -131,29 +165,49 @@ def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pi
         pinecone_index_name (str): Pinecone index name.
         embedding_model (str): OpenAI embedding model name.
         openai_api_key (str): OpenAI API key for embedding.
+        chunk_size (int, optional): Maximum chunk size in embedding model tokens.
+        chunk_overlap (int, optional): Overlap between chunks in embedding model tokens.
+        memory_budget_mb (int, optional): Memory budget enabling streamed extraction and chunking.
+        course (str, optional): Course the file belongs to, selecting its namespace and metadata.
     """
+    metadata = chunk_metadata(filename, course)
+    namespace = course_namespace(course)
+
     try:
+        # Low-memory mode never materializes the full text or the full list of chunks
+        if memory_budget_mb:
+            with st.spinner(f"Streaming file {filename} within {memory_budget_mb} MB..."):
+                text_splitter = create_text_splitter(embedding_model, chunk_size, chunk_overlap)
+                window_size = max(memory_budget_mb * 1024 * 1024 // 16, 64 * 1024)
+                chunks = iter_paged_chunks(file_obj, file_ext, metadata, text_splitter, window_size)
+
+                vector_store = initialize_vectorstore(pinecone_api_key, write_shard(pinecone_index_name, course), embedding_model, openai_api_key, namespace)
+                index_source_chunks(vector_store, chunks, filename, embedding_model, namespace)
+                st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
+                st.status(f"File {filename} indexed successfully at Pinecone!", state="complete")
+            return
+
         with st.spinner(f"Processing file {filename}..."):
             
-            # Extract text from the uploaded file
-            extracted_text = extract_text_from_file(file_obj, file_ext)
+            # Extract text from the uploaded file, one LangChain document per page
+            docs = [
+                Document(page_content="".join(segment for _, segment in segments), metadata=page_metadata(metadata, page))
+                for page, segments in groupby(iter_paged_segments(file_obj, file_ext), key=itemgetter(0))
+            ]
             st.toast('File content extracted successfully!', icon=":material/draft:")
-            
-            # Create a LangChain document
-            doc = Document(page_content=extracted_text, metadata={"source": filename})
             st.toast('Pinecone initialized successfully!', icon=":material/table_eye:")
             
             # Split the document into chunks
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            all_splits = text_splitter.split_documents([doc])
+            text_splitter = create_text_splitter(embedding_model, chunk_size, chunk_overlap)
+            all_splits = text_splitter.split_documents(docs)
             st.toast('File content chunked successfully!', icon=":material/package:")
             
             # Display number of chunks created
             st.status(f"Number of chunks created: {len(all_splits)}", state="complete")
 
-            # Initialize Pinecone and index the chunks
-            vector_store = initialize_vectorstore(pinecone_api_key, pinecone_index_name, embedding_model, openai_api_key)
-            vector_store.add_documents(documents=all_splits)
+            # Initialize Pinecone in the shard and namespace of the course and index the chunks
+            vector_store = initialize_vectorstore(pinecone_api_key, write_shard(pinecone_index_name, course), embedding_model, openai_api_key, namespace)
+            index_source_chunks(vector_store, all_splits, filename, embedding_model, namespace)
             st.toast('Chunks indexed successfully!', icon=":material/cloud_upload:")
             st.status(f"File {filename} indexed successfully at Pinecone!", state="complete")
 
@@ -170,4 +224,199 @@ def process_file_for_indexing(file_obj, filename, file_ext, pinecone_api_key, pi
     except Exception as e:
         st.toast(f"An unexpected error occurred during indexing process.", icon=":material/cloud_off:")
         with st.expander("Error details"):
-            st.write(f"An unexpected error occurred: {e}")    
\ No newline at end of file
+            st.write(f"An unexpected error occurred: {e}")
+
+def chunk_metadata(document: str, course: Optional[str] = None) -> dict:
+    """
+    Build the metadata recorded on every chunk of a document.
+
+    Args:
+        document (str): The file name or URL of the document.
+        course (str, optional): The course the document belongs to.
+
+    Returns:
+        dict: The source and document names, and the course slug when set, the
+        value course_filter matches.
+    """
+    metadata = {"source": document, "document": document}
+    if course_namespace(course):
+        metadata["course"] = course_namespace(course)
+    return metadata
+
+def page_metadata(metadata: dict, page: Optional[int]) -> dict:
+    """Add the page number to the chunk metadata of a paged document."""
+    return dict(metadata, page=page) if page else metadata
+
+def chunk_id(namespace: str, source: str, position: int) -> str:
+    """Stable id of a chunk, so indexing a file again overwrites its chunks."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{namespace}/{source}#{position}"))
+
+def with_chunk_ids(chunks, namespace: str) -> Iterator[Document]:
+    """
+    Give each chunk of a document its stable id, from its source and position.
+
+    Upserts with ids are idempotent, so a batch retried after a timed-out attempt
+    overwrites the vectors that attempt may still write instead of duplicating them.
+    """
+    for position, chunk in enumerate(chunks):
+        chunk.id = chunk_id(namespace, chunk.metadata.get("source", ""), position)
+        yield chunk
+
+def delete_stale_chunks(vector_store, source: str, chunk_count: int, namespace: Optional[str] = None, previous_count: Optional[int] = None) -> int:
+    """
+    Delete the chunks of a source beyond its chunk count, left by a longer earlier version.
+
+    Chunk ids follow the chunk positions, so indexing a source again overwrites its
+    first chunk_count chunks and only the positions past them can be stale. When the
+    earlier chunk count is unknown, those positions are looked up page by page until
+    one is missing.
+
+    Args:
+        vector_store: The initialized vector store.
+        source (str): The source of the chunks, as in their metadata.
+        chunk_count (int): The chunks the source now has.
+        namespace (str, optional): The Pinecone namespace of the vector store.
+        previous_count (int, optional): The chunks the source had when last indexed.
+
+    Returns:
+        int: The number of chunks deleted.
+    """
+    namespace = namespace or ""
+    if previous_count is not None:
+        stale_ids = [chunk_id(namespace, source, position) for position in range(chunk_count, previous_count)]
+    else:
+        stale_ids, position = [], chunk_count
+        while True:
+            page_ids = [chunk_id(namespace, source, position + offset) for offset in range(INDEXING_UPSERT_BATCH_SIZE)]
+            found = existing_ids(vector_store, page_ids, namespace)
+            stale_ids.extend(vector_id for vector_id in page_ids if vector_id in found)
+            if len(found) < len(page_ids):
+                break
+            position += len(page_ids)
+
+    for start in range(0, len(stale_ids), INDEXING_UPSERT_BATCH_SIZE):
+        delete_embeddings(vector_store, stale_ids[start:start + INDEXING_UPSERT_BATCH_SIZE], namespace)
+    if stale_ids:
+        logger.stale_chunks(source, len(stale_ids))
+    return len(stale_ids)
+
+def index_source_chunks(vector_store, chunks, source: str, embedding_model: str, namespace: Optional[str] = None) -> list:
+    """
+    Index the chunks of one source under their stable ids, then delete its stale chunks.
+
+    Args:
+        vector_store: The initialized vector store.
+        chunks (Iterable[Document]): The chunks of the source in order, consumed lazily.
+        source (str): The source of the chunks, as in their metadata.
+        embedding_model (str): OpenAI embedding model name.
+        namespace (str, optional): The Pinecone namespace of the vector store.
+
+    Returns:
+        list: Token count of each embedding batch sent.
+    """
+    chunk_count = 0
+
+    def counted_chunks() -> Iterator[Document]:
+        nonlocal chunk_count
+        for chunk in with_chunk_ids(chunks, namespace or ""):
+            chunk_count += 1
+            yield chunk
+
+    batch_token_counts = index_documents(vector_store, counted_chunks(), embedding_model, namespace)
+    delete_stale_chunks(vector_store, source, chunk_count, namespace)
+    return batch_token_counts
+
+def iter_paged_chunks(file_obj, file_ext: str, metadata: dict, text_splitter, window_size: int) -> Iterator[Document]:
+    """
+    Stream the chunks of a file, recording the page each chunk comes from.
+
+    Chunks never span two pages. Formats without pages are chunked as one stream.
+
+    Args:
+        file_obj: The uploaded file object.
+        file_ext (str): The file extension.
+        metadata (dict): Metadata attached to every chunk.
+        text_splitter (RecursiveCharacterTextSplitter): The splitter used for each window.
+        window_size (int): Number of characters buffered before splitting.
+
+    Yields:
+        Document: Chunks in document order.
+    """
+    for page, segments in groupby(iter_paged_segments(file_obj, file_ext), key=itemgetter(0)):
+        yield from iter_document_chunks((segment for _, segment in segments), page_metadata(metadata, page), text_splitter, window_size)
+
+def index_documents(vector_store, documents, embedding_model: str, namespace: Optional[str] = None) -> list:
+    """
+    Embed and upsert chunks into the vector store in batches formed by token count.
+
+    Each batch is sent as a single embedding request so requests are packed close
+    to the provider's per-request token limit.
+
+    Args:
+        vector_store: The initialized vector store.
+        documents (Iterable[Document]): The chunks to index.
+        embedding_model (str): OpenAI embedding model name.
+        namespace (str, optional): The Pinecone namespace of the vector store.
+
+    Returns:
+        list: Token count of each embedding batch sent.
+    """
+    batch_token_counts = [batch_tokens for _, batch_tokens in upsert_document_batches(vector_store, documents, embedding_model, namespace)]
+
+    # Report the tokens sent per embedding batch
+    if batch_token_counts:
+        st.status(
+            f"Embedded {sum(batch_token_counts)} tokens in {len(batch_token_counts)} batches "
+            f"(max {max(batch_token_counts)} tokens per batch)",
+            state="complete"
+        )
+        with st.expander("Embedding batches"):
+            for batch_number, batch_tokens in enumerate(batch_token_counts, start=1):
+                st.write(f"Batch {batch_number}: {batch_tokens} tokens")
+
+    return batch_token_counts
+
+def upsert_document_batches(vector_store, documents, embedding_model: str, namespace: Optional[str] = None) -> Iterator[Tuple[List[Document], int]]:
+    """
+    Embed and upsert chunks in batches formed by token count, one embedding request per batch.
+
+    The embedding request is retried by the coalescing embeddings and the vectors are
+    then upserted in requests of INDEXING_UPSERT_BATCH_SIZE, each retried on its own,
+    so a retried upsert never sends the embedding request again. Retried upserts must
+    overwrite what a timed-out attempt may still write, so chunks carry stable ids,
+    see with_chunk_ids; chunks without one get a random id before their first attempt.
+
+    Args:
+        vector_store: The initialized vector store.
+        documents (Iterable[Document]): The chunks to index, consumed lazily.
+        embedding_model (str): OpenAI embedding model name.
+        namespace (str, optional): The Pinecone namespace of the vector store.
+
+    Yields:
+        Tuple[List[Document], int]: Each batch once it is upserted, and its token count.
+    """
+    for batch_number, (batch, batch_tokens) in enumerate(batch_documents_by_tokens(documents, embedding_model), start=1):
+        ids = [doc.id or str(uuid.uuid4()) for doc in batch]
+        texts = [doc.page_content for doc in batch]
+        vectors = np.asarray(vector_store.embeddings.embed_documents(texts), dtype=np.float32)
+        for start in range(0, len(batch), INDEXING_UPSERT_BATCH_SIZE):
+            stop = start + INDEXING_UPSERT_BATCH_SIZE
+            upsert_embeddings(vector_store, (ids[start:stop], texts[start:stop], [doc.metadata for doc in batch[start:stop]], vectors[start:stop]), namespace)
+        logger.embedding_batch(batch_number, len(batch), batch_tokens)
+        yield batch, batch_tokens
+
+def report_peak_memory(memory_monitor: PeakRSSMonitor, memory_budget_mb=None):
+    """
+    Report the peak resident memory reached during an indexing run.
+
+    Args:
+        memory_monitor (PeakRSSMonitor): The monitor that wrapped the indexing run.
+        memory_budget_mb (int, optional): The configured ingestion memory budget.
+    """
+    logger.memory_usage("Indexing run", memory_monitor.peak_mb, memory_monitor.growth_mb)
+    message = f"Peak memory: {memory_monitor.peak_mb:.1f} MB (+{memory_monitor.growth_mb:.1f} MB during indexing)"
+
+    if memory_budget_mb and memory_monitor.growth_mb > memory_budget_mb:
+        st.warning(f"{message} exceeded the {memory_budget_mb} MB ingestion budget.", icon=":material/memory:")
+    else:
+        st.caption(message)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import threading
+import requests
+from collections import OrderedDict
+from typing import Any, Iterator, List, Optional
+from pydantic import PrivateAttr
+from requests.adapters import HTTPAdapter
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_community.chat_models import ChatMaritalk
+from langchain_community.chat_models.maritalk import MaritalkHTTPError
+from config.settings import MARITALK_API_URL, LLM_CLIENT_POOL_SIZE, LLM_HTTP_POOL_MAXSIZE, MARITALK_CONNECT_TIMEOUT, MARITALK_READ_TIMEOUT
+
+# Connect and read timeouts of every Maritalk request, the read timeout also bounds gaps between streamed chunks
+MARITALK_TIMEOUT = (MARITALK_CONNECT_TIMEOUT, MARITALK_READ_TIMEOUT)
+
+class PooledChatMaritalk(ChatMaritalk):
+    """
+    Maritalk chat model sending its requests through a persistent HTTP session,
+    so keep-alive connections are reused across calls instead of opening a new
+    TLS connection for every request.
+    """
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+
+    def bind_session(self, session: requests.Session) -> "PooledChatMaritalk":
+        self._session = session
+        return self
+
+    def _request_data(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> dict:
+        return {
+            "messages": self.parse_messages_for_model(messages),
+            "model": self.model,
+            "do_sample": self.do_sample,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stopping_tokens": stop if stop is not None else [],
+            **kwargs,
+        }
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        headers = {"authorization": f"Key {self.api_key}"}
+        response = self._session.post(MARITALK_API_URL, json=self._request_data(messages, stop, **kwargs), headers=headers, timeout=MARITALK_TIMEOUT)
+
+        if response.ok:
+            return response.json().get("answer", "No answer found")
+        raise MaritalkHTTPError(response)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        headers = {"authorization": f"Key {self.api_key}"}
+        data = self._request_data(messages, stop, stream=True, **kwargs)
+
+        # Closing the response hands the connection back to the session pool
+        with self._session.post(MARITALK_API_URL, json=data, headers=headers, stream=True, timeout=MARITALK_TIMEOUT) as response:
+            if not response.ok:
+                raise MaritalkHTTPError(response)
+
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                response_data = line[len(b"data: "):].decode("utf-8")
+                if not response_data:
+                    continue
+
+                parsed_data = json.loads(response_data)
+                if "text" in parsed_data:
+                    delta = parsed_data["text"]
+                    chunk = ChatGenerationChunk(message=AIMessageChunk(content=delta))
+                    if run_manager:
+                        run_manager.on_llm_new_token(delta, chunk=chunk)
+                    yield chunk
+
+class LLMClientPool:
+    """
+    Process-wide registry of Maritalk clients keyed by API key and model settings.
+
+    Each client owns a keep-alive HTTP session. The registry is bounded and evicts
+    the least recently used client, closing its connections.
+    """
+    def __init__(self, max_size: int = LLM_CLIENT_POOL_SIZE):
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(llm_api_key: str, model: str, stream: bool, temperature: float, max_tokens: int) -> tuple:
+        # The API key is hashed so it is not kept in plain text as a dictionary key
+        key_digest = hashlib.sha256((llm_api_key or "").encode("utf-8")).hexdigest()
+        return key_digest, model, stream, temperature, max_tokens
+
+    def get(self, llm_api_key: str, model: str, stream: bool, temperature: float, max_tokens: int) -> PooledChatMaritalk:
+        """Get the pooled client for the given settings, creating it on first use."""
+        key = self._key(llm_api_key, model, stream, temperature, max_tokens)
+
+        with self._lock:
+            if key in self._clients:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return self._clients[key][0]
+
+            self.misses += 1
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_HTTP_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            client = PooledChatMaritalk(
+                model=model,
+                api_key=llm_api_key,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=stream,
+                callbacks=[],
+            ).bind_session(session)
+            self._clients[key] = (client, session)
+
+            # Evict the least recently used client and close its connections
+            while len(self._clients) > self.max_size:
+                _, (_, evicted_session) = self._clients.popitem(last=False)
+                evicted_session.close()
+                self.evictions += 1
+
+            return client
+
+    def stats(self) -> dict:
+        """Snapshot of the registry usage and HTTP connection reuse."""
+        with self._lock:
+            sessions = [session for _, session in self._clients.values()]
+            stats = {"clients": len(sessions), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+        requests_sent, connections_opened = 0, 0
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is not None:
+                        requests_sent += pool.num_requests
+                        connections_opened += pool.num_connections
+
+        stats.update({
+            "requests": requests_sent,
+            "connections": connections_opened,
+            "reused_connections": max(requests_sent - connections_opened, 0),
+        })
+        return stats
+
+# Shared by every session in the process
+llm_client_pool = LLMClientPool()
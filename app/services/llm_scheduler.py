@@ -0,0 +1,213 @@
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+from config.settings import LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE, LLM_QUEUE_TIMEOUT
+from services.resilience import CallTimeoutError, error_status
+
+# Priority classes, lower values are admitted first
+DECISION_PRIORITY = 0
+ANSWER_PRIORITY = 1
+
+# Admission order kept for sessions that have nothing queued
+MAX_TRACKED_SESSIONS = 4096
+
+class QueueTimeoutError(CallTimeoutError):
+    """Raised when an LLM call waits longer than the queue timeout for admission."""
+    def __init__(self, waited: float):
+        self.waited = waited
+        super().__init__(f"The assistant is busy, no LLM slot was free after {waited:.0f}s.")
+
+class LLMTicket:
+    """An LLM call waiting for or holding a slot."""
+    __slots__ = ("session_id", "priority", "tokens", "sequence", "enqueued_at", "used_tokens")
+
+    def __init__(self, session_id: str, priority: int, tokens: int, sequence: int):
+        self.session_id = session_id
+        self.priority = priority
+        self.tokens = tokens
+        self.sequence = sequence
+        self.enqueued_at = time.monotonic()
+        self.used_tokens = None
+
+def estimate_tokens(messages: List) -> int:
+    """Roughly estimate the tokens of messages or strings, about four characters per token."""
+    return sum(len(message if isinstance(message, str) else str(message.content)) for message in messages) // 4
+
+class LLMScheduler:
+    """
+    Process-wide admission control for LLM calls.
+
+    A call is admitted when fewer than `max_concurrency` calls are in flight and the
+    token bucket, refilled at `tokens_per_minute`, holds its estimated tokens. Waiting
+    calls are admitted strictly in order: by priority class first, so short decision
+    calls go before answer streams, then round-robin across sessions, then in arrival
+    order within a session.
+    """
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._waiting: List[LLMTicket] = []
+        self._in_flight = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._sequence = itertools.count()
+        self._admissions = itertools.count(1)
+        self._last_admission = {}
+        self._wait_times = deque(maxlen=1000)
+        self._admitted = 0
+        self._timed_out = 0
+        self._throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.tokens_per_minute:
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _order(self, ticket: LLMTicket) -> tuple:
+        return (ticket.priority, self._last_admission.get(ticket.session_id, 0), ticket.sequence)
+
+    def _position(self, ticket: LLMTicket) -> int:
+        order = self._order(ticket)
+        return 1 + sum(1 for other in self._waiting if self._order(other) < order)
+
+    def _token_wait(self, ticket: LLMTicket) -> float:
+        """Seconds until the bucket holds the tokens of a call, 0 when it already does."""
+        if not self.tokens_per_minute:
+            return 0.0
+        missing = min(ticket.tokens, self.tokens_per_minute) - self._tokens
+        return max(missing, 0.0) * 60 / self.tokens_per_minute
+
+    def acquire(self, session_id: str, priority: int, tokens: int, on_wait: Optional[Callable[[int], None]] = None) -> LLMTicket:
+        """
+        Wait until a call is admitted.
+
+        Args:
+            session_id (str): The chat session making the call.
+            priority (int): DECISION_PRIORITY or ANSWER_PRIORITY.
+            tokens (int): Estimated tokens of the call, prompt and output.
+            on_wait (Callable[[int], None], optional): Called with the queue position each
+                time it changes while waiting, and with 0 once a waiting call is admitted.
+
+        Returns:
+            LLMTicket: The admitted call, to release when it ends.
+
+        Raises:
+            QueueTimeoutError: If the call is not admitted within the queue timeout.
+        """
+        with self._condition:
+            ticket = LLMTicket(session_id, priority, tokens, next(self._sequence))
+            self._waiting.append(ticket)
+            deadline = ticket.enqueued_at + self.queue_timeout
+            reported_position = None
+
+            try:
+                while True:
+                    self._refill()
+                    position = self._position(ticket)
+                    token_wait = self._token_wait(ticket)
+                    if position == 1 and self._in_flight < self.max_concurrency and not token_wait:
+                        break
+
+                    # The sink may render UI or stream to a client, so it never runs while holding the lock
+                    if on_wait and position != reported_position:
+                        reported_position = position
+                        self._condition.release()
+                        try:
+                            on_wait(position)
+                        finally:
+                            self._condition.acquire()
+                        continue
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        raise QueueTimeoutError(time.monotonic() - ticket.enqueued_at)
+
+                    # Releases notify the waiters, refills do not, so wake up when enough tokens accrued
+                    self._condition.wait(min(remaining, token_wait or remaining))
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+                raise
+
+            self._waiting.remove(ticket)
+            self._in_flight += 1
+            self._tokens -= ticket.tokens
+            self._admitted += 1
+            self._wait_times.append(time.monotonic() - ticket.enqueued_at)
+            self._last_admission[session_id] = next(self._admissions)
+            self._forget_idle_sessions()
+            self._condition.notify_all()
+
+        if on_wait and reported_position is not None:
+            on_wait(0)
+        return ticket
+
+    def release(self, ticket: LLMTicket, error: Optional[Exception] = None):
+        """
+        Free the slot of an admitted call.
+
+        The token bucket is corrected with the tokens the call actually used, and is
+        emptied when the provider throttled the call.
+
+        Args:
+            ticket (LLMTicket): The admitted call.
+            error (Exception, optional): The error the call ended with.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if self.tokens_per_minute and ticket.used_tokens is not None:
+                self._tokens += ticket.tokens - ticket.used_tokens
+            if error is not None and error_status(error) == 429:
+                self._throttled += 1
+                self._tokens = min(self._tokens, 0.0)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str, priority: int, tokens: int, on_wait: Optional[Callable[[int], None]] = None) -> Iterator[LLMTicket]:
+        """Hold a slot for the duration of an LLM call, see acquire."""
+        ticket = self.acquire(session_id, priority, tokens, on_wait)
+        error = None
+        try:
+            yield ticket
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs on the BaseException of a Streamlit rerun or stop, which must not leak the slot
+            self.release(ticket, error)
+
+    def _forget_idle_sessions(self):
+        if len(self._last_admission) > MAX_TRACKED_SESSIONS:
+            waiting_sessions = {ticket.session_id for ticket in self._waiting}
+            self._last_admission = {session: order for session, order in self._last_admission.items() if session in waiting_sessions}
+
+    def metrics(self) -> dict:
+        """Queue depth, slots in use, token budget and admission wait times."""
+        with self._condition:
+            self._refill()
+            wait_times = sorted(self._wait_times)
+            return {
+                "queue_depth": len(self._waiting),
+                "queued_decisions": sum(1 for ticket in self._waiting if ticket.priority == DECISION_PRIORITY),
+                "queued_answers": sum(1 for ticket in self._waiting if ticket.priority == ANSWER_PRIORITY),
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "tokens_available": int(self._tokens) if self.tokens_per_minute else None,
+                "tokens_per_minute": self.tokens_per_minute or None,
+                "admitted": self._admitted,
+                "timed_out": self._timed_out,
+                "throttled": self._throttled,
+                "wait_p50": wait_times[len(wait_times) // 2] if wait_times else 0.0,
+                "wait_p95": wait_times[int(len(wait_times) * 0.95)] if wait_times else 0.0,
+                "wait_max": wait_times[-1] if wait_times else 0.0,
+            }
+
+# Scheduler shared by every session of the process
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,103 @@
+import threading
+import uuid
+import numpy as np
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+from config.settings import LOCAL_VECTOR_PRECISION, LOCAL_VECTOR_RESCORE_FACTOR
+
+class LocalVectorStore(InMemoryVectorStore):
+    """
+    In-process vector store standing in for a Pinecone index.
+
+    It exposes the Pinecone vector store search methods used by the application so it
+    can be swapped in for local runs, load tests and index snapshots. Each namespace
+    of an index is a separate store, as in Pinecone.
+    """
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, namespace: Optional[str] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return [
+            (doc, score)
+            for doc, score, _ in self._similarity_search_with_score_by_vector(embedding, k=k, filter=metadata_filter(filter))
+        ]
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        record = next(iter(self.store.values()), None)
+        return None if record is None else len(record["vector"])
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """Add texts with precomputed embeddings, replacing documents with the same ids."""
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        for doc_id, text, vector, metadata in zip(ids, texts, vectors, metadatas):
+            self.store[doc_id] = {"id": doc_id, "vector": np.asarray(vector, dtype=np.float32).tolist(), "text": text, "metadata": dict(metadata)}
+        return ids
+
+    def iter_embeddings(self, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+        """Yield the ids, texts, metadata and vectors of the stored documents in batches."""
+        records = list(self.store.values())
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            yield (
+                [record["id"] for record in batch],
+                [record["text"] for record in batch],
+                [record["metadata"] for record in batch],
+                np.asarray([record["vector"] for record in batch], dtype=np.float32),
+            )
+
+def metadata_filter(filter: Optional[dict]) -> Optional[Callable[[Document], bool]]:
+    """
+    Convert a Pinecone metadata filter into a document predicate.
+
+    Supports field equality, written as a value or with "$eq", and "$in".
+    """
+    if not filter:
+        return None
+
+    conditions = []
+    for field, condition in filter.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            conditions.append((field, tuple(condition["$in"])))
+        elif isinstance(condition, dict):
+            conditions.append((field, (condition["$eq"],)))
+        else:
+            conditions.append((field, (condition,)))
+
+    return lambda doc: all(doc.metadata.get(field) in values for field, values in conditions)
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+def get_local_vectorstore(index_name: str, embeddings: Embeddings, namespace: Optional[str] = None) -> VectorStore:
+    """
+    Get the process-wide local store of an index namespace, creating it on first use.
+
+    With LOCAL_VECTOR_PRECISION set to float16 or int8 the store keeps its vectors
+    quantized in memory and rescores the results at full precision.
+
+    Args:
+        index_name (str): The index name the store stands in for.
+        embeddings (Embeddings): The embedding model used for queries and new documents.
+        namespace (str, optional): The namespace of the index, the default namespace if empty.
+
+    Returns:
+        VectorStore: The local store of the index namespace.
+    """
+    key = (index_name, namespace or "")
+    with _local_stores_lock:
+        store = _local_stores.get(key)
+        if store is None:
+            store = _local_stores[key] = create_local_vectorstore(embeddings)
+        else:
+            store.embedding = embeddings
+        return store
+
+def create_local_vectorstore(embeddings: Embeddings, precision: Optional[str] = None) -> VectorStore:
+    """Create an empty local store with the configured vector precision."""
+    precision = precision or LOCAL_VECTOR_PRECISION
+    if precision == "float32":
+        return LocalVectorStore(embeddings)
+
+    from services.quantized_vectorstore import QuantizedVectorStore
+    return QuantizedVectorStore(embeddings, precision, LOCAL_VECTOR_RESCORE_FACTOR)
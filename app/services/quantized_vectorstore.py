@@ -0,0 +1,228 @@
+import tempfile
+import threading
+import uuid
+import numpy as np
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from services.local_vectorstore import metadata_filter
+
+# Storage types of the in-memory vectors for each precision
+PRECISION_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+# Vectors converted to float32 at a time when scoring a search, bounding its working memory
+SEARCH_BLOCK_ROWS = 1024
+
+class QuantizedVectorStore(VectorStore):
+    """
+    In-process vector store keeping its vectors quantized in memory.
+
+    Vectors are normalized, so cosine similarity is a dot product, and stored as
+    float16 or int8 with a scale per vector. A search scores every vector at reduced
+    precision, then rescores the best candidates against full-precision copies kept in
+    a temporary file on disk. Adding a document with an id already stored replaces it.
+
+    Args:
+        embedding (Embeddings): The embedding model used for queries and new documents.
+        precision (str): "float32", "float16" or "int8".
+        rescore_factor (int): Candidates rescored per requested result, 0 to return
+            the reduced-precision scores without rescoring.
+    """
+    def __init__(self, embedding: Embeddings, precision: str = "int8", rescore_factor: int = 4):
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(f"Unsupported vector precision: {precision}")
+
+        self.embedding = embedding
+        self.precision = precision
+        self.rescore_factor = rescore_factor
+        self.documents: List[Document] = []
+        self._rows = {}
+        self._codes = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._full_vectors = tempfile.TemporaryFile()
+        self._full_view = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return None if self._codes is None else self._codes.shape[1]
+
+    def memory_bytes(self) -> int:
+        """Bytes held in memory by the quantized vectors and their scales."""
+        if self._codes is None:
+            return 0
+        return len(self.documents) * (self._codes.shape[1] * self._codes.itemsize + (4 if self.precision == "int8" else 0))
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Add texts with precomputed embeddings, replacing documents with the same ids.
+
+        Args:
+            texts (List[str]): The texts of the documents.
+            vectors (List[List[float]]): Their embeddings.
+            metadatas (List[dict], optional): Their metadata.
+            ids (List[str], optional): Their ids, generated when missing.
+
+        Returns:
+            List[str]: The ids of the added documents.
+        """
+        if not texts:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+
+        full = np.array(vectors, dtype=np.float32)
+        full /= np.maximum(np.linalg.norm(full, axis=1, keepdims=True), 1e-12)
+        codes, scales = self._quantize(full)
+
+        # The last occurrence of an id repeated within the batch wins
+        positions = list({doc_id: position for position, doc_id in enumerate(ids)}.values())
+
+        with self._lock:
+            if self._codes is not None and full.shape[1] != self._codes.shape[1]:
+                raise ValueError(f"Embedding has {full.shape[1]} dimensions, the store holds {self._codes.shape[1]}.")
+
+            # Stored ids are overwritten in place, the others are appended
+            replaced = [position for position in positions if ids[position] in self._rows]
+            appended = [position for position in positions if ids[position] not in self._rows]
+            row_bytes = full.shape[1] * full.itemsize
+
+            for position in replaced:
+                row = self._rows[ids[position]]
+                self._codes[row], self._scales[row] = codes[position], scales[position]
+                self._full_vectors.seek(row * row_bytes)
+                self._full_vectors.write(full[position].tobytes())
+                self.documents[row] = Document(id=ids[position], page_content=texts[position], metadata=dict(metadatas[position]))
+
+            if appended:
+                self._codes = codes[appended] if self._codes is None else np.concatenate([self._codes, codes[appended]])
+                self._scales = np.concatenate([self._scales, scales[appended]])
+                self._full_vectors.seek(0, 2)
+                self._full_vectors.write(full[appended].tobytes())
+                self._full_view = None
+                for position in appended:
+                    self._rows[ids[position]] = len(self.documents)
+                    self.documents.append(Document(id=ids[position], page_content=texts[position], metadata=dict(metadatas[position])))
+            self._full_vectors.flush()
+        return ids
+
+    def iter_embeddings(self, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+        """Yield the ids, texts, metadata and full-precision vectors of the stored documents in batches."""
+        with self._lock:
+            count = len(self.documents)
+            if not count:
+                return
+            documents, full_vectors = self.documents[:count], self._full_precision(count)
+
+        for start in range(0, count, batch_size):
+            batch = documents[start:start + batch_size]
+            yield (
+                [doc.id for doc in batch],
+                [doc.page_content for doc in batch],
+                [doc.metadata for doc in batch],
+                np.array(full_vectors[start:start + batch_size]),
+            )
+
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        with self._lock:
+            return [self.documents[self._rows[doc_id]] for doc_id in ids if doc_id in self._rows]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete documents by id.
+
+        The kept rows are copied to new arrays and a new file of full-precision vectors,
+        so searches already running keep reading the rows they started with.
+        """
+        with self._lock:
+            dropped = {self._rows[doc_id] for doc_id in ids or [] if doc_id in self._rows}
+            if not dropped:
+                return False
+
+            kept = np.array([row for row in range(len(self.documents)) if row not in dropped], dtype=np.int64)
+            full_vectors = self._full_precision(len(self.documents))
+            rebuilt = tempfile.TemporaryFile()
+            for start in range(0, len(kept), SEARCH_BLOCK_ROWS):
+                rebuilt.write(np.ascontiguousarray(full_vectors[kept[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+            rebuilt.flush()
+
+            self._full_vectors.close()
+            self._full_vectors, self._full_view = rebuilt, None
+            self._codes, self._scales = self._codes[kept], self._scales[kept]
+            self.documents = [self.documents[row] for row in kept]
+            self._rows = {doc.id: row for row, doc in enumerate(self.documents)}
+        return True
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert normalized vectors to the storage precision, with a scale per vector for int8."""
+        if self.precision == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return vectors.astype(PRECISION_DTYPES[self.precision]), np.ones(len(vectors), dtype=np.float32)
+
+    def _full_precision(self, count: int) -> np.ndarray:
+        """Map the full-precision vectors stored on disk."""
+        if self._full_view is None or len(self._full_view) != count:
+            self._full_view = np.memmap(self._full_vectors, dtype=np.float32, mode="r", shape=(count, self._codes.shape[1]))
+        return self._full_view
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, namespace: Optional[str] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        with self._lock:
+            count = len(self.documents)
+            if not count:
+                return []
+            codes, scales, documents = self._codes[:count], self._scales[:count], self.documents[:count]
+            full_vectors = self._full_precision(count)
+
+        # Normalize a copy, the caller's vector is left untouched
+        query = np.array(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        # Score block by block, so a search never holds a float32 copy of every vector
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            scores[start:start + SEARCH_BLOCK_ROWS] = codes[start:start + SEARCH_BLOCK_ROWS].astype(np.float32) @ query
+        scores *= scales
+
+        # Documents outside the filter can never be returned
+        predicate = metadata_filter(filter)
+        if predicate:
+            scores[[not predicate(doc) for doc in documents]] = -np.inf
+
+        candidate_count = min(count, k * self.rescore_factor if self.rescore_factor else k)
+        candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        candidates = candidates[np.isfinite(scores[candidates])]
+
+        # Rescore the candidates at full precision
+        if self.rescore_factor:
+            scores = np.full(count, -np.inf, dtype=np.float32)
+            scores[candidates] = full_vectors[candidates] @ query
+
+        best = candidates[np.argsort(-scores[candidates])][:k]
+        return [(documents[index], float(scores[index])) for index in best]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "QuantizedVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
@@ -0,0 +1,127 @@
+import re
+import threading
+from typing import Optional
+from config.settings import QUERY_ROUTER_MIN_SCORE
+from services.speculative_retrieval import query_terms
+
+RETRIEVE_ROUTE = "retrieve"
+RESPOND_ROUTE = "respond"
+
+# Words of course material questions and their weight, weak words only count alongside others.
+# Words shared with programming vocabulary, such as "class", "module", "assignment", "schedule",
+# "lista" or "trabalho", are left out: a coding question using them is not about the course.
+RETRIEVAL_TERM_WEIGHTS = {
+    **dict.fromkeys((
+        "syllabus", "exam", "exams", "midterm", "grading", "deadline", "deadlines", "lecture", "lectures",
+        "homework", "bibliography", "prerequisite", "prerequisites", "curriculum",
+        "ementa", "prazo", "prazos", "aula", "aulas", "bibliografia", "cronograma", "disciplina", "disciplinas", "monitoria",
+    ), 1.0),
+    **dict.fromkeys((
+        "course", "courses", "semester", "grade", "grades", "professor", "slides", "chapter", "credits",
+        "curso", "cursos", "turma", "semestre", "nota", "notas", "capítulo", "créditos", "prova", "provas",
+    ), 0.5),
+}
+
+# Messages answered without retrieval: greetings, thanks, and questions about the conversation or the assistant
+CONVERSATIONAL_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r"^\W*(hi|hello|hey|good (morning|afternoon|evening)|oi|olá|ola|bom dia|boa tarde|boa noite)\b[\w\s,!.]{0,20}$",
+        r"^\W*(thanks|thank you|thx|ok|okay|cool|great|perfect|got it|bye|goodbye|obrigad[oa]|valeu|beleza|entendi|tchau|até mais)\b[\w\s,!.]{0,30}$",
+        r"\bwhat (did|have) i (just )?(ask|asked|say|said|write|written)\b",
+        r"\bo que (foi que )?eu (te )?(perguntei|disse|falei|escrevi)\b",
+        r"\b(who|what) are you\b|\bquem (é|e) voc(ê|e)\b",
+        r"\b(what can you do|o que voc(ê|e) (pode|sabe) fazer)\b",
+        r"\b(repeat|summari[sz]e|rephrase) (that|your (last )?(answer|reply))\b|\b(repita|resuma|reformule)\b",
+    )
+]
+
+class QueryRouter:
+    """
+    Local router deciding whether a user message needs the retrieval tool.
+
+    Messages with course material words are routed to retrieval, conversational
+    messages to a direct answer, anything else is left to the LLM decision. Routes are
+    compared with the LLM decision whenever both are available, to report the router
+    accuracy, and the decision latency of the LLM is tracked to report the time saved
+    by the routes taken without it.
+
+    Args:
+        min_score (float): Keyword score from which a message is routed to retrieval.
+    """
+    def __init__(self, min_score: float = QUERY_ROUTER_MIN_SCORE):
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.ambiguous = 0
+        self.compared = 0
+        self.agreed = 0
+        self.disagreements = {}
+        self.fast_paths = 0
+        self.llm_decisions = 0
+        self.llm_decision_seconds = 0.0
+        self.time_saved = 0.0
+
+    def route(self, message: str) -> Optional[str]:
+        """
+        Route a user message locally.
+
+        Returns:
+            Optional[str]: RETRIEVE_ROUTE or RESPOND_ROUTE when confident, None when the
+            LLM has to decide.
+        """
+        score = sum(RETRIEVAL_TERM_WEIGHTS.get(term, 0.0) for term in query_terms(message))
+        conversational = any(pattern.search(message) for pattern in CONVERSATIONAL_PATTERNS)
+
+        if score >= self.min_score and not conversational:
+            route = RETRIEVE_ROUTE
+        elif conversational and not score:
+            route = RESPOND_ROUTE
+        else:
+            route = None
+
+        with self._lock:
+            if route is None:
+                self.ambiguous += 1
+            else:
+                self.routed += 1
+        return route
+
+    def record_llm_decision(self, route: Optional[str], llm_route: str, seconds: float):
+        """Record the decision of the LLM and its latency, compared with the local route when there is one."""
+        with self._lock:
+            self.llm_decisions += 1
+            self.llm_decision_seconds += seconds
+            if route is None:
+                return
+            self.compared += 1
+            if route == llm_route:
+                self.agreed += 1
+            else:
+                disagreement = f"{route}->{llm_route}"
+                self.disagreements[disagreement] = self.disagreements.get(disagreement, 0) + 1
+
+    def record_fast_path(self):
+        """Record a route taken without the LLM decision, saving its mean latency."""
+        with self._lock:
+            self.fast_paths += 1
+            if self.llm_decisions:
+                self.time_saved += self.llm_decision_seconds / self.llm_decisions
+
+    def stats(self) -> dict:
+        """Routing coverage, agreement with the LLM decision and decision time saved."""
+        with self._lock:
+            routed_total = self.routed + self.ambiguous
+            return {
+                "routed": self.routed,
+                "ambiguous": self.ambiguous,
+                "coverage": self.routed / routed_total if routed_total else 0.0,
+                "compared": self.compared,
+                "accuracy": self.agreed / self.compared if self.compared else None,
+                "disagreements": dict(self.disagreements),
+                "fast_paths": self.fast_paths,
+                "llm_decision_mean": self.llm_decision_seconds / self.llm_decisions if self.llm_decisions else 0.0,
+                "time_saved": self.time_saved,
+            }
+
+# Router shared by every session of the process
+query_router = QueryRouter()
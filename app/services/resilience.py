@@ -0,0 +1,300 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterator, Optional, TypeVar
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    EMBEDDING_CALL_TIMEOUT,
+    INDEXING_CALL_BUDGET,
+    INDEXING_CALL_TIMEOUT,
+    LLM_CALL_BUDGET,
+    LLM_CALL_TIMEOUT,
+    PROVIDER_CALL_WORKERS,
+    RETRIEVAL_CALL_BUDGET,
+    RETRIEVAL_HEDGE_DELAY,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_ATTEMPTS,
+    VECTORSTORE_CALL_TIMEOUT,
+)
+
+logger = EnhancedLogger(setup_logging())
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying, any other client error fails immediately
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open."""
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is temporarily unavailable, retry in {retry_after:.0f}s.")
+
+class CallTimeoutError(TimeoutError):
+    """Raised when a provider call exceeds its timeout or its overall latency budget."""
+    pass
+
+def error_status(error: Exception) -> Optional[int]:
+    """Find the HTTP status code carried by a provider exception, if any."""
+    for source in (error, getattr(error, "response", None), getattr(error, "request_obj", None)):
+        for attribute in ("status_code", "status"):
+            status = getattr(source, attribute, None)
+            if isinstance(status, int):
+                return status
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, throttling and server errors are retried, client errors are not."""
+    status = error_status(error)
+    return status is None or status >= 500 or status in RETRYABLE_STATUSES
+
+class CircuitBreaker:
+    """
+    Circuit breaker failing fast once a provider keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are
+    rejected for `reset_timeout` seconds. A single trial call is then let through,
+    closing the circuit on success or opening it again on failure. A trial call that
+    reports no outcome within `reset_timeout` seconds is given up and another one is
+    let through.
+    """
+    def __init__(self, provider: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Reject the call while the circuit is open or while its trial call is in flight."""
+        with self._lock:
+            if self.state == "half_open":
+                if time.monotonic() - self.trial_started_at < self.reset_timeout:
+                    raise CircuitOpenError(self.provider, 1.0)
+                # The trial call never reported back, so the circuit opens again from the start of the trial
+                logger.resilience(self.provider, "Trial call expired, circuit opened")
+                self.state = "open"
+                self.opened_at = self.trial_started_at
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(self.provider, remaining)
+                self.state = "half_open"
+                self.trial_started_at = time.monotonic()
+                logger.resilience(self.provider, "Circuit half-open, sending a trial call")
+
+    def abandon_trial(self):
+        """Let the next call be a trial call when the current one ends without an outcome, e.g. on a Streamlit rerun."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.resilience(self.provider, "Circuit closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.resilience(self.provider, f"Circuit opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class ResiliencePolicy:
+    """
+    Timeouts, retries and hedging applied to the calls of one provider.
+
+    Args:
+        provider (str): Provider name, calls sharing it share a circuit breaker and a thread pool.
+        timeout (float): Maximum duration of a single attempt in seconds.
+        budget (float): Maximum duration of the call across all attempts and backoff.
+        max_attempts (int): Maximum number of attempts.
+        hedge_delay (float, optional): Delay after which a duplicate attempt is started if the first has not answered.
+    """
+    def __init__(self, provider: str, timeout: float, budget: float, max_attempts: int = RETRY_MAX_ATTEMPTS, hedge_delay: Optional[float] = None):
+        self.provider = provider
+        self.timeout = timeout
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.hedge_delay = hedge_delay
+        self.breaker = get_circuit_breaker(provider)
+        self.executor = get_executor(provider)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Attempts run in worker threads so a timed out call does not block the request thread.
+# Each provider has its own pool, so attempts left hanging by an outage of one provider
+# only exhaust its pool and never delay the calls of the others.
+_executors = {}
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker of a provider."""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+def get_executor(provider: str) -> ThreadPoolExecutor:
+    """Get the process-wide thread pool running the attempts of a provider."""
+    with _breakers_lock:
+        if provider not in _executors:
+            _executors[provider] = ThreadPoolExecutor(max_workers=PROVIDER_CALL_WORKERS, thread_name_prefix=f"{provider}-call")
+        return _executors[provider]
+
+def _backoff(attempt: int, deadline: float) -> bool:
+    """Sleep a full-jitter exponential backoff, returning False if it would exceed the deadline."""
+    delay = random.uniform(0, RETRY_BASE_DELAY * (2 ** attempt))
+    if time.monotonic() + delay >= deadline:
+        return False
+    time.sleep(delay)
+    return True
+
+def _attempt(call: Callable[[], T], timeout: float, hedge_delay: Optional[float], executor: ThreadPoolExecutor) -> T:
+    """Run one attempt with a timeout, hedged with a duplicate request if it is slow to answer."""
+    # The timeout covers the hedge delay, a hedged attempt gets no extra time
+    deadline = time.monotonic() + timeout
+    futures = [executor.submit(call)]
+
+    if hedge_delay is not None and hedge_delay < timeout:
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            futures.append(executor.submit(call))
+
+    last_error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            last_error = future.exception()
+
+    if last_error is not None and not pending:
+        raise last_error
+    raise CallTimeoutError(f"Call timed out after {timeout:.1f}s.")
+
+def call_with_resilience(call: Callable[[], T], policy: ResiliencePolicy) -> T:
+    """
+    Call a provider with per-attempt timeouts, jittered retries within the latency budget,
+    optional hedging and the provider circuit breaker.
+
+    Args:
+        call (Callable): The provider call, invoked once per attempt.
+        policy (ResiliencePolicy): The policy of the provider.
+
+    Returns:
+        The result of the first successful attempt.
+
+    Raises:
+        CircuitOpenError: If the provider circuit is open.
+        CallTimeoutError: If the attempts exceed the latency budget.
+        Exception: The provider error when it is not retryable or attempts are exhausted.
+    """
+    deadline = time.monotonic() + policy.budget
+
+    for attempt in range(policy.max_attempts):
+        policy.breaker.before_call()
+        timeout = min(policy.timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            policy.breaker.abandon_trial()
+            raise CallTimeoutError(f"{policy.provider} call exceeded its {policy.budget:.1f}s budget.")
+
+        try:
+            result = _attempt(call, timeout, policy.hedge_delay, policy.executor)
+            policy.breaker.record_success()
+            return result
+
+        except Exception as e:
+            # A client error means the provider answered, so only retryable errors count as failures
+            retryable = is_retryable(e)
+            if retryable:
+                policy.breaker.record_failure()
+            else:
+                policy.breaker.record_success()
+            logger.resilience(policy.provider, f"Attempt {attempt + 1} failed: {e}")
+
+            last_attempt = attempt + 1 >= policy.max_attempts
+            if not retryable or last_attempt or not _backoff(attempt, deadline):
+                raise
+
+        except BaseException:
+            policy.breaker.abandon_trial()
+            raise
+
+def stream_with_resilience(open_stream: Callable[[], Iterator[T]], policy: ResiliencePolicy) -> Iterator[T]:
+    """
+    Stream from a provider, retrying within the latency budget until the first chunk arrives.
+
+    The stream runs in the calling thread so UI callbacks keep their context, and its
+    timeouts come from the HTTP client. Once a chunk has been yielded the stream is
+    not retried, to avoid duplicating the output already shown.
+    """
+    deadline = time.monotonic() + policy.budget
+
+    for attempt in range(policy.max_attempts):
+        policy.breaker.before_call()
+        try:
+            stream = iter(open_stream())
+            first_chunk = next(stream, None)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if retryable:
+                policy.breaker.record_failure()
+            else:
+                policy.breaker.record_success()
+            logger.resilience(policy.provider, f"Stream attempt {attempt + 1} failed: {e}")
+
+            last_attempt = attempt + 1 >= policy.max_attempts
+            if not retryable or last_attempt or not _backoff(attempt, deadline):
+                raise
+            continue
+
+        except BaseException:
+            policy.breaker.abandon_trial()
+            raise
+
+        break
+
+    try:
+        if first_chunk is not None:
+            yield first_chunk
+        yield from stream
+    except Exception:
+        policy.breaker.record_failure()
+        raise
+    except BaseException:
+        # The consumer stopped reading, e.g. on GeneratorExit or a Streamlit rerun, while the provider was answering
+        policy.breaker.record_success()
+        raise
+    policy.breaker.record_success()
+
+def breaker_states() -> dict:
+    """Snapshot of the circuit state of every provider."""
+    with _breakers_lock:
+        return {provider: breaker.state for provider, breaker in _breakers.items()}
+
+# Policies of the providers used by the application
+LLM_POLICY = ResiliencePolicy("maritalk", timeout=LLM_CALL_TIMEOUT, budget=LLM_CALL_BUDGET)
+EMBEDDING_POLICY = ResiliencePolicy("openai_embeddings", timeout=EMBEDDING_CALL_TIMEOUT, budget=RETRIEVAL_CALL_BUDGET, hedge_delay=RETRIEVAL_HEDGE_DELAY)
+VECTORSTORE_POLICY = ResiliencePolicy("pinecone", timeout=VECTORSTORE_CALL_TIMEOUT, budget=RETRIEVAL_CALL_BUDGET, hedge_delay=RETRIEVAL_HEDGE_DELAY)
+# Indexing has its own circuits and pools, so slow bulk uploads never fail fast or starve the retrieval of the students
+DOCUMENT_EMBEDDING_POLICY = ResiliencePolicy("openai_embeddings_indexing", timeout=INDEXING_CALL_TIMEOUT, budget=INDEXING_CALL_BUDGET)
+INDEXING_POLICY = ResiliencePolicy("pinecone_indexing", timeout=INDEXING_CALL_TIMEOUT, budget=INDEXING_CALL_BUDGET)
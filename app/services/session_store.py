@@ -0,0 +1,198 @@
+import json
+import sys
+import tempfile
+import threading
+import weakref
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+from langchain_core.messages import BaseMessage
+from config.settings import SESSION_MEMORY_CAP_BYTES, SESSION_SPILL_DIR
+from utils.message_codec import ROLE_TO_MESSAGE, message_role
+
+# Records always kept in memory, whatever their size
+MIN_RECORDS_IN_MEMORY = 2
+
+class MessageRecord:
+    """A conversation message reduced to its role, its content and the ids of the chunks it cites."""
+    __slots__ = ("role", "content", "chunk_ids")
+
+    def __init__(self, role: str, content: str, chunk_ids: Tuple[str, ...] = ()):
+        self.role = role
+        self.content = content
+        self.chunk_ids = chunk_ids
+
+    @classmethod
+    def from_message(cls, message: BaseMessage) -> Optional["MessageRecord"]:
+        """Build the record of a conversation message, None for tool traffic."""
+        role = message_role(message)
+        if not role:
+            return None
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        return cls(role, content, tuple(message.additional_kwargs.get("chunk_ids", ())))
+
+    def to_message(self) -> BaseMessage:
+        additional_kwargs = {"chunk_ids": list(self.chunk_ids)} if self.chunk_ids else {}
+        return ROLE_TO_MESSAGE[self.role](content=self.content, additional_kwargs=additional_kwargs)
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the record."""
+        return sys.getsizeof(self) + sys.getsizeof(self.content) + sys.getsizeof(self.chunk_ids) + sum(sys.getsizeof(chunk_id) for chunk_id in self.chunk_ids)
+
+class SessionMessageStore:
+    """
+    Compact message history of one chat session.
+
+    Messages are kept as slotted records without tool traffic or retrieved documents.
+    When the records in memory exceed the session cap, the oldest ones are appended
+    to a spill file on disk and read back only when an old page of the history is
+    displayed. The prompt of a turn is built from the records still in memory, the
+    cap keeping well above what the model context can hold.
+
+    Args:
+        memory_cap_bytes (int): Bytes of records kept in memory before spilling.
+        spill_dir (str, optional): Directory of the spill file.
+    """
+    def __init__(self, memory_cap_bytes: int = SESSION_MEMORY_CAP_BYTES, spill_dir: Optional[str] = None):
+        self.memory_cap_bytes = memory_cap_bytes
+        self.spill_dir = spill_dir or SESSION_SPILL_DIR or None
+        self._records: List[MessageRecord] = []
+        self._memory_bytes = 0
+        self._spill_file = None
+        self._spill_offsets = array("q")
+        self._closed = False
+        self._lock = threading.Lock()
+        _register(self)
+
+    def __len__(self) -> int:
+        return len(self._spill_offsets) + len(self._records)
+
+    @property
+    def spilled_count(self) -> int:
+        return len(self._spill_offsets)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the records kept in memory."""
+        return self._memory_bytes
+
+    def append_message(self, message: BaseMessage):
+        self.extend_messages([message])
+
+    def extend_messages(self, messages: Iterable[BaseMessage]):
+        """Add conversation messages, skipping tool traffic, and spill if the cap is exceeded."""
+        with self._lock:
+            self._check_open()
+            for message in messages:
+                record = MessageRecord.from_message(message)
+                if record is not None:
+                    self._records.append(record)
+                    self._memory_bytes += record.size_bytes()
+            self._spill_over_cap()
+
+    def _spill_over_cap(self):
+        """Move the oldest records to disk until the memory in use is back under three quarters of the cap."""
+        if self._memory_bytes <= self.memory_cap_bytes:
+            return
+
+        target = self.memory_cap_bytes * 3 // 4
+        spill_count, freed = 0, 0
+        while len(self._records) - spill_count > MIN_RECORDS_IN_MEMORY and self._memory_bytes - freed > target:
+            freed += self._records[spill_count].size_bytes()
+            spill_count += 1
+        if not spill_count:
+            return
+
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(mode="w+b", prefix="session-", suffix=".jsonl", dir=self.spill_dir)
+        self._spill_file.seek(0, 2)
+        for record in self._records[:spill_count]:
+            self._spill_offsets.append(self._spill_file.tell())
+            self._spill_file.write(json.dumps([record.role, record.content, list(record.chunk_ids)]).encode("utf-8") + b"\n")
+        self._spill_file.flush()
+
+        del self._records[:spill_count]
+        self._memory_bytes -= freed
+
+    def _read_spilled(self, start: int, stop: int) -> List[MessageRecord]:
+        if start >= stop:
+            return []
+        self._spill_file.seek(self._spill_offsets[start])
+        records = []
+        for _ in range(stop - start):
+            role, content, chunk_ids = json.loads(self._spill_file.readline())
+            records.append(MessageRecord(role, content, tuple(chunk_ids)))
+        return records
+
+    def slice(self, start: int, stop: int) -> List[MessageRecord]:
+        """Get the records between two positions of the whole history, reading spilled ones from disk."""
+        with self._lock:
+            self._check_open()
+            total, spilled = len(self), len(self._spill_offsets)
+            start, stop = max(0, min(start, total)), max(0, min(stop, total))
+            records = self._read_spilled(start, min(stop, spilled))
+            records.extend(self._records[max(start - spilled, 0):max(stop - spilled, 0)])
+            return records
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self.slice(0, len(self)))
+
+    def to_messages(self) -> List[BaseMessage]:
+        """Build the conversation messages of the records kept in memory, for the next turn."""
+        with self._lock:
+            self._check_open()
+            return [record.to_message() for record in self._records]
+
+    def record_turn(self, prior_messages: List[BaseMessage], messages: List[BaseMessage]):
+        """
+        Store the user's message and the answer of a successful turn.
+
+        Args:
+            prior_messages (List[BaseMessage]): The history the turn was given, from to_messages.
+            messages (List[BaseMessage]): The conversation returned by the turn, starting with that history.
+        """
+        # The prompt holds only the records in memory, so the new messages follow it and not the whole history
+        self.extend_messages(messages[len(prior_messages):])
+
+    def close(self):
+        """Delete the spill file and drop the history, the store can no longer be used."""
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            self._spill_offsets = array("q")
+            self._records = []
+            self._memory_bytes = 0
+            self._closed = True
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("The session message store is closed.")
+
+    def stats(self) -> dict:
+        return {
+            "messages": len(self),
+            "in_memory": len(self._records),
+            "spilled": self.spilled_count,
+            "memory_bytes": self._memory_bytes,
+        }
+
+# Stores of the live sessions, a store leaves the registry when its session is dropped
+_stores = weakref.WeakSet()
+_stores_lock = threading.Lock()
+
+def _register(store: SessionMessageStore):
+    # The spill file is an unlinked temporary file, it is released with the store
+    with _stores_lock:
+        _stores.add(store)
+
+def session_memory_stats() -> dict:
+    """Memory held by the message stores of every live session of the process."""
+    with _stores_lock:
+        stores = list(_stores)
+    sizes = [store.memory_bytes() for store in stores]
+    return {
+        "sessions": len(stores),
+        "memory_bytes": sum(sizes),
+        "max_session_bytes": max(sizes, default=0),
+        "messages": sum(len(store) for store in stores),
+        "spilled": sum(store.spilled_count for store in stores),
+    }
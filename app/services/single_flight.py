@@ -0,0 +1,165 @@
+import hashlib
+import threading
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from services.resilience import ResiliencePolicy, call_with_resilience
+
+class FlightAbandonedError(RuntimeError):
+    """Raised to the callers of a flight whose leader ended without a result, e.g. on a Streamlit rerun."""
+    def __init__(self):
+        super().__init__("The call shared by this request ended without a result, please retry.")
+
+class _Flight:
+    """A call in flight, shared by every caller with the same key."""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller of a key runs the call, callers arriving while it is in flight
+    wait for it and receive its result or its exception. Nothing is cached: once the
+    call ends, the next caller of the key runs it again.
+    """
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+
+    def begin(self, key: Hashable) -> Tuple[_Flight, bool]:
+        """
+        Join the flight of a key, starting it when none is in flight.
+
+        Returns:
+            Tuple[_Flight, bool]: The flight and whether the caller leads it. The leader
+            must end it with finish.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.executions += 1
+            return flight, True
+
+    def finish(self, key: Hashable, flight: _Flight, result: Any = None, error: Exception = None):
+        """End a flight, releasing its waiting callers."""
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def record_shared(self, count: int):
+        """Count calls served by a flight their caller already joined, such as repeats within a batch."""
+        with self._lock:
+            self.calls += count
+
+    def do(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """Run a call, or wait for the identical call already in flight."""
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait()
+
+        # The flight ends even when the call is interrupted by a BaseException, so its callers never hang
+        result, error = None, None
+        try:
+            result = call()
+            return result
+        except Exception as e:
+            error = e
+            raise
+        except BaseException:
+            error = FlightAbandonedError()
+            raise
+        finally:
+            self.finish(key, flight, result=result, error=error)
+
+    def stats(self) -> dict:
+        """Calls received, calls executed and calls served by another in-flight call."""
+        with self._lock:
+            deduplicated = self.calls - self.executions
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "deduplicated": deduplicated,
+                "dedup_rate": deduplicated / self.calls if self.calls else 0.0,
+            }
+
+class CoalescingEmbeddings(Embeddings):
+    """
+    Embedding model wrapper sharing in-flight requests for identical document texts.
+
+    Texts already being embedded by another caller, or repeated within a batch, are
+    not sent again; the remaining texts of a batch still go out in one request.
+    The request of a flight is retried inside it, under the document policy, so a
+    caller never joins a timed-out attempt; embed_documents must therefore not be
+    called from within a resilience attempt. Queries are passed through,
+    search_vectorstore coalesces them around their retries in the same way.
+
+    Args:
+        embeddings (Embeddings): The wrapped embedding model.
+        flight (SingleFlight): The flights shared by the wrappers of the process.
+        scope (Hashable): Identifies the model and settings, only texts of the same
+            scope are coalesced.
+        policy (ResiliencePolicy, optional): Timeouts and retries of the document
+            requests, sent once without retries when not set.
+    """
+    def __init__(self, embeddings: Embeddings, flight: SingleFlight, scope: Hashable, policy: Optional[ResiliencePolicy] = None):
+        self.embeddings = embeddings
+        self.flight = flight
+        self.scope = scope
+        self.policy = policy
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        flights, led = {}, []
+        for text in dict.fromkeys(texts):
+            flights[text], leader = self.flight.begin((self.scope, "document", text))
+            if leader:
+                led.append(text)
+        self.flight.record_shared(len(texts) - len(flights))
+
+        # Embed the texts this call leads, then collect the ones led by other callers
+        vectors, error = [], None
+        try:
+            vectors = self._embed(led) if led else []
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Every led flight ends, also on a BaseException or when fewer vectors than texts came back
+            for position, text in enumerate(led):
+                if position < len(vectors):
+                    self.flight.finish((self.scope, "document", text), flights[text], result=vectors[position])
+                else:
+                    self.flight.finish((self.scope, "document", text), flights[text], error=error or FlightAbandonedError())
+
+        return [flights[text].wait() for text in texts]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if self.policy is None:
+            return self.embeddings.embed_documents(texts)
+        return call_with_resilience(lambda: self.embeddings.embed_documents(texts), self.policy)
+
+def credential_scope(*settings: str) -> str:
+    """Hash settings that include credentials into a coalescing scope."""
+    return hashlib.sha256("\0".join(settings).encode("utf-8")).hexdigest()
+
+# Flights shared by every session of the process
+retrieval_flight = SingleFlight()
+embedding_flight = SingleFlight()
@@ -0,0 +1,116 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from config.settings import SPECULATION_MIN_QUERY_OVERLAP, SPECULATION_MAX_WORKERS
+
+# Words ignored when comparing the user message with the query chosen by the LLM
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "can", "could", "do", "does", "for", "how", "i", "in", "is",
+    "me", "my", "of", "on", "please", "tell", "the", "to", "what", "when", "where", "which", "who",
+    "you", "o", "as", "de", "da", "das", "dos", "e", "em", "para", "por", "qual", "quais", "que",
+}
+
+def query_terms(text: str) -> set:
+    """Normalize a query into its set of lowercase content words."""
+    return {word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS}
+
+def queries_equivalent(speculative_query: str, tool_query: str, min_overlap: float = SPECULATION_MIN_QUERY_OVERLAP) -> bool:
+    """
+    Check whether a speculative search can answer the query chosen by the LLM.
+
+    The queries are equivalent when the share of common content words over all the
+    words of both queries (their Jaccard similarity) reaches the minimum overlap, so a
+    query contained in a much longer one does not match it.
+    """
+    speculative_terms, tool_terms = query_terms(speculative_query), query_terms(tool_query)
+    if not speculative_terms or not tool_terms:
+        return speculative_query.strip().lower() == tool_query.strip().lower()
+    overlap = len(speculative_terms & tool_terms) / len(speculative_terms | tool_terms)
+    return overlap >= min_overlap
+
+class SpeculativeRetriever:
+    """
+    Runs vector searches on the raw user message while the LLM decides whether to call
+    the retrieval tool, and hands the prefetched results to the tool when its query matches.
+    """
+    def __init__(self, max_workers: int = SPECULATION_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-retrieval")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.time_saved = 0.0
+
+    def start(self, speculation_id: str, query: str, search: Callable[[str], list]):
+        """Start a speculative search for a turn."""
+        def timed_search():
+            started = time.perf_counter()
+            docs = search(query)
+            return docs, time.perf_counter() - started
+
+        future = self._executor.submit(timed_search)
+        with self._lock:
+            self._pending[speculation_id] = (query, future)
+
+    def take(self, speculation_id: str, tool_query: str) -> Optional[list]:
+        """
+        Claim the prefetched results of a turn for the query chosen by the LLM.
+
+        Returns:
+            Optional[list]: The prefetched documents, or None if there is no equivalent successful speculation.
+        """
+        with self._lock:
+            pending = self._pending.pop(speculation_id, None)
+        if pending is None:
+            return None
+
+        speculative_query, future = pending
+        if not queries_equivalent(speculative_query, tool_query):
+            future.cancel()
+            self._record_miss()
+            return None
+
+        # Wait for the search still in flight, the time it already ran is the time saved
+        waiting_started = time.perf_counter()
+        try:
+            docs, search_duration = future.result()
+        except Exception:
+            self._record_miss()
+            return None
+        waited = time.perf_counter() - waiting_started
+
+        with self._lock:
+            self.hits += 1
+            self.time_saved += max(search_duration - waited, 0.0)
+        return docs
+
+    def discard(self, speculation_id: str):
+        """Drop the speculative search of a turn that did not call the retrieval tool."""
+        with self._lock:
+            pending = self._pending.pop(speculation_id, None)
+            if pending is not None:
+                self.discarded += 1
+        if pending is not None:
+            pending[1].cancel()
+
+    def _record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        """Snapshot of the speculation hit rate and total time saved."""
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "discarded": self.discarded,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "time_saved": self.time_saved,
+            }
+
+# Shared by every session in the process
+speculative_retriever = SpeculativeRetriever()
@@ -1,62 +1,101 @@
-import streamlit as st
-from typing_extensions import TypedDict, List
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing_extensions import Annotated, TypedDict, List
 from config.logging_config import setup_logging, EnhancedLogger
-from hook.stream_handler import StreamHandler
-from services.vectorstore_service import initialize_vectorstore
+from hook.chat_events import ChatEventSink, get_event_sink, get_session_id
+from hook.stream_handler import TokenSinkHandler
+from services.llm_client_pool import llm_client_pool
+from services.llm_scheduler import llm_scheduler, estimate_tokens, DECISION_PRIORITY, ANSWER_PRIORITY
+from services.query_router import query_router, RETRIEVE_ROUTE, RESPOND_ROUTE
+from services.resilience import LLM_POLICY, call_with_resilience, stream_with_resilience
+from services.single_flight import embedding_flight, retrieval_flight
+from services.speculative_retrieval import speculative_retriever
+from services.vectorstore_service import search_vectorstore
+from config.settings import RETRIEVAL_TOP_K, LLM_DECISION_OUTPUT_ESTIMATE, LLM_ANSWER_OUTPUT_ESTIMATE, LLM_NODE_PROFILES, QUERY_ROUTER_MODE
 from template.rag_prompt import RAG_SYSTEM_PROMPT
 from template.tool_prompt import TOOL_SYSTEM_PROMPT
 from utils.chat_formatter import format_chat_messages
 from utils.tool_call_parser import parse_tool_call
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, trim_messages
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langchain_community.chat_models import ChatMaritalk
-from langgraph.graph import StateGraph, MessagesState, END
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import InjectedState, ToolNode, tools_condition
 
 logger = EnhancedLogger(setup_logging())
 
+# Token counting runs the tokenizer over the whole prompt, so usage is logged by a background thread
+_usage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage-log")
+
 # Define the state for the graph
+# Nodes return only the messages they add, the reducer appends them to the conversation
+# Connection settings travel in the state so tools receive them server-side instead of from the LLM
 class MessagesState(TypedDict):
-    messages: List
-
-def initialize_llm(llm_api_key: str, stream: bool = True) -> ChatMaritalk:
+    messages: Annotated[List, add_messages]
+    llm_api_key: str
+    pinecone_api_key: str
+    pinecone_index_name: str
+    embedding_model: str
+    openai_api_key: str
+    course: str
+    speculative_retrieval: bool
+    speculation_id: str
+
+# Arguments the LLM is allowed to provide for each tool, everything else is injected from the state
+TOOL_MODEL_ARGUMENTS = {"retrieve": {"query"}}
+
+# Settings the LLM used to echo back in every tool call before they were injected server-side
+INJECTED_TOOL_SETTINGS = ("pinecone_api_key", "pinecone_index_name", "embedding_model")
+
+# The tool decision prompt is stable across turns so it is rendered once
+TOOL_DECISION_PROMPT = TOOL_SYSTEM_PROMPT.format()
+
+def initialize_llm(llm_api_key: str, stream: bool = True, node: str = "generate") -> ChatMaritalk:
     """
-    Initialize the Maritalk chat model with the provided API key.
+    Get the pooled Maritalk chat model for the provided API key and graph node.
+
+    Clients are shared across turns and sessions, so callbacks must be passed per call
+    through the run config instead of being set on the client.
     
     Args:
         llm_api_key (str): The API key for the Maritalk model.
         stream (bool): Whether to enable streaming.
+        node (str): The LLM profile of the calling step, "decision", "direct" or "generate".
     
     Returns:
-        ChatMaritalk: An instance of the Maritalk chat model.
+        ChatMaritalk: A pooled instance of the Maritalk chat model.
     """
+    profile = LLM_NODE_PROFILES[node]
 
-    return ChatMaritalk(
-        model="sabia-3",
-        api_key=llm_api_key,
-        max_tokens=50000,
-        temperature=0.8,
+    return llm_client_pool.get(
+        llm_api_key,
+        model=profile["model"],
         stream=stream,
-        callbacks=[],
+        temperature=profile["temperature"],
+        max_tokens=profile["max_tokens"],
     )
 
 @tool(response_format="content_and_artifact")
-def retrieve(query: str, pinecone_api_key: str, pinecone_index_name: str, embedding_model: str, openai_api_key: str) -> tuple[str, List]:
+def retrieve(query: str, state: Annotated[dict, InjectedState]) -> tuple[str, List]:
     """Retrieve relevant information about course syllabus from the vector store using the provided query."""
     try:
         logger.tool_query("Retrieve with query", query)
 
-        # Initialize the vector store
-        vector_store = initialize_vectorstore(
-            api_key=pinecone_api_key,
-            index_name=pinecone_index_name,
-            embedding_model=embedding_model,
-            openai_api_key=openai_api_key
-        )  
+        # Use the speculative search started with the decision call when it answers the same query
+        retrieved_docs = None
+        if state.get("speculation_id"):
+            retrieved_docs = speculative_retriever.take(state["speculation_id"], query)
+            logger.speculation("Hit" if retrieved_docs is not None else "Miss", speculative_retriever.stats())
 
-        # Perform the similarity search     
-        retrieved_docs = vector_store.similarity_search(query, k=3)
+        # Perform the similarity search with the connection settings injected from the graph state
+        if retrieved_docs is None:
+            retrieved_docs = search_vectorstore(query, **retrieval_settings(state))
+            logger.coalescing(retrieval_flight.stats(), embedding_flight.stats())
         logger.tool_document("Documents found", retrieved_docs)
 
         # Serialize the retrieved documents
@@ -76,13 +115,52 @@ def retrieve(query: str, pinecone_api_key: str, pinecone_index_name: str, embedd
         logger.error("Unexpected error in 'retrieve' tool", e)
         return error_msg, []
 
-def query_or_respond(state: MessagesState):
+def retrieval_settings(state: MessagesState) -> dict:
+    """Collect the vector search settings injected from the graph state."""
+    return {
+        "pinecone_api_key": state.get("pinecone_api_key"),
+        "pinecone_index_name": state.get("pinecone_index_name"),
+        "embedding_model": state.get("embedding_model"),
+        "openai_api_key": state.get("openai_api_key"),
+        "k": RETRIEVAL_TOP_K,
+        "course": state.get("course"),
+    }
+
+def last_human_message(state: MessagesState):
+    """Get the last user message of the conversation, None if there is none."""
+    return next((m for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), None)
+
+def start_speculative_retrieval(state: MessagesState):
+    """Start a vector search on the raw user message while the LLM decides whether to retrieve."""
+    human_message = last_human_message(state)
+    if human_message is None:
+        return None
+
+    speculation_id = str(uuid.uuid4())
+    settings = retrieval_settings(state)
+    speculative_retriever.start(speculation_id, human_message.content, lambda query: search_vectorstore(query, **settings))
+    return speculation_id
+
+def query_or_respond(state: MessagesState, config: RunnableConfig):
     """Handles the logic for querying or responding based on the user's input and system instructions."""
-    llm_api_key = st.session_state.get("llm_api_key")
+    llm_api_key = state.get("llm_api_key")
+    sink = get_event_sink(config)
+
+    # Route the message locally, confident routes skip the decision call when the router is on
+    human_message = last_human_message(state)
+    route = query_router.route(human_message.content) if human_message and QUERY_ROUTER_MODE != "off" else None
+    fast_path = QUERY_ROUTER_MODE == "on" and route is not None
+    if route:
+        logger.query_router(f"Routed to {route}" if fast_path else f"Shadow route {route}", query_router.stats())
+    if fast_path and route == RETRIEVE_ROUTE:
+        return route_to_retrieval(human_message.content, sink)
+
+    # Start the vector search concurrently with the decision call when speculation is enabled
+    speculation_id = start_speculative_retrieval(state) if state.get("speculative_retrieval") and not fast_path else None
 
     # Initialize the LLM without streaming for tool detection
     # At this point, there is no need to stream for tool detection
-    llm_for_tools = initialize_llm(llm_api_key, stream=False) 
+    llm_for_tools = initialize_llm(llm_api_key, stream=False, node="decision")
 
     # Create a copy of messages for trimming excluding system message
     history_for_trimming = [msg for msg in state["messages"] if msg.type != "system"]
@@ -104,27 +182,35 @@ def query_or_respond(state: MessagesState):
     # Log trimmed messages for debugging
     logger.trimmer("All state messages excluding system", trimmed_messages)
 
-    # Generate system instructions that is oriented to generate the tool call or not
-    tool_decision_system_prompt = TOOL_SYSTEM_PROMPT.format(
-        pinecone_api_key=st.session_state.get("pinecone_api_key"),
-        pinecone_index_name=st.session_state.get("pinecone_index_name"),
-        embedding_model=st.session_state.get("embedding_model"),
-        openai_api_key=st.session_state.get("openai_api_key"),
-    )
+    # System instructions oriented to generate the tool call or not
+    prompt = [SystemMessage(content=TOOL_DECISION_PROMPT)] + trimmed_messages
 
-    prompt = [SystemMessage(content=tool_decision_system_prompt)] + trimmed_messages
+    # Conversational messages routed locally are answered without the decision call
+    if fast_path:
+        query_router.record_fast_path()
+        logger.llm_decision("Routed locally", "Generating and streaming final response")
+        accumulated_response = stream_answer(llm_api_key, prompt, sink, mode="direct", node="direct", session_id=get_session_id(config))
+        return {"messages": [AIMessage(content=accumulated_response)]}
     
     # Call the LLM to get initial response
     logger.llm_decision("Validating", "Checking if tool call is needed")
     
-    response = llm_for_tools.invoke(prompt)
+    try:
+        with llm_slot(get_session_id(config), DECISION_PRIORITY, prompt, LLM_DECISION_OUTPUT_ESTIMATE, sink) as ticket:
+            decision_started = time.perf_counter()
+            response = call_with_resilience(lambda: llm_for_tools.invoke(prompt), LLM_POLICY)
+            decision_seconds = time.perf_counter() - decision_started
+            ticket.used_tokens = estimate_tokens(prompt + [response])
+    except Exception:
+        if speculation_id:
+            speculative_retriever.discard(speculation_id)
+        raise
     content = response.content.strip()
     
     logger.llm_response("Response content", content)
     
     # Check if it looks like a JSON response starts with open brace
     if content.startswith('{'):
-        st.toast("I will use the tool to get more information, please wait a moment.", icon=":material/robot:")
         logger.llm_decision("Analyzing", "Potential tool call detected")
         
         # Try to balance braces if they're unbalanced
@@ -140,46 +226,147 @@ def query_or_respond(state: MessagesState):
         tool_call = parse_tool_call(response)
     
         if tool_call:
+            # Keep only the arguments the model is allowed to provide, settings are injected by the tool node
+            allowed_arguments = TOOL_MODEL_ARGUMENTS.get(tool_call["name"], set())
+            tool_call["args"] = {key: value for key, value in tool_call["args"].items() if key in allowed_arguments}
+            log_usage_in_background(log_decision_token_usage, llm_for_tools, prompt, content, state, decision_seconds, tool_called=True)
+            query_router.record_llm_decision(route, RETRIEVE_ROUTE, decision_seconds)
+            sink.on_event("tool_call", {"query": tool_call["args"].get("query", "")})
+
             # At AI message add the tool call attribute so it can be processed later
             response.tool_calls = [tool_call]    
             
             # Add response to history for tool processing
-            state["messages"].append(response)
-            return {"messages": [response]}
+            return {"messages": [response], "speculation_id": speculation_id}
+
+        # An unparseable tool call is answered directly instead of ending the turn without a reply
+        logger.llm_decision("Invalid tool call", "Falling back to a direct response")
+
+    # Discard the speculative search when the retrieval tool is not called
+    if speculation_id:
+        speculative_retriever.discard(speculation_id)
     
     # No tool call detected
-    else:
-        logger.llm_decision("No tool call detected", "Generating and streaming final response")
-        # For direct answers use streaming in UI
-        with st.chat_message("assistant", avatar=":material/mindfulness:"):
-            stream_container = st.empty()
-            stream_handler = StreamHandler(stream_container)
-            
-            # Initialize streaming LLM for direct response
-            streaming_llm = initialize_llm(llm_api_key, stream=True)
-            streaming_llm.callbacks = [stream_handler]
-            
-            # Generate a new streaming response
-            accumulated_response = ""
-            for chunk in streaming_llm.stream(prompt):
-                if chunk.content:
-                    accumulated_response += chunk.content
-            
-            # Create final message and add to history
-            ai_message = AIMessage(content=accumulated_response)
-            state["messages"].append(ai_message)
-            return {"messages": state["messages"]}
+    log_usage_in_background(log_decision_token_usage, llm_for_tools, prompt, content, state, decision_seconds, tool_called=False)
+    query_router.record_llm_decision(route, RESPOND_ROUTE, decision_seconds)
+    logger.llm_decision("No tool call detected", "Generating and streaming final response")
+
+    # For direct answers stream the response to the event sink
+    accumulated_response = stream_answer(llm_api_key, prompt, sink, mode="direct", node="direct", session_id=get_session_id(config))
+
+    # Create final message and add to history
+    ai_message = AIMessage(content=accumulated_response)
+    return {"messages": [ai_message]}
+
+def route_to_retrieval(query: str, sink: ChatEventSink) -> dict:
+    """Call the retrieval tool with the user message as query, without the decision call."""
+    query_router.record_fast_path()
+    logger.llm_decision("Routed locally", "Calling the retrieval tool")
+    sink.on_event("tool_call", {"query": query})
+    tool_call = {"name": "retrieve", "args": {"query": query}, "id": str(uuid.uuid4()), "type": "tool_call"}
+    return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+def llm_slot(session_id: str, priority: int, prompt: list, output_estimate: int, sink: ChatEventSink):
+    """Wait for an LLM slot for a session, reporting the queue position to the sink."""
+    return llm_scheduler.slot(
+        session_id,
+        priority,
+        estimate_tokens(prompt) + output_estimate,
+        on_wait=lambda position: sink.on_event("queue_position", {"position": position}),
+    )
+
+def stream_answer(llm_api_key: str, prompt: list, sink: ChatEventSink, mode: str, node: str = "generate", session_id: str = "default") -> str:
+    """
+    Stream an answer from the LLM to the event sink.
+
+    The stream waits for a slot of the LLM scheduler behind pending decision calls.
+    Its latency and token usage are logged under the node profile once it ends.
+
+    Args:
+        llm_api_key (str): The API key for the Maritalk model.
+        prompt (list): The messages sent to the LLM.
+        sink (ChatEventSink): The sink receiving the answer tokens.
+        mode (str): The answer mode reported to the sink, "direct" or "rag".
+        node (str): The LLM profile of the answer, "direct" or "generate".
+        session_id (str): The chat session, for fair queueing across sessions.
+
+    Returns:
+        str: The full answer.
+    """
+    token_handler = TokenSinkHandler(sink)
+
+    # Initialize streaming LLM for the answer
+    streaming_llm = initialize_llm(llm_api_key, stream=True, node=node)
+
+    # Stream response chunks to the sink once admitted
+    accumulated_response = ""
+    first_token_seconds = None
+    with llm_slot(session_id, ANSWER_PRIORITY, prompt, LLM_ANSWER_OUTPUT_ESTIMATE, sink) as ticket:
+        sink.on_event("message_start", {"mode": mode})
+        started = time.perf_counter()
+        for chunk in stream_with_resilience(lambda: streaming_llm.stream(prompt, config={"callbacks": [token_handler]}), LLM_POLICY):
+            if chunk.content:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                accumulated_response += chunk.content
+        seconds = time.perf_counter() - started
+        ticket.used_tokens = estimate_tokens(prompt + [accumulated_response])
+
+    sink.on_event("message_end", {"mode": mode, "content": accumulated_response})
+
+    log_usage_in_background(log_node_usage, streaming_llm, node, prompt, accumulated_response, seconds, first_token_seconds)
+    return accumulated_response
+
+def log_usage_in_background(log_usage, *args, **kwargs):
+    """Run a usage logging function on the usage thread, so the turn never waits for the token counts."""
+    def run():
+        try:
+            log_usage(*args, **kwargs)
+        except Exception as e:
+            logger.error("Usage logging", e)
+    _usage_executor.submit(run)
+
+def log_node_usage(llm: ChatMaritalk, node: str, prompt: list, content: str, seconds: float, first_token_seconds: float = None) -> tuple:
+    """
+    Log the model, latency and token usage of an LLM call made by a graph node.
+
+    Returns:
+        tuple: The prompt and output token counts.
+    """
+    prompt_tokens = llm.get_num_tokens_from_messages(prompt)
+    output_tokens = llm.get_num_tokens(content)
+    logger.node_usage(node, llm.model, seconds, first_token_seconds, prompt_tokens, output_tokens)
+    return prompt_tokens, output_tokens
         
-def generate(state: MessagesState):
+def log_decision_token_usage(llm: ChatMaritalk, prompt: list, content: str, state: MessagesState, seconds: float, tool_called: bool):
+    """
+    Log the usage of the tool decision call and the tokens saved by injecting settings server-side.
+
+    The saved tokens are the connection settings the prompt used to carry and the model used
+    to echo back inside every tool call.
+    """
+    prompt_tokens, output_tokens = log_node_usage(llm, "decision", prompt, content, seconds)
+
+    injected_settings = json.dumps({key: state.get(key) or "" for key in INJECTED_TOOL_SETTINGS})
+    injected_tokens = llm.get_num_tokens(injected_settings)
+    saved_output_tokens = injected_tokens if tool_called else 0
+
+    logger.token_usage("Tool decision", prompt_tokens, output_tokens, injected_tokens, saved_output_tokens)
+
+def generate(state: MessagesState, config: RunnableConfig):
     """Generate the final response using the tool's content."""
-    llm_api_key = st.session_state.get("llm_api_key")
+    llm_api_key = state.get("llm_api_key")
+    sink = get_event_sink(config)
 
     logger.llm_with_tools("Generating final response using knowledge base")
 
     # Get recent tool messages to extract context
-    recent_tool_messages = [
-        m for m in reversed(state["messages"]) if m.type == "tool"
-    ][::-1]
+    recent_tool_messages = []
+    for message in reversed(state["messages"]):
+        if message.type != "tool":
+            break
+        recent_tool_messages.append(message)
+    recent_tool_messages = recent_tool_messages[::-1]
     
     logger.llm_tool_response("Recent tool messages", recent_tool_messages)
     
@@ -191,29 +378,24 @@ def generate(state: MessagesState):
     # Check if the last tool message contains an error
     last_tool_msg = recent_tool_messages[0]
     if "Tool Error" in last_tool_msg.content:
-        last_tool_msg.content = last_tool_msg.content.replace("Tool Error", "")
-
-        # Remove last AI message from history to avoid message displaying in UI
-        if st.session_state["messages"] and isinstance(st.session_state["messages"][-1], AIMessage):
-            st.session_state["messages"].pop()
-
-        raise RuntimeError(last_tool_msg.content)
+        raise RuntimeError(last_tool_msg.content.replace("Tool Error", "").strip())
 
     # Extract context from tool responses
     docs_content = "\n\n".join(t.content for t in recent_tool_messages)
 
     # Filter conversation messages to include only human messages
     conversation_messages = [
-        m for m in st.session_state["messages"] if isinstance(m, HumanMessage)
+        m for m in state["messages"] if isinstance(m, HumanMessage)
     ]
     logger.llm_tool_response("All human conversation messages", conversation_messages)
 
     # Get the last human message
-    if conversation_messages:
-        last_human_message = conversation_messages[-1]
-        logger.llm_tool_last_message("Last human message", last_human_message.content)
-    else:
+    if not conversation_messages:
         logger.warning("No human messages found in the conversation history.")
+        raise RuntimeError("No question found to answer.")
+
+    last_human_message = conversation_messages[-1]
+    logger.llm_tool_last_message("Last human message", last_human_message.content)
 
     # Generate the system prompt for RAG
     rag_system_prompt = RAG_SYSTEM_PROMPT.format(context=docs_content)
@@ -221,55 +403,40 @@ def generate(state: MessagesState):
     # Create the final prompt for the LLM last human message and context
     prompt = [SystemMessage(content=rag_system_prompt), HumanMessage(content=last_human_message.content)] 
 
-    # Stream the response to UI
-    with st.chat_message("assistant", avatar=":material/psychology:"):
-        stream_container = st.empty()
-        stream_handler = StreamHandler(stream_container)
-        
-        # Re-initialize LLM with streaming for UI
-        streaming_llm = initialize_llm(llm_api_key, stream=True)
-        streaming_llm.callbacks = [stream_handler]
-        
-        # Stream response chunks to UI
-        accumulated_response = ""
-        for chunk in streaming_llm.stream(prompt):
-            if chunk.content:
-                accumulated_response += chunk.content
-        
-        # Remove last AI message from history to avoid tool call messsage persisting to next query
-        if st.session_state["messages"] and isinstance(st.session_state["messages"][-1], AIMessage):
-            st.session_state["messages"].pop()
-
-        # Create final message and add to history
-        ai_message = AIMessage(content=accumulated_response)
-        st.session_state["messages"].append(ai_message)
-        return {"messages": st.session_state["messages"]}
-
-
-# Build the state graph
-builder = StateGraph(MessagesState)
-builder.add_node("query_or_respond", query_or_respond)
-tool_node = ToolNode([retrieve])
-builder.add_node("tools", tool_node)
-builder.add_node("generate", generate)
-
-# Define entry point
-builder.set_entry_point("query_or_respond")
-
-# Define conditional edges
-builder.add_conditional_edges(
-    "query_or_respond",
-    tools_condition,
-    {"tools": "tools", END: END},
-)
-builder.add_edge("tools", "generate")
-builder.add_edge("generate", END)
-
-# Compile the graph
-graph = builder.compile()
-
-# Initialize memory for conversation persistence
-if "memory" not in st.session_state:
-    st.session_state["memory"] = MemorySaver()
-
-app = graph.with_config(checkpointer=st.session_state["memory"])
\ No newline at end of file
+    # Stream the response to the event sink
+    accumulated_response = stream_answer(llm_api_key, prompt, sink, mode="rag", node="generate", session_id=get_session_id(config))
+
+    # Create final message and add to history
+    ai_message = AIMessage(content=accumulated_response)
+    return {"messages": [ai_message]}
+
+@lru_cache(maxsize=1)
+def build_graph():
+    """
+    Build and compile the state graph of a chat turn, once per process.
+
+    The graph has no UI dependency, its output goes to the event sink of the run config.
+
+    Returns:
+        CompiledStateGraph: The compiled graph.
+    """
+    builder = StateGraph(MessagesState)
+    builder.add_node("query_or_respond", query_or_respond)
+    tool_node = ToolNode([retrieve])
+    builder.add_node("tools", tool_node)
+    builder.add_node("generate", generate)
+
+    # Define entry point
+    builder.set_entry_point("query_or_respond")
+
+    # Define conditional edges
+    builder.add_conditional_edges(
+        "query_or_respond",
+        tools_condition,
+        {"tools": "tools", END: END},
+    )
+    builder.add_edge("tools", "generate")
+    builder.add_edge("generate", END)
+
+    # Compile the graph
+    return builder.compile()
@@ -1,16 +1,45 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, PineconeException
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional
+from config.logging_config import setup_logging, EnhancedLogger
+from config.settings import (
+    EMBEDDING_DIMENSIONS,
+    RETRIEVAL_HEDGE_DELAY,
+    SHARD_SEARCH_MAX_WORKERS,
+    SHARD_SEARCH_TIMEOUT,
+    VECTORSTORE_BACKEND,
+    VECTORSTORE_CACHE_SIZE,
+    VECTORSTORE_SHARD_MAP,
+    VECTORSTORE_SHARDS,
+)
+from services.resilience import DOCUMENT_EMBEDDING_POLICY, EMBEDDING_POLICY, VECTORSTORE_POLICY, ResiliencePolicy, call_with_resilience
+from services.single_flight import CoalescingEmbeddings, credential_scope, embedding_flight, retrieval_flight
 
-def initialize_vectorstore(pinecone_api_key: str, pinecone_index_name: str, embedding_model: str, openai_api_key: str) -> PineconeVectorStore:
+if TYPE_CHECKING:
+    from langchain_pinecone import PineconeVectorStore
+
+logger = EnhancedLogger(setup_logging())
+
+# Searches of the shards run concurrently, their attempts run in the thread pool of their shard
+_shard_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_MAX_WORKERS, thread_name_prefix="shard-search")
+
+@lru_cache(maxsize=VECTORSTORE_CACHE_SIZE)
+def initialize_vectorstore(pinecone_api_key: str, pinecone_index_name: str, embedding_model: str, openai_api_key: str, namespace: Optional[str] = None) -> "PineconeVectorStore":
     """
     Initialize the vector store using Pinecone and OpenAI embeddings.
+
+    The store is built once per process for each set of settings and reused by
+    every search and indexing run. The provider SDKs are imported on first use.
     
     Args:
         pinecone_api_key (str): Pinecone API key.
         pinecone_index_name (str): Name of the Pinecone index.
         embedding_model (str): OpenAI embedding model name.
         openai_api_key (str): OpenAI API key for embedding generation.
+        namespace (str, optional): Index namespace to read and write, the default namespace if empty.
     
     Returns:
         PineconeVectorStore: Initialized vector store.
@@ -29,6 +58,14 @@ def initialize_vectorstore(pinecone_api_key: str, pinecone_index_name: str, embe
     if not openai_api_key:
         raise ValueError("OpenAI API key is required.")
 
+    # The in-process backend stands in for Pinecone in local runs and load tests
+    if VECTORSTORE_BACKEND == "memory":
+        from services.local_vectorstore import get_local_vectorstore
+        return get_local_vectorstore(pinecone_index_name, initialize_embeddings(embedding_model, openai_api_key), namespace)
+
+    from langchain_pinecone import PineconeVectorStore
+    from pinecone import Pinecone, PineconeException
+
     # Initialize Pinecone client
     try:
         pinecone = Pinecone(api_key=pinecone_api_key)
@@ -42,15 +79,190 @@ def initialize_vectorstore(pinecone_api_key: str, pinecone_index_name: str, embe
         raise RuntimeError(f"Failed to connect to Pinecone index '{pinecone_index_name}'.") from e
 
     # Initialize embeddings
-    try:
-        embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=openai_api_key)
-    except Exception as e:
-        raise RuntimeError(f"Failed to initialize embeddings with model '{embedding_model}'.") from e
+    embeddings = initialize_embeddings(embedding_model, openai_api_key)
 
     # Initialize vector store
     try:
-        vectorstore = PineconeVectorStore(embedding=embeddings, index=index)
+        vectorstore = PineconeVectorStore(embedding=embeddings, index=index, namespace=namespace or None)
     except Exception as e:
         raise RuntimeError(f"Failed to initialize PineconeVectorStore: {str(e)}") from e
 
     return vectorstore
+
+def initialize_embeddings(embedding_model: str, openai_api_key: str, dimensions: Optional[int] = None) -> CoalescingEmbeddings:
+    """
+    Initialize the OpenAI embedding model.
+
+    Identical texts embedded concurrently by different callers share one request,
+    retried under DOCUMENT_EMBEDDING_POLICY.
+
+    Args:
+        embedding_model (str): OpenAI embedding model name.
+        openai_api_key (str): OpenAI API key for embedding generation.
+        dimensions (int, optional): Number of dimensions the provider truncates the
+            embeddings to, EMBEDDING_DIMENSIONS by default and the model width when 0.
+
+    Raises:
+        ValueError: If dimensions are requested from a model that cannot truncate them.
+        RuntimeError: If the embedding model cannot be initialized.
+    """
+    from langchain_openai import OpenAIEmbeddings
+
+    dimensions = EMBEDDING_DIMENSIONS if dimensions is None else dimensions
+    if dimensions and not embedding_model.startswith("text-embedding-3"):
+        raise ValueError(f"Embedding dimensions can only be set for text-embedding-3 models, not '{embedding_model}'.")
+
+    try:
+        embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=openai_api_key, dimensions=dimensions or None)
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize embeddings with model '{embedding_model}'.") from e
+
+    return CoalescingEmbeddings(embeddings, embedding_flight, embedding_scope(embedding_model, openai_api_key, dimensions), DOCUMENT_EMBEDDING_POLICY)
+
+def embedding_scope(embedding_model: str, openai_api_key: str, dimensions: Optional[int] = None) -> str:
+    """Identify the embeddings of a model and account, identical texts only coalesce within it."""
+    dimensions = EMBEDDING_DIMENSIONS if dimensions is None else dimensions
+    return credential_scope(embedding_model, openai_api_key, str(dimensions))
+
+def course_namespace(course: Optional[str]) -> str:
+    """
+    Get the index namespace holding the chunks of a course.
+
+    Args:
+        course (str, optional): The course name, as entered by the user.
+
+    Returns:
+        str: A lowercase slug of the course name, or "" for the default namespace.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", (course or "").lower()).strip("-")
+
+def course_filter(course: Optional[str]) -> Optional[dict]:
+    """
+    Get the metadata filter restricting a search to the chunks of a course.
+
+    Chunks record the course as its namespace slug, so any spelling of the course
+    name selects the same chunks. Chunks indexed before the slug was recorded carry
+    the name as it was typed, which is matched too.
+    """
+    slug = course_namespace(course)
+    if not slug:
+        return None
+    if course == slug:
+        return {"course": {"$eq": slug}}
+    return {"course": {"$in": [slug, course]}}
+
+def read_shards(pinecone_index_name: str, course: Optional[str] = None) -> List[str]:
+    """
+    Get the indexes searched for a course.
+
+    A course of the shard map is searched in its own indexes, any other search goes
+    to every configured shard, and without shards to the index of the chat settings.
+    """
+    mapped = VECTORSTORE_SHARD_MAP.get(course_namespace(course)) if course else None
+    if mapped:
+        return [mapped] if isinstance(mapped, str) else list(mapped)
+    return list(VECTORSTORE_SHARDS) or [pinecone_index_name]
+
+def write_shard(pinecone_index_name: str, course: Optional[str] = None) -> str:
+    """
+    Get the index the chunks of a course are written to.
+
+    A course of the shard map is written to its first index. Other courses are spread
+    over the configured shards by a stable hash of their namespace, so a course always
+    lands in the same shard. Without shards it is the index of the chat settings.
+    """
+    mapped = VECTORSTORE_SHARD_MAP.get(course_namespace(course)) if course else None
+    if mapped:
+        return mapped if isinstance(mapped, str) else mapped[0]
+    if VECTORSTORE_SHARDS:
+        return VECTORSTORE_SHARDS[zlib.crc32(course_namespace(course).encode("utf-8")) % len(VECTORSTORE_SHARDS)]
+    return pinecone_index_name
+
+@lru_cache(maxsize=None)
+def shard_policy(index_name: str) -> ResiliencePolicy:
+    """Resilience policy of a shard, with its own circuit breaker so a failing index does not block the others."""
+    return ResiliencePolicy(f"pinecone:{index_name}", timeout=SHARD_SEARCH_TIMEOUT, budget=SHARD_SEARCH_TIMEOUT, hedge_delay=RETRIEVAL_HEDGE_DELAY)
+
+def search_shards(embedding: List[float], shards: List[str], pinecone_api_key: str, embedding_model: str, openai_api_key: str, k: int, course: Optional[str] = None) -> list:
+    """
+    Search several indexes concurrently with one query embedding and merge the results by score.
+
+    Each shard search is bounded by the shard timeout. Shards that fail or time out are
+    left out of the merge, the search only fails when no shard answers.
+
+    Returns:
+        list: The (document, score) pairs of the global top k.
+
+    Raises:
+        RuntimeError: If every shard failed.
+    """
+    def search_shard(index_name: str) -> list:
+        vectorstore = initialize_vectorstore(pinecone_api_key, index_name, embedding_model, openai_api_key, course_namespace(course))
+        return call_with_resilience(lambda: vectorstore.similarity_search_by_vector_with_score(embedding, k=k, filter=course_filter(course)), shard_policy(index_name))
+
+    started = time.perf_counter()
+    futures = {_shard_executor.submit(search_shard, index_name): index_name for index_name in shards}
+
+    # Shards still searching at the timeout are left out, their calls end with their own policy
+    done, not_done = wait(futures, timeout=SHARD_SEARCH_TIMEOUT)
+
+    results, failed = [], [futures[future] for future in not_done]
+    for future in done:
+        try:
+            results.extend(future.result())
+        except Exception as e:
+            logger.error(f"Shard '{futures[future]}' search", e)
+            failed.append(futures[future])
+    logger.shard_search(len(shards) - len(failed), len(shards), failed, time.perf_counter() - started)
+
+    if len(failed) == len(shards):
+        raise RuntimeError(f"No index answered the search ({', '.join(shards)}).")
+
+    # Keep the best score of a chunk present in several shards
+    best = {}
+    for doc, score in sorted(results, key=lambda result: result[1], reverse=True):
+        best.setdefault(doc.id or id(doc), (doc, score))
+    return list(best.values())[:k]
+
+def search_vectorstore(query: str, pinecone_api_key: str, pinecone_index_name: str, embedding_model: str, openai_api_key: str, k: int = 3, course: Optional[str] = None) -> list:
+    """
+    Run a similarity search for a query against the Pinecone index.
+
+    The query embedding and the index query are separate calls so each provider gets
+    its own timeout, hedging and circuit breaker. With a course, only the course
+    namespace is searched and results are filtered on the course metadata. When the
+    search spans several indexes, they are all queried with the same query embedding
+    and their results merged into a global top k.
+
+    Identical searches running concurrently share one execution, and so do identical
+    query embeddings, so a burst of students asking the same question costs one
+    embedding request and one index query.
+
+    Args:
+        query (str): The search query.
+        pinecone_api_key (str): Pinecone API key.
+        pinecone_index_name (str): Name of the Pinecone index, replaced by the configured shards.
+        embedding_model (str): OpenAI embedding model name.
+        openai_api_key (str): OpenAI API key for embedding generation.
+        k (int): Number of documents to return.
+        course (str, optional): Active course limiting the search.
+
+    Returns:
+        list: The most similar documents.
+    """
+    shards = read_shards(pinecone_index_name, course)
+
+    def search():
+        vectorstore = initialize_vectorstore(pinecone_api_key, shards[0], embedding_model, openai_api_key, course_namespace(course))
+        embedding = embedding_flight.do(
+            (embedding_scope(embedding_model, openai_api_key), "query", query),
+            lambda: call_with_resilience(lambda: vectorstore.embeddings.embed_query(query), EMBEDDING_POLICY),
+        )
+        if len(shards) > 1:
+            results = search_shards(embedding, shards, pinecone_api_key, embedding_model, openai_api_key, k, course)
+        else:
+            results = call_with_resilience(lambda: vectorstore.similarity_search_by_vector_with_score(embedding, k=k, filter=course_filter(course)), VECTORSTORE_POLICY)
+        return [doc for doc, _ in results]
+
+    search_key = (credential_scope(pinecone_api_key, *shards, embedding_model, openai_api_key), course or "", k, " ".join(query.split()))
+    return list(retrieval_flight.do(search_key, search))
@@ -1,7 +1,11 @@
 import os
 import streamlit as st
-from langchain_core.messages import HumanMessage
-from langchain.schema import ChatMessage
+from langchain_core.messages import ChatMessage
+from config.settings import CHAT_HISTORY_WINDOW, CHAT_HISTORY_PAGE_SIZE
+from services.session_store import SessionMessageStore
+
+# Speaker names of the collapsed transcript
+TRANSCRIPT_SPEAKERS = {"user": "You", "assistant": "Capiara", "system": "System"}
 
 def set_page_config():
     """Set the Streamlit page configuration."""
@@ -29,14 +33,52 @@ def display_banner():
 def initialize_chat_history():
     """Initialize chat history in session state."""
     if "messages" not in st.session_state:
-        st.session_state["messages"] = [
-            ChatMessage(role="assistant", content="How can I assist you with coding and algorithms today?"),
-        ]
+        st.session_state["messages"] = SessionMessageStore()
+        st.session_state["messages"].append_message(
+            ChatMessage(role="assistant", content="How can I assist you with coding and algorithms today?")
+        )
 
 def display_chat_history():
-    """Display the chat history in the Streamlit app."""
-    for msg in st.session_state["messages"]:
-        if isinstance(msg, HumanMessage):
-            st.chat_message(name="user", avatar=":material/face:").write(msg.content)
+    """
+    Display the chat history in the Streamlit app.
+
+    Only the last CHAT_HISTORY_WINDOW messages are rendered as chat messages. Older
+    messages are collapsed into a transcript showing one page at a time, so the cost
+    of a rerun stays flat as the conversation grows.
+    """
+    store = st.session_state["messages"]
+    older_count = max(len(store) - CHAT_HISTORY_WINDOW, 0) if CHAT_HISTORY_WINDOW else len(store)
+
+    if older_count:
+        display_history_pages(store, older_count)
+
+    for record in store.slice(older_count, len(store)):
+        if record.role == "user":
+            st.chat_message(name="user", avatar=":material/face:").write(record.content)
         else:
-            st.chat_message(name="assistant", avatar=":material/smart_toy:").write(msg.content)
+            st.chat_message(name="assistant", avatar=":material/smart_toy:").write(record.content)
+
+def display_history_pages(store: SessionMessageStore, older_count: int):
+    """
+    Display older messages as a paged transcript inside a collapsed expander.
+
+    Only the displayed page is read, from disk when the session spilled it.
+
+    Args:
+        store (SessionMessageStore): The message store of the session.
+        older_count (int): Number of messages older than the rendered window.
+    """
+    page_count = (older_count + CHAT_HISTORY_PAGE_SIZE - 1) // CHAT_HISTORY_PAGE_SIZE
+
+    with st.expander(f"Earlier messages ({older_count})", icon=":material/history:"):
+        page = 1
+        if page_count > 1:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=page_count, key="history_page")
+
+        start = (page - 1) * CHAT_HISTORY_PAGE_SIZE
+        records = store.slice(start, min(start + CHAT_HISTORY_PAGE_SIZE, older_count))
+        st.markdown("\n\n---\n\n".join(render_transcript_entry(record.role, record.content) for record in records))
+
+def render_transcript_entry(role: str, content: str) -> str:
+    """Render one message of the transcript as markdown."""
+    return f"**{TRANSCRIPT_SPEAKERS.get(role, role)}:**\n\n{content}"
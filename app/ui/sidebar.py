@@ -1,4 +1,13 @@
 import streamlit as st
+from config.settings import CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS, INGESTION_MEMORY_BUDGET_MB
+
+# Settings that fall back to the app secrets when left empty in the sidebar
+SECRET_DEFAULT_KEYS = ("llm_api_key", "pinecone_api_key", "pinecone_index_name", "embedding_model", "openai_api_key")
+
+@st.cache_resource
+def load_secret_defaults() -> dict:
+    """Read the default settings from the app secrets once per process."""
+    return {key: st.secrets[key] for key in SECRET_DEFAULT_KEYS}
 
 def configure_sidebar() -> dict:
     """"Configure the sidebar for the Streamlit app."""
@@ -13,30 +22,32 @@ def configure_sidebar() -> dict:
         st.session_state["pinecone_index_name"] = keys_expander.text_input("Pinecone Index Name")
         st.session_state["embedding_model"] = keys_expander.text_input("OpenAI Embedding Model", placeholder="text-embedding-3-small")
         st.session_state["openai_api_key"] = keys_expander.text_input("OpenAI API Key", type="password")
+        st.session_state["course"] = keys_expander.text_input("Course", placeholder="Algorithms I", help="Limits answers to this course and tags indexed content with it. Leave empty to use the shared index.").strip()
+        st.session_state["speculative_retrieval"] = keys_expander.toggle("Speculative Retrieval", help="Search the knowledge base while the assistant decides whether it needs it.")
 
-        if not st.session_state['llm_api_key']:
-            st.session_state['llm_api_key'] = st.secrets["llm_api_key"]
-        
-        if not st.session_state['pinecone_api_key']:
-            st.session_state['pinecone_api_key'] = st.secrets["pinecone_api_key"]
-        
-        if not st.session_state["pinecone_index_name"]:
-            st.session_state["pinecone_index_name"] = st.secrets["pinecone_index_name"]
-        
-        if not st.session_state["embedding_model"]:
-            st.session_state["embedding_model"] = st.secrets["embedding_model"]
-
-        if not st.session_state["openai_api_key"]:
-            st.session_state["openai_api_key"] = st.secrets["openai_api_key"]
+        # Fall back to the secrets for the settings left empty
+        secret_defaults = load_secret_defaults()
+        for key in SECRET_DEFAULT_KEYS:
+            if not st.session_state[key]:
+                st.session_state[key] = secret_defaults[key]
 
         pinecone_api_key = st.session_state['pinecone_api_key']
         pinecone_index_name = st.session_state["pinecone_index_name"]
         embedding_model = st.session_state["embedding_model"]
         openai_api_key = st.session_state["openai_api_key"]
+        course = st.session_state["course"]
 
         # Settings for indexing mode
         index_expander = st.expander("Indexing", expanded=True)
 
+        # Chunking settings measured in embedding model tokens
+        chunk_size = index_expander.number_input("Chunk Size (tokens)", min_value=64, max_value=8191, value=CHUNK_SIZE_TOKENS, step=64)
+        chunk_overlap = index_expander.number_input("Chunk Overlap (tokens)", min_value=0, max_value=2048, value=CHUNK_OVERLAP_TOKENS, step=16)
+
+        # Low-memory ingestion spools uploads to disk and chunks them as a stream
+        low_memory_ingestion = index_expander.toggle("Low-Memory Ingestion")
+        memory_budget_mb = index_expander.number_input("Memory Budget (MB)", min_value=32, max_value=4096, value=INGESTION_MEMORY_BUDGET_MB, step=32, disabled=not low_memory_ingestion)
+
         # Web indexing section
         web_url = index_expander.text_input("Web Link", placeholder="https://example.com")
         web_indexing_enabled = index_expander.button("Activate Web Indexing", icon=":material/database_upload:")
@@ -76,6 +87,11 @@ def configure_sidebar() -> dict:
         "pinecone_index_name": pinecone_index_name,
         "embedding_model": embedding_model,
         "openai_api_key": openai_api_key,
+        "course": course,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "low_memory_ingestion": low_memory_ingestion,
+        "memory_budget_mb": memory_budget_mb,
     }
 
     return indexing_mode_config
\ No newline at end of file
@@ -0,0 +1,94 @@
+import zipfile
+from typing import BinaryIO, Iterator
+from xml.etree.ElementTree import iterparse
+
+# WordprocessingML namespace used by word/document.xml
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = f"{W_NAMESPACE}body"
+W_PARAGRAPH = f"{W_NAMESPACE}p"
+W_TABLE = f"{W_NAMESPACE}tbl"
+W_ROW = f"{W_NAMESPACE}tr"
+W_CELL = f"{W_NAMESPACE}tc"
+W_TEXT = f"{W_NAMESPACE}t"
+W_TAB = f"{W_NAMESPACE}tab"
+W_BREAKS = (f"{W_NAMESPACE}br", f"{W_NAMESPACE}cr")
+
+def _paragraph_text(paragraph) -> str:
+    """Collect the visible text of a paragraph element, keeping tabs and line breaks."""
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W_TEXT and node.text:
+            parts.append(node.text)
+        elif node.tag == W_TAB:
+            parts.append("\t")
+        elif node.tag in W_BREAKS:
+            parts.append("\n")
+    return "".join(parts)
+
+def iter_docx_blocks(file: BinaryIO) -> Iterator[str]:
+    """
+    Stream the paragraphs and table rows of a .docx file in document order.
+
+    The document part is parsed incrementally and every element is released as soon
+    as it has been read, so memory stays flat regardless of the document size.
+    Table rows are yielded as their cell texts joined by " | ", and nested tables
+    are folded into the cell that contains them.
+
+    Args:
+        file (BinaryIO): The .docx file object.
+
+    Yields:
+        str: Each non-empty paragraph or table row.
+
+    Raises:
+        ValueError: If the file is not a valid .docx archive.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise ValueError("The provided file is not a valid .docx document.") from e
+
+    with archive, archive.open("word/document.xml") as document_xml:
+        body = None
+
+        # One entry per open table holding the current row cells and cell paragraphs
+        tables = []
+
+        for event, elem in iterparse(document_xml, events=("start", "end")):
+            if event == "start":
+                if elem.tag == W_BODY:
+                    body = elem
+                elif elem.tag == W_TABLE:
+                    tables.append({"row": [], "cell": []})
+                continue
+
+            if elem.tag == W_PARAGRAPH:
+                text = _paragraph_text(elem)
+                if tables:
+                    tables[-1]["cell"].append(text)
+                elif text.strip():
+                    yield text
+
+            elif elem.tag == W_CELL and tables:
+                cell_text = " ".join(part.strip() for part in tables[-1]["cell"] if part.strip())
+                tables[-1]["row"].append(cell_text)
+                tables[-1]["cell"] = []
+
+            elif elem.tag == W_ROW and tables:
+                row_text = " | ".join(tables[-1]["row"])
+                tables[-1]["row"] = []
+                if len(tables) > 1:
+                    tables[-2]["cell"].append(row_text)
+                elif row_text.strip(" |"):
+                    yield row_text
+
+            elif elem.tag == W_TABLE and tables:
+                tables.pop()
+
+            else:
+                continue
+
+            # Release the processed element and, at the top level, the body children read so far
+            elem.clear()
+            if body is not None and not tables:
+                body.clear()
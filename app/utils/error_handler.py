@@ -1,53 +1,63 @@
-import time
 import streamlit as st
+from services.resilience import error_status
+
+# A failed turn leaves the chat history unchanged, its message is only stored once answered, so the user can simply send it again
 
 def handle_maritalk_error(error: Exception):
     """
-    Handle errors related to the Maritalk API, specifically invalid API keys.
-    This function logs the error and provides feedback to the user.
+    Handle errors returned by the Maritalk API.
+    This function provides feedback to the user based on the HTTP status of the error.
     
     Args:
         error (Exception): The exception raised by the Maritalk API.
     """
-    st.toast("Invalid Maritalk API key. Please check your credentials.", icon=":material/passkey:")        
+    status = error_status(error)
+
+    if status in (401, 403):
+        st.toast("Invalid Maritalk API key. Please check your credentials.", icon=":material/passkey:")
+    elif status == 429:
+        st.toast("Maritalk rate limit reached. Please wait a moment and try again.", icon=":material/hourglass_top:")
+    else:
+        st.toast("Maritalk could not answer right now. Please try again.", icon=":material/sync_problem:")
+
+    with st.chat_message("system", avatar=":material/psychology_alt:"):
+        st.write(f"The language model request failed: {error}")
+
+def handle_provider_unavailable(error: Exception):
+    """
+    Handle calls rejected because a provider circuit is open or its latency budget was exceeded.
+    
+    Args:
+        error (Exception): The circuit breaker or timeout exception.
+    """
+    st.toast("A service is temporarily unavailable. Please try again shortly.", icon=":material/cloud_off:")
 
-    # Clear chat history and reset session state
-    with st.chat_message("system", avatar=":material/psychology_alt:"):    
-        with st.spinner("Restarting chat history"):
-            time.sleep(6)
-            st.session_state.clear()
-            st.rerun()
+    with st.chat_message("system", avatar=":material/psychology_alt:"):
+        st.write(f"{error}")
 
 def handle_runtime_error(error: Exception):
     """
     Handle runtime errors that occur during the execution of the application.
-    This function logs the error and provides feedback to the user.
+    This function provides feedback to the user.
     
     Args:
         error (Exception): The exception raised during runtime.
     """
     st.toast(f"An error occurred: {error}", icon=":material/database_off:")
-    
-    # Clear chat history and reset session state
-    with st.chat_message("system", avatar=":material/psychology_alt:"):    
-        with st.spinner("Restarting chat history"):
-            time.sleep(6)
-            st.session_state.clear()
-            st.rerun()
+
+    with st.chat_message("system", avatar=":material/psychology_alt:"):
+        st.write(f"An error occurred: {error}")
 
 def handle_unexpected_error(error: Exception):
     """
     Handle unexpected errors that occur during the execution of the application.
-    This function logs the error and provides feedback to the user.
+    This function provides feedback to the user.
     
     Args:
         error (Exception): The exception raised during runtime.
     """
-    st.toast("An unexpected error occurred. Please try again later.", icon=":material/sync_problem:")    
-    
-    # Clear chat history and reset session state
-    with st.chat_message("system", avatar=":material/psychology_alt:"):    
-        with st.spinner("Restarting chat history"):
-            time.sleep(6)
-            st.session_state.clear()
-            st.rerun()
\ No newline at end of file
+    st.toast("An unexpected error occurred. Please try again later.", icon=":material/sync_problem:")
+
+    with st.chat_message("system", avatar=":material/psychology_alt:"):
+        with st.expander("Error details"):
+            st.write(f"An unexpected error occurred: {error}")
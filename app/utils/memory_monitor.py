@@ -0,0 +1,56 @@
+import os
+import resource
+import sys
+import threading
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_bytes() -> int:
+    """
+    Get the current resident set size of the process.
+
+    Reads /proc on Linux and falls back to the lifetime peak from getrusage elsewhere.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+class PeakRSSMonitor:
+    """
+    Context manager sampling the process RSS in a background thread to report
+    the peak reached while the block runs.
+    """
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def __enter__(self):
+        self.baseline_bytes = self.peak_bytes = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / 1024 / 1024
+
+    @property
+    def growth_mb(self) -> float:
+        return (self.peak_bytes - self.baseline_bytes) / 1024 / 1024
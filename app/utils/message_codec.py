@@ -0,0 +1,52 @@
+from typing import List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# Message classes of the chat roles, exchanged with chat API clients and kept by the session store
+ROLE_TO_MESSAGE = {
+    "user": HumanMessage,
+    "assistant": AIMessage,
+    "system": SystemMessage,
+}
+
+def message_role(message: BaseMessage) -> str:
+    """Get the chat role of a message, or an empty string for tool traffic."""
+    if isinstance(message, HumanMessage):
+        return "user"
+    if isinstance(message, SystemMessage):
+        return "system"
+    if message.type == "tool" or getattr(message, "tool_calls", None):
+        return ""
+    return "assistant"
+
+def messages_to_dicts(messages: List[BaseMessage]) -> List[dict]:
+    """
+    Serialize conversation messages into role/content dictionaries.
+
+    Tool calls and tool results are internal to a turn and are not serialized, the ids
+    of the chunks an answer was grounded on are kept under "chunk_ids".
+    """
+    payload = []
+    for message in messages:
+        if not (role := message_role(message)):
+            continue
+        item = {"role": role, "content": message.content}
+        if message.additional_kwargs.get("chunk_ids"):
+            item["chunk_ids"] = list(message.additional_kwargs["chunk_ids"])
+        payload.append(item)
+    return payload
+
+def messages_from_dicts(payload: List[dict]) -> List[BaseMessage]:
+    """
+    Deserialize role/content dictionaries into conversation messages.
+
+    Raises:
+        ValueError: If a message has an unknown role.
+    """
+    messages = []
+    for item in payload:
+        message_class = ROLE_TO_MESSAGE.get(item.get("role"))
+        if message_class is None:
+            raise ValueError(f"Unsupported message role: {item.get('role')}")
+        additional_kwargs = {"chunk_ids": list(item["chunk_ids"])} if item.get("chunk_ids") else {}
+        messages.append(message_class(content=item.get("content", ""), additional_kwargs=additional_kwargs))
+    return messages
@@ -0,0 +1,69 @@
+import shutil
+import zipfile
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterator, Tuple
+from utils.file_extractor import FileExtractorError
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx")
+COPY_BLOCK_BYTES = 1024 * 1024
+
+def spool_upload(file: BinaryIO, max_memory_bytes: int) -> SpooledTemporaryFile:
+    """
+    Copy an uploaded file into a spooled temporary file that moves to disk past a threshold.
+
+    Args:
+        file (BinaryIO): The uploaded file object.
+        max_memory_bytes (int): Size above which the copy is written to disk.
+
+    Returns:
+        SpooledTemporaryFile: The spooled copy, rewound to the beginning.
+    """
+    spooled = SpooledTemporaryFile(max_size=max_memory_bytes)
+    if file.seekable():
+        file.seek(0)
+    shutil.copyfileobj(file, spooled, COPY_BLOCK_BYTES)
+    spooled.seek(0)
+    return spooled
+
+def iter_files_from_zip(zip_file: BinaryIO, max_memory_bytes: int) -> Iterator[Tuple[str, SpooledTemporaryFile]]:
+    """
+    Yield the supported files of a .zip archive one at a time as spooled temporary files.
+
+    Unlike extract_files_from_zip, only one inner file is materialized at once and
+    large members are spooled to disk instead of being read into memory.
+
+    Args:
+        zip_file (BinaryIO): The uploaded .zip file.
+        max_memory_bytes (int): Size above which each inner file is written to disk.
+
+    Yields:
+        Tuple[str, SpooledTemporaryFile]: The inner filename and its spooled content.
+
+    Raises:
+        FileExtractorError: If the archive is invalid or contains no supported files.
+    """
+    try:
+        archive = zipfile.ZipFile(zip_file)
+    except zipfile.BadZipFile:
+        raise FileExtractorError("The provided file is not a valid .zip archive.")
+
+    found = False
+    with archive:
+        for file_info in archive.infolist():
+            filename = file_info.filename
+            file_ext = f".{filename.split('.')[-1].lower()}"
+            if file_ext not in SUPPORTED_EXTENSIONS or file_info.is_dir():
+                continue
+
+            try:
+                with archive.open(file_info) as member:
+                    spooled = spool_upload(member, max_memory_bytes)
+            except Exception as e:
+                raise FileExtractorError(f"Error reading file '{filename}' from the archive: {e}")
+
+            found = True
+            with spooled:
+                yield filename, spooled
+
+    if not found:
+        raise FileExtractorError("No supported files were found in the .zip archive.")
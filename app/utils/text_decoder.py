@@ -0,0 +1,73 @@
+import codecs
+from typing import BinaryIO, Iterator
+from config.settings import TEXT_DECODE_BLOCK_BYTES
+
+# Byte order marks checked longest first since the UTF-32 LE mark starts with the UTF-16 LE one
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Encodings tried in order when there is no byte order mark, latin-1 never fails
+FALLBACK_ENCODINGS = ("utf-8", "cp1252", "latin-1")
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    Detect the text encoding of a file from a leading sample of its bytes.
+
+    Args:
+        sample (bytes): The first block of the file.
+
+    Returns:
+        str: The detected encoding name.
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+
+    for encoding in FALLBACK_ENCODINGS:
+        # Decode as a non-final block so a multibyte character cut at the sample edge is accepted
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return FALLBACK_ENCODINGS[-1]
+
+def iter_decoded_text(file: BinaryIO, block_size: int = TEXT_DECODE_BLOCK_BYTES) -> Iterator[str]:
+    """
+    Decode a text file incrementally, one block at a time.
+
+    The encoding is detected from the first block. If a later block is not valid in
+    the detected encoding, the remaining bytes are decoded with replacement characters
+    instead of failing the whole file.
+
+    Args:
+        file (BinaryIO): The text file object.
+        block_size (int): Number of bytes read per block.
+
+    Yields:
+        str: Decoded text blocks.
+    """
+    file.seek(0)
+    block = file.read(block_size)
+    encoding = detect_encoding(block)
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    while block:
+        try:
+            text = decoder.decode(block)
+        except UnicodeDecodeError:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            text = decoder.decode(block)
+        if text:
+            yield text
+        block = file.read(block_size)
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
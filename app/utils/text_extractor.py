@@ -1,8 +1,8 @@
-import docx
 import streamlit as st
 from io import BytesIO
-from typing import Union
-from PyPDF2 import PdfReader
+from typing import Iterator, Optional, Tuple, Union
+from utils.docx_stream_extractor import iter_docx_blocks
+from utils.text_decoder import iter_decoded_text
 
 def extract_text_from_file(file: Union[BytesIO, st.runtime.uploaded_file_manager.UploadedFile], filetype: str) -> str:
     """
@@ -12,17 +12,49 @@ def extract_text_from_file(file: Union[BytesIO, st.runtime.uploaded_file_manager
         file (Union[BytesIO, UploadedFile]): The uploaded file.
         filetype (str): File extension indicating the type (e.g., .pdf, .txt, .docx).
     """
-        
+    return "".join(iter_text_segments(file, filetype))
+
+def iter_text_segments(file: Union[BytesIO, st.runtime.uploaded_file_manager.UploadedFile], filetype: str) -> Iterator[str]:
+    """
+    Extract text content from a file as a stream of segments, without holding the whole text.
+
+    Segments are PDF pages, DOCX paragraphs and table rows, or decoded blocks of a text file.
+
+    Args:
+        file (Union[BytesIO, UploadedFile]): The uploaded file.
+        filetype (str): File extension indicating the type (e.g., .pdf, .txt, .docx).
+
+    Yields:
+        str: Consecutive text segments, including their trailing line breaks.
+    """
+    for _, segment in iter_paged_segments(file, filetype):
+        yield segment
+
+def iter_paged_segments(file: Union[BytesIO, st.runtime.uploaded_file_manager.UploadedFile], filetype: str) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Extract text content from a file as a stream of segments with their page number.
+
+    Args:
+        file (Union[BytesIO, UploadedFile]): The uploaded file.
+        filetype (str): File extension indicating the type (e.g., .pdf, .txt, .docx).
+
+    Yields:
+        Tuple[Optional[int], str]: The 1-based page number, or None for formats without
+        pages, and the text segment.
+    """
     if filetype == ".pdf":
+        from PyPDF2 import PdfReader
         reader = PdfReader(file)
-        return "\n".join(page.extract_text() or "" for page in reader.pages)
-    
+        for page_number, page in enumerate(reader.pages, start=1):
+            yield page_number, (page.extract_text() or "") + "\n"
+
     elif filetype == ".txt":
-        return file.getvalue().decode("utf-8")  
+        for segment in iter_decoded_text(file):
+            yield None, segment
 
     elif filetype == ".docx":
-        doc = docx.Document(file)
-        return "\n".join([para.text for para in doc.paragraphs])
+        for block in iter_docx_blocks(file):
+            yield None, block + "\n"
 
     else:
-        raise ValueError(f"Unsupported file type: {filetype}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file type: {filetype}")
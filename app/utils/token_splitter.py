@@ -0,0 +1,127 @@
+import tiktoken
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from config.settings import (
+    CHUNK_SIZE_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    DEFAULT_TOKENIZER_ENCODING,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_MAX_CHUNKS,
+)
+
+@lru_cache(maxsize=8)
+def get_tokenizer(embedding_model: str) -> tiktoken.Encoding:
+    """
+    Get the tokenizer used by the embedding model, cached per model name.
+
+    Args:
+        embedding_model (str): OpenAI embedding model name.
+
+    Returns:
+        tiktoken.Encoding: The model tokenizer, or the default encoding if the model is unknown.
+    """
+    try:
+        return tiktoken.encoding_for_model(embedding_model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_TOKENIZER_ENCODING)
+
+def count_tokens(text: str, embedding_model: str) -> int:
+    """Count the tokens of a text with the embedding model tokenizer."""
+    return len(get_tokenizer(embedding_model).encode(text, disallowed_special=()))
+
+def create_text_splitter(embedding_model: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None) -> RecursiveCharacterTextSplitter:
+    """
+    Create a recursive text splitter that measures chunk length in embedding model tokens.
+
+    Args:
+        embedding_model (str): OpenAI embedding model name.
+        chunk_size (int, optional): Maximum chunk size in tokens.
+        chunk_overlap (int, optional): Overlap between consecutive chunks in tokens.
+
+    Returns:
+        RecursiveCharacterTextSplitter: Token-aware text splitter.
+
+    Raises:
+        ValueError: If the chunk overlap is not smaller than the chunk size.
+    """
+    chunk_size = CHUNK_SIZE_TOKENS if chunk_size is None else int(chunk_size)
+    chunk_overlap = CHUNK_OVERLAP_TOKENS if chunk_overlap is None else int(chunk_overlap)
+
+    # Resolve the cached tokenizer once so the length function does not look it up per call
+    tokenizer = get_tokenizer(embedding_model)
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=lambda text: len(tokenizer.encode(text, disallowed_special=())),
+    )
+
+def batch_documents_by_tokens(documents: Iterable[Document], embedding_model: str, max_tokens: Optional[int] = None, max_documents: Optional[int] = None) -> Iterator[Tuple[List[Document], int]]:
+    """
+    Group documents into embedding batches bounded by total token count.
+
+    A document larger than the token limit is sent alone in its own batch.
+
+    Args:
+        documents (Iterable[Document]): Chunks to embed, consumed lazily.
+        embedding_model (str): OpenAI embedding model name.
+        max_tokens (int, optional): Maximum number of tokens per batch.
+        max_documents (int, optional): Maximum number of chunks per batch.
+
+    Yields:
+        Tuple[List[Document], int]: A batch of chunks and its total token count.
+    """
+    max_tokens = max_tokens or EMBEDDING_BATCH_MAX_TOKENS
+    max_documents = max_documents or EMBEDDING_BATCH_MAX_CHUNKS
+
+    batch, batch_tokens = [], 0
+    for doc in documents:
+        doc_tokens = count_tokens(doc.page_content, embedding_model)
+
+        # Flush the current batch when the next chunk would overflow it
+        if batch and (batch_tokens + doc_tokens > max_tokens or len(batch) >= max_documents):
+            yield batch, batch_tokens
+            batch, batch_tokens = [], 0
+
+        batch.append(doc)
+        batch_tokens += doc_tokens
+
+    if batch:
+        yield batch, batch_tokens
+
+def iter_document_chunks(segments: Iterable[str], metadata: dict, text_splitter: RecursiveCharacterTextSplitter, window_size: int) -> Iterator[Document]:
+    """
+    Split a stream of text segments into chunks without holding the full text in memory.
+
+    Segments are buffered up to a window of characters which is then split. The last
+    chunk of each window is carried over into the next one so no chunk is cut at a
+    window boundary.
+
+    Args:
+        segments (Iterable[str]): Consecutive text segments of one document.
+        metadata (dict): Metadata attached to every chunk.
+        text_splitter (RecursiveCharacterTextSplitter): The splitter used for each window.
+        window_size (int): Number of characters buffered before splitting.
+
+    Yields:
+        Document: Chunks in document order.
+    """
+    buffer = ""
+    for segment in segments:
+        buffer += segment
+        if len(buffer) < window_size:
+            continue
+
+        chunks = text_splitter.split_text(buffer)
+        for chunk in chunks[:-1]:
+            yield Document(page_content=chunk, metadata=dict(metadata))
+
+        # Keep the trailing whitespace stripped by the splitter so words are not glued together
+        trailing_whitespace = buffer[len(buffer.rstrip()):]
+        buffer = (chunks[-1] + trailing_whitespace) if chunks else ""
+
+    if buffer.strip():
+        for chunk in text_splitter.split_text(buffer):
+            yield Document(page_content=chunk, metadata=dict(metadata))
@@ -1,5 +1,4 @@
-from playwright.sync_api import sync_playwright
-from langchain.schema import Document
+from langchain_core.documents import Document
 from config.logging_config import setup_logging, EnhancedLogger
 
 logger = EnhancedLogger(setup_logging())
@@ -14,6 +13,9 @@ def get_rendered_webpage(url: str) -> Document:
     Returns:
         Document: A Langchain Document object containing the rendered HTML content.
     """
+    # Playwright is heavy to import and only needed for web indexing
+    from playwright.sync_api import sync_playwright
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)